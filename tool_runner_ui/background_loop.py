@@ -0,0 +1,74 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, Optional
+
+
+class BackgroundEventLoop:
+    """
+    An asyncio event loop running forever in a daemon thread.
+    Keeps long-lived async resources (MCP transports and sessions) alive between calls
+    made from other threads or from short-lived event loops.
+    """
+
+    def __init__(self, name: str = "background-event-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Return the background loop, starting the thread on first use"""
+        if self._loop is None or self._loop.is_closed():
+            with self._lock:
+                if self._loop is None or self._loop.is_closed():
+                    self._start()
+        return self._loop
+
+    def _start(self):
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run_forever():
+            asyncio.set_event_loop(loop)
+            loop.call_soon(started.set)
+            loop.run_forever()
+
+        self._thread = threading.Thread(target=run_forever, name=self.name, daemon=True)
+        self._thread.start()
+        started.wait()
+        self._loop = loop
+
+    def in_loop_thread(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro: Coroutine) -> Future:
+        """Schedule coroutine on the background loop and return concurrent Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def arun(self, coro: Coroutine) -> Any:
+        """Await coroutine on the background loop from any other event loop"""
+        if self.in_loop_thread():
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def run(self, coro: Coroutine, timeout: float = None) -> Any:
+        """Run coroutine on the background loop and block until it is done"""
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError(f"Blocking call on '{self.name}' from its own thread would deadlock")
+        return self.submit(coro).result(timeout)
+
+    def stop(self):
+        with self._lock:
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join()
+                self._loop.close()
+            self._loop = None
+            self._thread = None
+
+
+# Process-wide loop running MCP sessions and tool calls of sync agents, started on first use
+shared_loop = BackgroundEventLoop("shared-event-loop")
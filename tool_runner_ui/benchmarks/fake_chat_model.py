@@ -0,0 +1,99 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr
+
+
+def tool_call(name: str, call_id: str = "call-1", **args: Any) -> AIMessage:
+    """Scripted response requesting one tool call"""
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": call_id}])
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Deterministic chat model for offline benchmarks: replays scripted responses in a loop.
+    latency is waited before response (or before first streamed chunk), token_latency between streamed words.
+    Tools are converted to OpenAI format on bind_tools and token usage is estimated from message length,
+    so framework overhead depending on tools and history size is measured like with real models
+    """
+
+    responses: List[AIMessage]
+    latency: float = 0.0
+    token_latency: float = 0.0
+    model: str = "scripted"
+
+    _responses: Any = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools: List[Any], **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def reset(self):
+        with self._lock:
+            self._responses = None
+
+    def _next(self, messages: List[BaseMessage]) -> AIMessage:
+        with self._lock:
+            if self._responses is None:
+                self._responses = itertools.cycle(self.responses)
+            response = next(self._responses)
+        input_tokens = sum(len(str(message.content)) for message in messages) // 4
+        output_tokens = max(1, len(str(response.content)) // 4)
+        return response.model_copy(update={"usage_metadata": {
+            "input_tokens": input_tokens, "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens
+        }, "response_metadata": {"model": self.model}})
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                  **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._next(messages))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                         **kwargs: Any) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._next(messages))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        if self.latency:
+            time.sleep(self.latency)
+        for i, chunk in enumerate(self.__chunks(self._next(messages))):
+            if i and self.token_latency:
+                time.sleep(self.token_latency)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for i, chunk in enumerate(self.__chunks(self._next(messages))):
+            if i and self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            yield chunk
+
+    @staticmethod
+    def __chunks(message: AIMessage) -> List[ChatGenerationChunk]:
+        """Words of content, then tool calls and usage in the last chunk"""
+        words = str(message.content).split(" ") if message.content else []
+        chunks = [AIMessageChunk(content=word if i == len(words) - 1 else word + " ") for i, word in enumerate(words)]
+        chunks.append(AIMessageChunk(
+            content="", usage_metadata=message.usage_metadata, response_metadata=message.response_metadata,
+            tool_call_chunks=[{"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                              for i, call in enumerate(message.tool_calls)]
+        ))
+        return [ChatGenerationChunk(message=chunk) for chunk in chunks]
@@ -0,0 +1,60 @@
+"""
+Local MCP server for offline benchmarks.
+    python benchmarks/fake_mcp_server.py [--transport stdio|sse] [--port 8765] [--tools N]
+Serves echo, sleep and payload tools, plus N generated tools with object schemas to measure listing of large servers.
+Tool add_echo registers echo under another name and notifies client that tools list changed.
+"""
+import argparse
+import asyncio
+
+from mcp.server.fastmcp import Context, FastMCP
+
+
+def echo(text: str) -> str:
+    """Return text unchanged"""
+    return text
+
+
+async def sleep(seconds: float) -> str:
+    """Wait given number of seconds"""
+    await asyncio.sleep(seconds)
+    return f"slept {seconds}"
+
+
+def payload(size: int) -> str:
+    """Return text of given size in bytes"""
+    return "x" * size
+
+
+async def add_echo(name: str, ctx: Context) -> str:
+    """Register echo tool under given name"""
+    ctx.fastmcp.add_tool(echo, name=name)
+    await ctx.session.send_tool_list_changed()
+    return f"added {name}"
+
+
+def generated_tool(index: int):
+    def tool(query: str, limit: int = 10, tags: list[str] = None, options: dict[str, str] = None) -> str:
+        return f"tool_{index}: {query}"
+
+    tool.__name__ = f"tool_{index}"
+    tool.__doc__ = f"Generated tool number {index}, returns its name and query"
+    return tool
+
+
+def create_server(tool_count: int = 0, port: int = 8765) -> FastMCP:
+    server = FastMCP("benchmark", port=port, log_level="WARNING")
+    for function in (echo, sleep, payload, add_echo):
+        server.add_tool(function)
+    for index in range(tool_count):
+        server.add_tool(generated_tool(index))
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake MCP server for benchmarks")
+    parser.add_argument("--transport", choices=["stdio", "sse"], default="stdio")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tools", type=int, default=0, help="number of generated tools")
+    args = parser.parse_args()
+    create_server(args.tools, args.port).run(transport=args.transport)
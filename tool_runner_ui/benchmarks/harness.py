@@ -0,0 +1,129 @@
+import contextlib
+import gc
+import json
+import os
+import platform
+import time
+import tracemalloc
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import tracing
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    # Latency summary in milliseconds: count, mean, p50, p95, p99, max
+    latency: dict
+    # Peak of memory allocated during one call (KB) and blocks still allocated after it
+    peak_kb: float
+    allocated_blocks: int
+    params: dict = field(default_factory=dict)
+
+
+class BenchmarkSuite:
+    """
+    Runs benchmark functions: warmup calls, timed calls and one call traced by tracemalloc
+    (tracemalloc slows down allocations a lot, so allocations are measured apart from latency).
+    Output printed by benchmarked code is discarded
+    """
+
+    def __init__(self, quick: bool = False, pattern: str = None):
+        self.quick = quick
+        self.pattern = pattern
+        self.results: List[BenchmarkResult] = []
+
+    def run(self, name: str, function: Callable[[], object], iterations: int = 50, warmup: int = 3,
+            **params) -> Optional[BenchmarkResult]:
+        if self.pattern and self.pattern not in name:
+            return None
+        if self.quick:
+            iterations = max(3, iterations // 10)
+            warmup = min(warmup, 1)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            durations = self.__measure_latency(function, iterations, warmup)
+            peak_kb, allocated_blocks = self.__measure_allocations(function)
+
+        result = BenchmarkResult(name, tracing.latency_summary(durations), peak_kb, allocated_blocks, params)
+        self.results.append(result)
+        print(format_result(result), flush=True)
+        return result
+
+    @staticmethod
+    def __measure_latency(function: Callable[[], object], iterations: int, warmup: int) -> List[float]:
+        for _ in range(warmup):
+            function()
+        durations = []
+        gc.collect()
+        for _ in range(iterations):
+            start = time.perf_counter()
+            function()
+            durations.append((time.perf_counter() - start) * 1000)
+        return durations
+
+    @staticmethod
+    def __measure_allocations(function: Callable[[], object]) -> Tuple[float, int]:
+        """Peak KB allocated during one call and number of memory blocks left allocated by it"""
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before, _ = tracemalloc.get_traced_memory()
+            blocks = len(tracemalloc.take_snapshot().traces)
+            tracemalloc.reset_peak()
+            function()
+            _, peak = tracemalloc.get_traced_memory()
+            return round((peak - before) / 1024, 1), len(tracemalloc.take_snapshot().traces) - blocks
+        finally:
+            tracemalloc.stop()
+
+    def to_json(self) -> dict:
+        return {
+            "environment": {"python": platform.python_version(), "platform": platform.platform()},
+            "results": {result.name: asdict(result) for result in self.results}
+        }
+
+
+def format_result(result: BenchmarkResult) -> str:
+    latency = result.latency
+    return (f"{result.name:<60} p50 {latency['p50']:>9.2f} ms  p95 {latency['p95']:>9.2f} ms  "
+            f"p99 {latency['p99']:>9.2f} ms  peak {result.peak_kb:>10.1f} KB")
+
+
+def save_baseline(suite: BenchmarkSuite, path: str):
+    baseline = load_baseline(path) if os.path.exists(path) else {"results": {}}
+    baseline["environment"] = suite.to_json()["environment"]
+    # Results of benchmarks which didn't run (filtered by pattern) are kept
+    baseline["results"].update(suite.to_json()["results"])
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(baseline, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def load_baseline(path: str) -> dict:
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def compare(suite: BenchmarkSuite, baseline: dict, max_slowdown: float = 0.25, max_growth: float = 0.5,
+            min_delta_ms: float = 0.5, min_iterations: int = 10) -> List[str]:
+    """
+    Return regressions against baseline: p50 slower by more than max_slowdown (and min_delta_ms, so timer noise
+    of sub-millisecond benchmarks is ignored) or peak memory bigger by more than max_growth.
+    p50 of a quick run or of less than min_iterations calls is noisy, so it is compared with baseline p99 instead
+    """
+    regressions = []
+    baseline_results: Dict[str, dict] = baseline.get("results", {})
+    for result in suite.results:
+        previous = baseline_results.get(result.name)
+        if previous is None:
+            continue
+        p50 = result.latency["p50"]
+        noisy = suite.quick or result.latency["count"] < min_iterations
+        reference = "p99" if noisy else "p50"
+        previous_latency = previous["latency"][reference]
+        if p50 > previous_latency * (1 + max_slowdown) and p50 - previous_latency > min_delta_ms:
+            regressions.append(f"{result.name}: p50 {p50:.2f} ms, baseline {reference} {previous_latency:.2f} ms")
+        if result.peak_kb > previous["peak_kb"] * (1 + max_growth) and result.peak_kb - previous["peak_kb"] > 64:
+            regressions.append(f"{result.name}: peak {previous['peak_kb']:.1f} KB -> {result.peak_kb:.1f} KB")
+    return regressions
@@ -0,0 +1,264 @@
+"""
+Offline benchmarks of framework overhead: chat model and MCP server are local fakes, so no Ollama/OpenAI is needed.
+Run from tool_runner_ui directory:
+    python -m benchmarks.run_benchmarks [--quick] [--filter NAME] [--save-baseline] [--compare] [--employees N]
+--compare exits with code 1 when p50 latency or peak memory regressed against benchmarks/baseline.json
+(p50 of --quick run is compared with baseline p99)
+"""
+import argparse
+import os
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+# Logging of every request would dominate measured overhead
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.tools import StructuredTool
+
+from background_loop import shared_loop
+from benchmarks.fake_chat_model import ScriptedChatModel, tool_call
+from benchmarks.harness import BenchmarkSuite, compare, load_baseline, save_baseline
+from hr_data_generator import HRDataGenerator
+from llm_chat_agent import CallAgentTool, LLMChatAgent, ToolConfig
+from logger import Logger
+from mcp_tool_client import MCPToolSSEClient, MCPToolSTDIOClient
+from sql_executor_agent import SQLExecutorAgent
+from sqllite_datasource import SqlLiteDatasource
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCHMARKS_DIR, "baseline.json")
+FAKE_MCP_SERVER = os.path.join(BENCHMARKS_DIR, "fake_mcp_server.py")
+HR_DB = os.path.join(BENCHMARKS_DIR, os.pardir, "data", "test-hr.db")
+
+HISTORY_LENGTHS = [0, 100, 1000]
+TOOL_COUNTS = [1, 10, 100]
+SQL_RESULT_SIZES = [10, 1000, 10000]
+QUERY_RESULT_SIZES = [100, 10000, 100000]
+MCP_TOOL_COUNTS = [10, 100]
+
+
+def make_tools(count: int) -> dict:
+    def lookup(query: str, limit: int = 10) -> str:
+        return f"result of {query}"
+
+    return {f"tool_{i}": ToolConfig(StructuredTool.from_function(
+        lookup, name=f"tool_{i}", description=f"Looks up data of kind {i}")) for i in range(count)}
+
+
+def make_history(agent: LLMChatAgent, length: int) -> list:
+    history = list(agent.get_history())
+    for i in range(length // 2):
+        history.append(HumanMessage(content=f"Question {i} about employees of department {i % 5}"))
+        history.append(AIMessage(content=f"Answer {i}: department {i % 5} has {i} employees"))
+    return history
+
+
+def tool_calling_model() -> ScriptedChatModel:
+    """Calls tool_0 and answers with its result"""
+    return ScriptedChatModel(responses=[
+        tool_call("tool_0", query="employees", limit=5),
+        AIMessage(content="There are 5 employees in the department")
+    ])
+
+
+def bench_chat_agent(suite: BenchmarkSuite):
+    for tool_count in TOOL_COUNTS:
+        for history_length in HISTORY_LENGTHS:
+            agent = LLMChatAgent("Benchmark agent", Logger.WHITE, tool_calling_model(), toolkit=make_tools(tool_count))
+            history = make_history(agent, history_length)
+
+            def invoke(agent=agent, history=history):
+                # Every call starts with the same history
+                agent.set_history(list(history))
+                agent.invoke("How many employees are in the department?")
+
+            suite.run(f"chat_agent.invoke[tools={tool_count},history={history_length}]", invoke,
+                      iterations=50 if history_length < 1000 else 20, tools=tool_count, history=history_length)
+
+
+def bench_nested_agents(suite: BenchmarkSuite):
+    inner = LLMChatAgent("Inner agent", Logger.WHITE, tool_calling_model(), toolkit=make_tools(1))
+    delegate = CallAgentTool("delegate", "Delegates question to inner agent", inner)
+    outer = LLMChatAgent("Outer agent", Logger.WHITE, ScriptedChatModel(responses=[
+        tool_call("delegate", query="How many employees are in the department?"),
+        AIMessage(content="Inner agent says there are 5 employees")
+    ]), toolkit={"delegate": ToolConfig(delegate)})
+
+    def invoke():
+        inner.clear_history()
+        outer.clear_history()
+        outer.invoke("Ask inner agent about employees")
+
+    suite.run("call_agent_tool.nested_invoke", invoke)
+
+
+# SELECT * of a join returns columns with repeated names (department_id of both tables)
+JOIN_SQL = "SELECT * FROM employee e JOIN departments d ON e.department_id = d.department_id"
+
+
+def sql_agent_queries() -> dict:
+    """Benchmark case -> (SQL, parameters of case)"""
+    queries = {f"rows={size}": ("SELECT e1.emp_id, e1.first_name, e1.last_name, e2.salary, e2.department_id "
+                                f"FROM employee e1 CROSS JOIN employee e2 LIMIT {size}", {"rows": size})
+               for size in SQL_RESULT_SIZES}
+    # Result without numeric columns has no statistics
+    queries["text"] = ("SELECT e.first_name, e.last_name FROM employee e", {})
+    queries["select_star_join"] = (JOIN_SQL, {})
+    return queries
+
+
+def check_query(datasource: SqlLiteDatasource, sql: str):
+    """Failing query returns an error result quickly, its benchmark would measure nothing"""
+    result = datasource.retrieve_result(sql)
+    if result.is_error:
+        raise RuntimeError(f"Benchmark query failed: {result.to_markdown()}")
+
+
+def bench_sql_agent(suite: BenchmarkSuite, db_path: str):
+    datasource = SqlLiteDatasource.shared(db_path)
+    for case, (sql, params) in sql_agent_queries().items():
+        check_query(datasource, sql)
+        agent = SQLExecutorAgent(datasource, ScriptedChatModel(responses=[AIMessage(content=f"```sql\n{sql}\n```")]))
+
+        def invoke(agent=agent):
+            # Datasource caches results, every call executes SQL as for a new question
+            datasource.clear_result_cache()
+            agent.invoke("List employees", execute_mode=True)
+
+        suite.run(f"sql_agent.invoke[{case}]", invoke, iterations=30, **params)
+
+
+def bench_datasource(suite: BenchmarkSuite, db_path: str):
+    datasource = SqlLiteDatasource.shared(db_path)
+    queries = {}
+    for size in QUERY_RESULT_SIZES:
+        numbers = f"WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {size}) "
+        queries[f"rows={size}"] = (numbers + "SELECT i, 'name ' || i AS name, i * 1.5 AS salary FROM n",
+                                   {"rows": size})
+        queries[f"text,rows={size}"] = (numbers + "SELECT 'name ' || i AS name, 'dept ' || (i % 5) AS dept FROM n",
+                                        {"rows": size, "text": True})
+    queries["select_star_join"] = (JOIN_SQL, {})
+
+    for case, (sql, params) in queries.items():
+        check_query(datasource, sql)
+
+        def cold(sql=sql):
+            datasource.clear_result_cache()
+            datasource.retrieve_as_dataframe(sql)
+
+        def cached(sql=sql):
+            datasource.retrieve_as_dataframe(sql)
+
+        def result(sql=sql):
+            datasource.clear_result_cache()
+            datasource.retrieve_result(sql)
+
+        def result_cached(sql=sql):
+            datasource.retrieve_result(sql)
+
+        iterations = 10 if params.get("rows", 0) >= 100000 else 30
+        if not params.get("text"):
+            suite.run(f"datasource.retrieve_as_dataframe[{case}]", cold, iterations=iterations, **params)
+            suite.run(f"datasource.retrieve_as_dataframe_cached[{case}]", cached, iterations=iterations, **params)
+        suite.run(f"datasource.retrieve_result[{case}]", result, iterations=iterations, **params)
+        suite.run(f"datasource.retrieve_result_cached[{case}]", result_cached, iterations=iterations, **params)
+
+
+def bench_mcp(suite: BenchmarkSuite):
+    stdio = MCPToolSTDIOClient.from_command(sys.executable, [FAKE_MCP_SERVER])
+    port = free_port()
+    server = subprocess.Popen([sys.executable, FAKE_MCP_SERVER, "--transport", "sse", "--port", str(port)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        sse = MCPToolSSEClient(f"http://127.0.0.1:{port}/sse")
+        for transport, client in (("stdio", stdio), ("sse", sse)):
+            shared_loop.run(client.connect())
+            suite.run(f"mcp.call_tool[{transport},echo]",
+                      lambda client=client: shared_loop.run(client.call_tool("echo", text="hello")), iterations=100)
+            suite.run(f"mcp.call_tool[{transport},payload=100KB]",
+                      lambda client=client: shared_loop.run(client.call_tool("payload", size=100 * 1024)),
+                      iterations=50)
+            shared_loop.run(client.close())
+    finally:
+        server.terminate()
+        server.wait()
+
+    for tool_count in MCP_TOOL_COUNTS:
+        def connect(tool_count=tool_count):
+            # New client without tools cache: server is started, initialized and listed on every call
+            client = MCPToolSTDIOClient.from_command(sys.executable, [FAKE_MCP_SERVER, "--tools", str(tool_count)])
+            shared_loop.run(client.connect())
+            shared_loop.run(client.close())
+
+        suite.run(f"mcp.connect[stdio,tools={tool_count}]", connect, iterations=5, warmup=1, tools=tool_count)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Fake MCP server didn't start on port {port}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks of tool_runner_ui")
+    parser.add_argument("--quick", action="store_true", help="10x fewer iterations, for smoke testing")
+    parser.add_argument("--filter", help="run only benchmarks with this text in name")
+    parser.add_argument("--save-baseline", action="store_true", help=f"store results in {BASELINE_PATH}")
+    parser.add_argument("--compare", action="store_true", help="fail if results regressed against baseline")
+    parser.add_argument("--max-slowdown", type=float, default=0.25, help="allowed p50 slowdown, default 25%%")
+    parser.add_argument("--employees", type=int,
+                        help="run SQL benchmarks on generated HR dataset of this size instead of test database "
+                             "(results are not comparable with baseline)")
+    args = parser.parse_args()
+
+    suite = BenchmarkSuite(quick=args.quick, pattern=args.filter)
+    # Datasource switches database to WAL mode, so benchmarks work on a copy of test database
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "test-hr.db")
+        if args.employees:
+            with sqlite3.connect(db_path) as connection:
+                HRDataGenerator().load(connection, args.employees)
+            connection.close()
+        else:
+            shutil.copy(HR_DB, db_path)
+        bench_chat_agent(suite)
+        bench_nested_agents(suite)
+        bench_sql_agent(suite, db_path)
+        bench_datasource(suite, db_path)
+        bench_mcp(suite)
+        SqlLiteDatasource.shared(db_path).close()
+
+    if args.save_baseline:
+        save_baseline(suite, BASELINE_PATH)
+        print(f"Baseline saved to {BASELINE_PATH}")
+    if args.compare:
+        regressions = compare(suite, load_baseline(BASELINE_PATH), max_slowdown=args.max_slowdown)
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
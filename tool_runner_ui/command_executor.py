@@ -0,0 +1,193 @@
+import asyncio
+import codecs
+import os
+import queue
+import signal
+import subprocess
+from collections import deque
+from typing import AsyncIterator, Iterator, List
+
+from background_loop import shared_loop
+from logger import Logger
+
+
+class OutputBuffer:
+    """
+    Bounded buffer of command output: keeps first and last bytes of output, max_bytes in total.
+    Bytes in between are dropped and only counted, so output of any size costs O(n) time and bounded memory.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024):
+        self.head_limit = max_bytes // 2
+        self.tail_limit = max_bytes - self.head_limit
+        self.size = 0
+        self.omitted = 0
+        self.__head: List[bytes] = []
+        self.__head_size = 0
+        self.__tail: deque = deque()
+        self.__tail_size = 0
+
+    def append(self, data: bytes | str):
+        if isinstance(data, str):
+            data = data.encode("utf-8", "surrogatepass")
+        self.size += len(data)
+        if self.__head_size < self.head_limit:
+            part = data[:self.head_limit - self.__head_size]
+            self.__head.append(part)
+            self.__head_size += len(part)
+            data = data[len(part):]
+        if not data:
+            return
+        self.__tail.append(data)
+        self.__tail_size += len(data)
+        while self.__tail_size > self.tail_limit:
+            excess = self.__tail_size - self.tail_limit
+            first = self.__tail[0]
+            if len(first) <= excess:
+                self.__tail.popleft()
+                dropped = len(first)
+            else:
+                self.__tail[0] = first[excess:]
+                dropped = excess
+            self.__tail_size -= dropped
+            self.omitted += dropped
+
+    @property
+    def truncated(self) -> bool:
+        return self.omitted > 0
+
+    def getvalue(self) -> str:
+        text = b"".join(self.__head).decode("utf-8", "replace")
+        if self.omitted:
+            text += f"\n\n... {self.omitted} bytes of output omitted ...\n\n"
+        return text + b"".join(self.__tail).decode("utf-8", "replace")
+
+
+class CommandExecutor(Logger):
+    """
+    Runs shell commands as asyncio subprocesses.
+    Stdout and stderr are drained concurrently, so a command writing a lot to stderr can't block on full pipe.
+    Command is killed (with its child processes) when it runs longer than timeout or when caller stops
+    consuming its output. Sync methods run commands on the shared background loop.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+    # Chunks read ahead of consumer, process is blocked on full pipe when consumer is slow
+    MAX_PENDING_CHUNKS = 16
+
+    def __init__(self, timeout: float = 120, max_output_bytes: int = 32 * 1024):
+        self.name = "Command executor"
+        self.color = Logger.BRIGHT_CYAN
+        self.timeout = timeout
+        self.max_output_bytes = max_output_bytes
+
+    async def astream(self, command: str) -> AsyncIterator[str]:
+        """Yield output of command (stdout and stderr) as it is produced, followed by return code"""
+        self.log("Running {command}", command=command)
+        process = await asyncio.create_subprocess_shell(
+            command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            # Own process group lets us kill children of the shell as well
+            start_new_session=os.name == "posix"
+        )
+        chunks: asyncio.Queue = asyncio.Queue(self.MAX_PENDING_CHUNKS)
+        readers = [asyncio.create_task(self.__drain(stream, chunks)) for stream in (process.stdout, process.stderr)]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        line_start = True
+        try:
+            finished = 0
+            while finished < len(readers):
+                try:
+                    chunk = await asyncio.wait_for(chunks.get(), max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    self.log("Killing {command} after {timeout} seconds", command=command, timeout=self.timeout)
+                    yield self.__separator(line_start) + f"Process killed after timeout of {self.timeout} seconds"
+                    return
+                if chunk is None:
+                    finished += 1
+                elif chunk:
+                    line_start = chunk.endswith("\n")
+                    yield chunk
+            try:
+                # Command can close its output and keep running, it is killed at the same deadline
+                return_code = await asyncio.wait_for(process.wait(), max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                self.log("Killing {command} after {timeout} seconds", command=command, timeout=self.timeout)
+                yield self.__separator(line_start) + f"Process killed after timeout of {self.timeout} seconds"
+                return
+            self.log("{command} finished with return code {code}", command=command, code=return_code)
+            yield self.__separator(line_start) + f"Process finished with return code {return_code}"
+        finally:
+            if process.returncode is None:
+                self.__kill(process)
+                await process.wait()
+            for reader in readers:
+                reader.cancel()
+
+    async def arun(self, command: str) -> str:
+        """Run command and return its output, head and tail are kept when output exceeds max_output_bytes"""
+        output = OutputBuffer(self.max_output_bytes)
+        async for chunk in self.astream(command):
+            output.append(chunk)
+        return output.getvalue()
+
+    def run(self, command: str) -> str:
+        return shared_loop.run(self.arun(command))
+
+    def stream(self, command: str) -> Iterator[str]:
+        """Sync version of astream, closing iterator before command is finished kills the command"""
+        chunks = queue.Queue(self.MAX_PENDING_CHUNKS)
+
+        async def produce():
+            try:
+                async for chunk in self.astream(command):
+                    while True:
+                        try:
+                            chunks.put_nowait(chunk)
+                            break
+                        except queue.Full:
+                            await asyncio.sleep(0.01)
+            finally:
+                # Loop must not block: when queue is full, consumer finds out that producer is done by polling
+                try:
+                    chunks.put_nowait(None)
+                except queue.Full:
+                    pass
+
+        future = shared_loop.submit(produce())
+        try:
+            while True:
+                try:
+                    chunk = chunks.get(timeout=0.1)
+                except queue.Empty:
+                    if future.done() and chunks.empty():
+                        break
+                    continue
+                if chunk is None:
+                    break
+                yield chunk
+            future.result()
+        finally:
+            future.cancel()
+
+    async def __drain(self, stream: asyncio.StreamReader, chunks: asyncio.Queue):
+        # Incremental decoder keeps multibyte characters split between chunks
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        while data := await stream.read(self.CHUNK_SIZE):
+            await chunks.put(decoder.decode(data))
+        await chunks.put(decoder.decode(b"", final=True))
+        await chunks.put(None)
+
+    @staticmethod
+    def __separator(line_start: bool) -> str:
+        return "" if line_start else "\n"
+
+    @staticmethod
+    def __kill(process: asyncio.subprocess.Process):
+        try:
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
@@ -0,0 +1,154 @@
+from typing import Callable, List, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage, ToolMessage, AIMessage
+
+from logger import Logger
+from models import Models
+
+# Context window sizes in tokens. Ollama serves models with its own default context length (num_ctx)
+# unless configured otherwise, so local models get that default instead of their nominal window.
+OLLAMA_DEFAULT_CONTEXT_TOKENS = 4096
+CONTEXT_WINDOW_TOKENS = {
+    Models.GPT_4O_MINI.value: 128000,
+}
+
+SUMMARY_NAME = "conversation_summary"
+
+SUMMARIZATION_INSTRUCTION = """
+Summarize the conversation between user and assistant provided below.
+Keep facts, names, numbers and decisions which might be needed to answer follow-up questions.
+If summary of earlier conversation is provided, merge it into new summary.
+Return only summary as plain text, avoid adding comments or formatting.
+"""
+
+
+def estimate_tokens(message: BaseMessage) -> int:
+    """Rough token count, ~4 characters per token for English text and code"""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    tokens = len(content) // 4 + 4
+    if isinstance(message, AIMessage) and message.tool_calls:
+        tokens += sum(len(str(tool_call)) // 4 for tool_call in message.tool_calls)
+    return tokens
+
+
+class ContextWindow(Logger):
+    """
+    Keeps agent history within a token budget of the chat model:
+    - leading system messages are always kept;
+    - large tool outputs of previous turns are elided (artifacts are kept for UI);
+    - when history does not fit, older turns are replaced with a summary generated by summary model
+      (or just dropped when summary model is not provided) and a rolling window of recent turns is kept.
+    """
+
+    def __init__(self, token_budget: int = None, history_ratio: float = 0.75, max_tool_output_tokens: int = 500,
+                 summary_model: BaseChatModel = None, token_counter: Callable[[BaseMessage], int] = estimate_tokens):
+        """
+        Args:
+            token_budget: context window size in tokens, if None then it is defined by model name
+            history_ratio: part of context window available for history, the rest is left for tools and response
+            max_tool_output_tokens: tool messages of previous turns are truncated to this size
+            summary_model: cheap chat model used to summarize older turns
+            token_counter: function returning number of tokens in message
+        """
+        self.name = "Context window"
+        self.color = Logger.BRIGHT_CYAN
+        self.token_budget = token_budget
+        self.history_ratio = history_ratio
+        self.max_tool_output_tokens = max_tool_output_tokens
+        self.summary_model = summary_model
+        self.count_tokens = token_counter
+
+    def history_budget(self, model_name: str = None) -> int:
+        budget = self.token_budget or CONTEXT_WINDOW_TOKENS.get(model_name, OLLAMA_DEFAULT_CONTEXT_TOKENS)
+        return int(budget * self.history_ratio)
+
+    def compact(self, history: List[BaseMessage], model_name: str = None) -> List[BaseMessage]:
+        """Return history which fits into budget of the model, last turn is never changed"""
+        pinned, kept, dropped = self.__prepare(history, model_name)
+        if not dropped:
+            return pinned + kept
+        return pinned + self.__summarize(dropped) + kept
+
+    async def acompact(self, history: List[BaseMessage], model_name: str = None) -> List[BaseMessage]:
+        """Async variant of compact, summary model is awaited"""
+        pinned, kept, dropped = self.__prepare(history, model_name)
+        if not dropped:
+            return pinned + kept
+        return pinned + await self.__asummarize(dropped) + kept
+
+    def __prepare(self, history: List[BaseMessage], model_name: str):
+        """Return pinned system messages, messages to keep and messages to summarize"""
+        pinned, turns = self.__split_turns(history)
+        turns = [self.__elide_tool_outputs(turn) for turn in turns[:-1]] + turns[-1:]
+
+        budget = self.history_budget(model_name) - sum(self.count_tokens(message) for message in pinned)
+        total = sum(self.count_tokens(message) for turn in turns for message in turn)
+        if total <= budget:
+            return pinned, [message for turn in turns for message in turn], []
+
+        # Keep most recent turns which fit into budget, leaving room for summary of the rest
+        budget -= self.max_tool_output_tokens
+        kept: List[BaseMessage] = []
+        used = 0
+        split = len(turns)
+        for i in range(len(turns) - 1, -1, -1):
+            size = sum(self.count_tokens(message) for message in turns[i])
+            if kept and used + size > budget:
+                break
+            kept = turns[i] + kept
+            used += size
+            split = i
+
+        dropped = [message for turn in turns[:split] for message in turn]
+        self.log("History of {total} tokens exceeds budget, {turns} older turns are summarized",
+                 total=total, turns=split)
+        return pinned, kept, dropped
+
+    @staticmethod
+    def __split_turns(history: List[BaseMessage]) -> Tuple[List[BaseMessage], List[List[BaseMessage]]]:
+        """Split history into leading system messages and turns, every turn starts with human message"""
+        position = 0
+        while position < len(history) and isinstance(history[position], SystemMessage) \
+                and history[position].name != SUMMARY_NAME:
+            position += 1
+
+        turns: List[List[BaseMessage]] = []
+        for message in history[position:]:
+            if isinstance(message, HumanMessage) or not turns:
+                turns.append([])
+            turns[-1].append(message)
+        return history[:position], turns
+
+    def __elide_tool_outputs(self, turn: List[BaseMessage]) -> List[BaseMessage]:
+        max_chars = self.max_tool_output_tokens * 4
+        elided = []
+        for message in turn:
+            if isinstance(message, ToolMessage) and isinstance(message.content, str) \
+                    and len(message.content) > max_chars:
+                content = f"{message.content[:max_chars]}\n... [{len(message.content) - max_chars} characters elided]"
+                message = message.model_copy(update={"content": content})
+            elided.append(message)
+        return elided
+
+    def __summary_request(self, dropped: List[BaseMessage]) -> Optional[List[BaseMessage]]:
+        if self.summary_model is None:
+            return None
+        transcript = "\n\n".join(f"{message.type}: {message.content}" for message in dropped if message.content)
+        return [SystemMessage(content=SUMMARIZATION_INSTRUCTION), HumanMessage(content=transcript)]
+
+    def __summarize(self, dropped: List[BaseMessage]) -> List[BaseMessage]:
+        request = self.__summary_request(dropped)
+        if request is None:
+            return []
+        return [self.__summary_message(self.summary_model.invoke(request).content)]
+
+    async def __asummarize(self, dropped: List[BaseMessage]) -> List[BaseMessage]:
+        request = self.__summary_request(dropped)
+        if request is None:
+            return []
+        return [self.__summary_message((await self.summary_model.ainvoke(request)).content)]
+
+    @staticmethod
+    def __summary_message(summary: str) -> SystemMessage:
+        return SystemMessage(content=f"Summary of earlier conversation:\n{summary}", name=SUMMARY_NAME)
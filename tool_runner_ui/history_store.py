@@ -0,0 +1,263 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from typing import Any, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+from logger import Logger
+from sqllite_datasource import QueryResult
+
+
+def read_parquet(path: str) -> pa.Table:
+    # ParquetFile reads tables with duplicate column names (e.g. joined tables), unlike pq.read_table
+    return pq.ParquetFile(path).read()
+
+
+class HistoryStore(Logger):
+    """
+    Append-only store of chat sessions.
+    Chat messages (as rendered by UI) and agent messages are stored as JSON rows in SQLite, one row per message,
+    appended as they arrive. Tabular artifacts (query results, data frames, Arrow tables) are written once
+    to Parquet files next to the database and loaded lazily when UI renders them.
+    Sessions are listed from index table, chat messages are loaded page by page.
+    """
+
+    def __init__(self, directory: str = "data/history"):
+        self.name = "History store"
+        self.color = Logger.BRIGHT_MAGENTA
+        self.directory = directory
+        self.artifacts_directory = os.path.join(directory, "artifacts")
+        os.makedirs(self.artifacts_directory, exist_ok=True)
+        self.__lock = threading.Lock()
+        # Artifacts which are already written (or loaded from store) are referenced by their file
+        self.__artifact_paths = weakref.WeakKeyDictionary()
+        # Agent history last saved for session, to append only new messages
+        self.__agent_snapshots = {}
+        self.__db = sqlite3.connect(os.path.join(directory, "history.db"), check_same_thread=False)
+        self.__db.execute("PRAGMA journal_mode = WAL")
+        self.__db.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                title TEXT,
+                created_at REAL,
+                updated_at REAL,
+                message_count INTEGER DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+
+            CREATE TABLE IF NOT EXISTS chat_messages (
+                session_id TEXT,
+                seq INTEGER,
+                message_id TEXT,
+                role TEXT,
+                content TEXT,
+                created_at REAL,
+                PRIMARY KEY (session_id, seq)
+            );
+            CREATE INDEX IF NOT EXISTS chat_messages_id ON chat_messages (session_id, message_id);
+
+            CREATE TABLE IF NOT EXISTS agent_messages (
+                session_id TEXT,
+                seq INTEGER,
+                content TEXT,
+                PRIMARY KEY (session_id, seq)
+            );
+        """)
+        self.__db.commit()
+
+    def create_session(self, title: str) -> str:
+        session_id = uuid.uuid4().hex
+        now = time.time()
+        with self.__lock:
+            self.__db.execute("INSERT INTO sessions (session_id, title, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                              (session_id, title[:100], now, now))
+            self.__db.commit()
+        self.log("Session {session} created", session=session_id)
+        return session_id
+
+    def list_sessions(self, limit: int = 50, offset: int = 0) -> List[dict]:
+        """Most recently updated sessions first"""
+        with self.__lock:
+            rows = self.__db.execute(
+                "SELECT session_id, title, created_at, updated_at, message_count FROM sessions "
+                "ORDER BY updated_at DESC LIMIT ? OFFSET ?", (limit, offset)
+            ).fetchall()
+        return [{"session_id": session_id, "title": title, "created_at": created_at, "updated_at": updated_at,
+                 "message_count": message_count}
+                for session_id, title, created_at, updated_at, message_count in rows]
+
+    def count_chat_messages(self, session_id: str) -> int:
+        with self.__lock:
+            row = self.__db.execute("SELECT message_count FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else 0
+
+    def append_chat_message(self, session_id: str, message: dict):
+        content = self.__encode(message["content"], session_id)
+        now = time.time()
+        with self.__lock:
+            self.__db.execute(
+                "INSERT INTO chat_messages (session_id, seq, message_id, role, content, created_at) "
+                "SELECT ?, COALESCE(MAX(seq), -1) + 1, ?, ?, ?, ? FROM chat_messages WHERE session_id = ?",
+                (session_id, message["id"], message["role"], content, now, session_id)
+            )
+            self.__db.execute("UPDATE sessions SET updated_at = ?, message_count = message_count + 1 "
+                              "WHERE session_id = ?", (now, session_id))
+            self.__db.commit()
+
+    def update_chat_message(self, session_id: str, message: dict):
+        """Replace content of message which was changed after it was appended (e.g. command was run)"""
+        content = self.__encode(message["content"], session_id)
+        with self.__lock:
+            self.__db.execute("UPDATE chat_messages SET content = ? WHERE session_id = ? AND message_id = ?",
+                              (content, session_id, message["id"]))
+            self.__db.commit()
+
+    def load_chat_messages(self, session_id: str, limit: int = None, before: int = None) -> List[dict]:
+        """
+        Load chat messages in order, limit is number of most recent messages preceding message with position before.
+        Every message has 'seq' - its position in session, used to load earlier page
+        """
+        query = "SELECT seq, message_id, role, content FROM chat_messages WHERE session_id = ?"
+        params: List[Any] = [session_id]
+        if before is not None:
+            query += " AND seq < ?"
+            params.append(before)
+        query += " ORDER BY seq DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self.__lock:
+            rows = self.__db.execute(query, params).fetchall()
+        return [{"id": message_id, "role": role, "content": self.__decode(content), "seq": seq}
+                for seq, message_id, role, content in reversed(rows)]
+
+    def save_agent_history(self, session_id: str, history: List[BaseMessage]):
+        """
+        Append messages added to agent history since last save.
+        When history was rewritten (e.g. older turns were summarized), stored history is replaced
+        """
+        # Store is shared by sessions: snapshots are compared and updated under the same lock as stored rows
+        with self.__lock:
+            snapshot = self.__agent_snapshots.get(session_id, [])
+            appended = len(snapshot) <= len(history) and all(a is b for a, b in zip(snapshot, history))
+            start = len(snapshot) if appended else 0
+            rows = [(session_id, seq, self.__encode(message, session_id))
+                    for seq, message in enumerate(history[start:], start)]
+            if not appended:
+                self.__db.execute("DELETE FROM agent_messages WHERE session_id = ?", (session_id,))
+            self.__db.executemany("INSERT INTO agent_messages (session_id, seq, content) VALUES (?, ?, ?)", rows)
+            self.__db.commit()
+            self.__agent_snapshots[session_id] = list(history)
+
+    def load_agent_history(self, session_id: str) -> List[BaseMessage]:
+        with self.__lock:
+            rows = self.__db.execute("SELECT content FROM agent_messages WHERE session_id = ? ORDER BY seq",
+                                     (session_id,)).fetchall()
+            history = [self.__decode(content) for content, in rows]
+            self.__agent_snapshots[session_id] = list(history)
+        return history
+
+    def delete_session(self, session_id: str):
+        with self.__lock:
+            for table in ("sessions", "chat_messages", "agent_messages"):
+                self.__db.execute(f"DELETE FROM {table} WHERE session_id = ?", (session_id,))
+            self.__db.commit()
+            self.__agent_snapshots.pop(session_id, None)
+        directory = os.path.join(self.artifacts_directory, session_id)
+        if os.path.isdir(directory):
+            for file in os.listdir(directory):
+                os.remove(os.path.join(directory, file))
+            os.rmdir(directory)
+
+    def close(self):
+        with self.__lock:
+            self.__db.close()
+
+    def __encode(self, value: Any, session_id: str) -> str:
+        return json.dumps(value, default=lambda obj: self.__encode_object(obj, session_id))
+
+    def __encode_object(self, obj: Any, session_id: str):
+        """Serialize objects unknown to json, called by json.dumps for nested values as well"""
+        if isinstance(obj, BaseMessage):
+            return {"__type__": "message", "message": message_to_dict(obj)}
+        if isinstance(obj, QueryResult):
+            # Saving doesn't load full result: that would execute query again and store current data
+            # instead of data shown to user. Only preview is stored until full result is loaded
+            complete = obj.is_loaded and obj.table.num_rows == obj.row_count
+            table = obj.table if complete else obj.preview
+            return {
+                "__type__": "query_result", "path": self.__write_artifact(obj, table, session_id, complete),
+                "statement": obj.statement, "row_count": obj.row_count, "truncated": obj.truncated,
+                "preview_rows": obj.preview.num_rows, "complete": complete,
+                "stats": obj.stats.to_dict(orient="split") if obj.stats is not None else None
+            }
+        if isinstance(obj, pa.Table):
+            return {"__type__": "arrow_table", "path": self.__write_artifact(None, obj, session_id)}
+        if isinstance(obj, pd.DataFrame):
+            return {"__type__": "dataframe", "path": self.__write_artifact(None, pa.Table.from_pandas(obj), session_id)}
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, (set, frozenset)):
+            return list(obj)
+        self.log("Value of type {type} is stored as string", type=type(obj).__name__)
+        return str(obj)
+
+    def __write_artifact(self, owner: Optional[QueryResult], table: pa.Table, session_id: str,
+                         complete: bool = True) -> str:
+        """
+        Write table to Parquet file once, return path relative to artifacts directory.
+        Preview of query result is written again when full result was loaded since
+        """
+        if owner is not None and owner in self.__artifact_paths:
+            path, written_complete = self.__artifact_paths[owner]
+            if written_complete or not complete:
+                return path
+        path = os.path.join(session_id, f"{uuid.uuid4().hex}.parquet")
+        os.makedirs(os.path.join(self.artifacts_directory, session_id), exist_ok=True)
+        pq.write_table(table, os.path.join(self.artifacts_directory, path))
+        if owner is not None:
+            self.__artifact_paths[owner] = path, complete
+        return path
+
+    def __decode(self, content: str) -> Any:
+        return json.loads(content, object_hook=self.__decode_object)
+
+    def __decode_object(self, obj: dict) -> Any:
+        kind = obj.get("__type__")
+        if kind is None:
+            return obj
+        if kind == "message":
+            return messages_from_dict([obj["message"]])[0]
+        path = os.path.join(self.artifacts_directory, obj["path"])
+        if kind == "arrow_table":
+            return read_parquet(path)
+        if kind == "dataframe":
+            return read_parquet(path).to_pandas()
+        if kind == "query_result":
+            return self.__load_query_result(obj, path)
+        return obj
+
+    def __load_query_result(self, obj: dict, path: str) -> QueryResult:
+        stats = pd.DataFrame(**obj["stats"]) if obj["stats"] is not None else None
+        complete = obj.get("complete", True)
+        if not complete or (not obj["truncated"] and obj["row_count"] <= obj["preview_rows"]):
+            # Only preview was stored when full result wasn't loaded, it stays the only rows of result
+            result = QueryResult(obj["statement"], read_parquet(path), obj["row_count"], obj["truncated"], stats)
+        else:
+            # Only first rows are read, full result is read when UI renders it
+            preview = pa.Table.from_batches(
+                [next(pq.ParquetFile(path).iter_batches(batch_size=obj["preview_rows"]))]
+            )
+            result = QueryResult(obj["statement"], preview, obj["row_count"], obj["truncated"], stats,
+                                 loader=lambda: read_parquet(path))
+        self.__artifact_paths[result] = obj["path"], complete
+        return result
@@ -0,0 +1,312 @@
+"""
+Synthetic HR dataset for load testing of SqlLiteDatasource and SQL tools.
+    python hr_data_generator.py data/hr-large.db --employees 1000000 --seed 42
+Data is generated with NumPy in batches (same seed gives the same database), every batch is inserted
+in one transaction and indexes are created after all rows are loaded.
+Rows are added to existing tables, employees and projects which already exist are kept as they are;
+--replace drops dataset tables and loads them from scratch.
+"""
+import argparse
+import sqlite3
+import time
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from logger import Logger
+
+# departments and employee tables are the same as in SqlLiteDatasource schema, the other tables extend it
+HR_DATASET_SCHEMA = """
+CREATE TABLE IF NOT EXISTS departments (
+    department_id INTEGER PRIMARY KEY,
+    department_name VARCHAR
+);
+
+CREATE TABLE IF NOT EXISTS employee (
+    emp_id INTEGER PRIMARY KEY,
+    first_name VARCHAR,
+    last_name VARCHAR,
+    salary INTEGER,
+    department_id INTEGER,
+    FOREIGN KEY(department_id) REFERENCES departments(department_id)
+);
+
+CREATE TABLE IF NOT EXISTS salary_history (
+    emp_id INTEGER,
+    salary INTEGER,
+    start_date DATE,
+    end_date DATE,
+    FOREIGN KEY(emp_id) REFERENCES employee(emp_id)
+);
+
+CREATE TABLE IF NOT EXISTS projects (
+    project_id INTEGER PRIMARY KEY,
+    project_name VARCHAR,
+    department_id INTEGER,
+    budget INTEGER,
+    status VARCHAR,
+    start_date DATE,
+    end_date DATE,
+    FOREIGN KEY(department_id) REFERENCES departments(department_id)
+);
+
+CREATE TABLE IF NOT EXISTS employee_projects (
+    emp_id INTEGER,
+    project_id INTEGER,
+    role VARCHAR,
+    hours_per_week INTEGER,
+    FOREIGN KEY(emp_id) REFERENCES employee(emp_id),
+    FOREIGN KEY(project_id) REFERENCES projects(project_id)
+);
+"""
+
+HR_DATASET_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_employee_department ON employee(department_id);
+CREATE INDEX IF NOT EXISTS idx_employee_name ON employee(last_name, first_name);
+CREATE INDEX IF NOT EXISTS idx_salary_history_employee ON salary_history(emp_id, start_date);
+CREATE INDEX IF NOT EXISTS idx_projects_department ON projects(department_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_employee_projects ON employee_projects(emp_id, project_id);
+CREATE INDEX IF NOT EXISTS idx_employee_projects_project ON employee_projects(project_id);
+"""
+
+HR_DATASET_TABLES = ["employee_projects", "salary_history", "projects", "employee", "departments"]
+
+# (name, share of employees, salary multiplier), first 5 departments have the same ids as in test-hr.db
+DEPARTMENTS = [
+    ("Sales", 0.18, 0.95), ("Engineering", 0.30, 1.35), ("HR", 0.04, 0.9), ("Marketing", 0.08, 1.0),
+    ("Finance", 0.06, 1.15), ("Operations", 0.10, 0.85), ("Customer Support", 0.12, 0.75),
+    ("Legal", 0.02, 1.4), ("Product", 0.05, 1.25), ("Research", 0.05, 1.3)
+]
+
+FIRST_NAMES = [
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William", "Elizabeth",
+    "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen",
+    "Daniel", "Nancy", "Matthew", "Lisa", "Anthony", "Betty", "Mark", "Margaret", "Steven", "Emily",
+    "Paul", "Emma", "Andrew", "Olivia", "Joshua", "Grace", "Kevin", "Alice", "Brian", "Rachel",
+    "George", "Ivy", "Edward", "Kelly", "Henry", "Quinn", "Leo", "Carol", "Noah", "Jane"
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson",
+    "Walker", "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen", "Hill", "Flores",
+    "Green", "Adams", "Nelson", "Baker", "Hall", "Rivera", "Campbell", "Mitchell", "Carter", "Doe"
+]
+PROJECT_ADJECTIVES = ["Blue", "Silver", "Rapid", "Quiet", "Bright", "Northern", "Open", "Smart", "Green", "Iron"]
+PROJECT_NOUNS = ["Falcon", "Harbor", "Atlas", "Beacon", "Summit", "Orbit", "Bridge", "Compass", "Forge", "Pulse"]
+PROJECT_STATUSES = (["planned", "active", "completed", "cancelled"], [0.15, 0.45, 0.35, 0.05])
+PROJECT_ROLES = (["member", "lead", "reviewer", "consultant"], [0.7, 0.1, 0.12, 0.08])
+
+# Dates are generated relative to fixed date, so the dataset doesn't depend on when it is generated
+REFERENCE_DATE = np.datetime64("2025-01-01")
+MEDIAN_SALARY = 5000
+
+
+def zipf_weights(count: int, exponent: float = 1.0) -> np.ndarray:
+    """Probabilities of ranks 1..count: few very common values and a long tail, like real names"""
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    return weights / weights.sum()
+
+
+class HRDataGenerator(Logger):
+    """
+    Vectorized generator of HR dataset: departments, employees, salary history, projects and project assignments.
+    Salaries are log-normal with department multipliers, history ends with current salary of employee,
+    names follow Zipf distribution, so names repeat as they do in real companies with millions of employees
+    """
+
+    def __init__(self, seed: int = 42, batch_size: int = 100_000):
+        self.name = "HR data generator"
+        self.color = Logger.BRIGHT_GREEN
+        self.seed = seed
+        self.batch_size = batch_size
+
+    def load(self, connection: sqlite3.Connection, employees: int = 100, employees_per_project: int = 20,
+             build_indexes: bool = True, replace: bool = False) -> Dict[str, int]:
+        """
+        Load generated data into database, return number of added rows per table.
+        Rows are added with INSERT OR IGNORE: existing employees (with their salary history and projects),
+        projects and departments are kept. With replace=True dataset tables and their data are dropped first.
+        Indexes are created after load, building index once is much faster than updating it on every insert
+        """
+        rng = np.random.default_rng(self.seed)
+        started = time.perf_counter()
+        synchronous = connection.execute("PRAGMA synchronous").fetchone()[0]
+        # Generated data can be generated again, so data safety is traded for load speed
+        connection.execute("PRAGMA synchronous = OFF")
+        try:
+            if replace:
+                for table in HR_DATASET_TABLES:
+                    connection.execute(f"DROP TABLE IF EXISTS {table}")
+            connection.executescript(HR_DATASET_SCHEMA)
+            counts = dict.fromkeys(reversed(HR_DATASET_TABLES), 0)
+
+            with connection:
+                counts["departments"] = self.__insert(connection, "departments", self.departments())
+                projects = self.projects(rng, max(1, employees // employees_per_project))
+                counts["projects"] = self.__insert(connection, "projects", projects)
+            project_departments = np.asarray(projects[2])
+
+            for first_id in range(1, employees + 1, self.batch_size):
+                count = min(self.batch_size, employees + 1 - first_id)
+                # Batch is generated in full, so generated employees do not depend on employees which exist
+                employee = self.__new_employees(connection, self.employees(rng, first_id, count))
+                salary_history = self.salary_history(rng, employee[0], employee[3])
+                assignments = self.assignments(rng, employee[0], employee[4], project_departments)
+                with connection:
+                    counts["employee"] += self.__insert(connection, "employee", employee)
+                    counts["salary_history"] += self.__insert(connection, "salary_history", salary_history)
+                    counts["employee_projects"] += self.__insert(connection, "employee_projects", assignments)
+                self.log("Loaded {rows} of {total} employees", rows=first_id + count - 1, total=employees)
+
+            if build_indexes:
+                index_started = time.perf_counter()
+                connection.executescript(HR_DATASET_INDEXES)
+                connection.execute("ANALYZE")
+                connection.commit()
+                self.log("Indexes built in {seconds}s", seconds=round(time.perf_counter() - index_started, 2))
+        finally:
+            connection.execute(f"PRAGMA synchronous = {synchronous}")
+        self.log("Generated {counts} in {seconds}s", counts=counts, seconds=round(time.perf_counter() - started, 2))
+        return counts
+
+    @staticmethod
+    def __new_employees(connection: sqlite3.Connection, employee: List[np.ndarray]) -> List[np.ndarray]:
+        """Columns of employees which are not in employee table yet"""
+        emp_ids = employee[0]
+        existing = [row[0] for row in connection.execute("SELECT emp_id FROM employee WHERE emp_id BETWEEN ? AND ?",
+                                                         (int(emp_ids[0]), int(emp_ids[-1])))]
+        if not existing:
+            return employee
+        new = ~np.isin(emp_ids, existing)
+        return [column[new] for column in employee]
+
+    @staticmethod
+    def departments() -> List[np.ndarray]:
+        return [np.arange(1, len(DEPARTMENTS) + 1), np.array([name for name, _, _ in DEPARTMENTS], dtype=object)]
+
+    @staticmethod
+    def employees(rng: np.random.Generator, first_id: int, count: int) -> List[np.ndarray]:
+        """Columns of employee table: emp_id, first_name, last_name, salary, department_id"""
+        shares = np.array([share for _, share, _ in DEPARTMENTS])
+        multipliers = np.array([multiplier for _, _, multiplier in DEPARTMENTS])
+        department_index = rng.choice(len(DEPARTMENTS), size=count, p=shares / shares.sum())
+        salary = rng.lognormal(np.log(MEDIAN_SALARY), 0.35, size=count) * multipliers[department_index]
+        return [
+            np.arange(first_id, first_id + count),
+            np.array(FIRST_NAMES, dtype=object)[rng.choice(len(FIRST_NAMES), size=count,
+                                                           p=zipf_weights(len(FIRST_NAMES), 0.8))],
+            np.array(LAST_NAMES, dtype=object)[rng.choice(len(LAST_NAMES), size=count,
+                                                          p=zipf_weights(len(LAST_NAMES), 0.8))],
+            (np.clip(salary, 1000, 50000) // 10 * 10).astype(np.int64),
+            department_index + 1
+        ]
+
+    @staticmethod
+    def salary_history(rng: np.random.Generator, emp_ids: np.ndarray, salaries: np.ndarray) -> List[np.ndarray]:
+        """
+        Columns of salary_history table: emp_id, salary, start_date, end_date.
+        Employee hired up to 20 years ago got a raise every few years, last record is current salary without end_date
+        """
+        count = len(emp_ids)
+        tenure_days = rng.integers(30, 20 * 365, size=count)
+        changes = np.minimum(1 + rng.poisson(tenure_days / 365 / 3), 10)
+        annual_raise = rng.uniform(0.02, 0.08, size=count)
+
+        rows = int(changes.sum())
+        employee = np.repeat(np.arange(count), changes)
+        # Position of record within records of its employee: 0 is hiring, changes - 1 is current salary
+        position = np.arange(rows) - np.repeat(np.cumsum(changes) - changes, changes)
+        steps_back = changes[employee] - 1 - position
+        salary = salaries[employee] / (1 + annual_raise[employee] * 3) ** steps_back
+
+        hire_date = REFERENCE_DATE - tenure_days
+        start_date = hire_date[employee] + (tenure_days[employee] * position // changes[employee])
+        end_date = np.empty(rows, dtype=object)
+        is_current = steps_back == 0
+        # Record ends the day before the next one of the same employee starts
+        end_date[~is_current] = np.datetime_as_string(start_date[1:][~is_current[:-1]] - 1)
+        return [emp_ids[employee], (salary // 10 * 10).astype(np.int64), np.datetime_as_string(start_date), end_date]
+
+    @staticmethod
+    def projects(rng: np.random.Generator, count: int) -> List[np.ndarray]:
+        """Columns of projects table: project_id, project_name, department_id, budget, status, start_date, end_date"""
+        project_id = np.arange(1, count + 1)
+        names = np.char.add(np.char.add(
+            np.array(PROJECT_ADJECTIVES)[rng.integers(len(PROJECT_ADJECTIVES), size=count)], " "),
+            np.array(PROJECT_NOUNS)[rng.integers(len(PROJECT_NOUNS), size=count)])
+        shares = np.array([share for _, share, _ in DEPARTMENTS])
+        statuses, status_weights = PROJECT_STATUSES
+        status = np.array(statuses, dtype=object)[rng.choice(len(statuses), size=count, p=status_weights)]
+        start_date = REFERENCE_DATE - rng.integers(0, 5 * 365, size=count)
+        planned = status == "planned"
+        start_date[planned] = REFERENCE_DATE + rng.integers(1, 180, size=int(planned.sum()))
+        end_date = (start_date + rng.integers(30, 2 * 365, size=count)).astype(object)
+        # Active and planned projects haven't finished yet
+        end_date[(status == "active") | planned] = None
+        return [
+            project_id,
+            np.char.add(np.char.add(names, " "), project_id.astype(str)).astype(object),
+            rng.choice(len(DEPARTMENTS), size=count, p=shares / shares.sum()) + 1,
+            (rng.lognormal(np.log(250_000), 1.0, size=count) // 1000 * 1000).astype(np.int64),
+            status,
+            np.datetime_as_string(start_date),
+            np.array([None if date is None else str(date) for date in end_date], dtype=object)
+        ]
+
+    @staticmethod
+    def assignments(rng: np.random.Generator, emp_ids: np.ndarray, department_ids: np.ndarray,
+                    project_departments: np.ndarray) -> List[np.ndarray]:
+        """
+        Columns of employee_projects table: emp_id, project_id, role, hours_per_week.
+        Employees work on 0-4 projects, mostly of their own department
+        """
+        count = len(emp_ids)
+        projects_count = np.minimum(rng.poisson(1.3, size=count), 4)
+        employee = np.repeat(np.arange(count), projects_count)
+
+        # Projects sorted by department: random project of department is picked by offset within its range
+        order = np.argsort(project_departments, kind="stable")
+        departments = np.arange(1, len(DEPARTMENTS) + 1)
+        first = np.searchsorted(project_departments[order], departments, side="left")
+        sizes = np.searchsorted(project_departments[order], departments, side="right") - first
+        department = department_ids[employee] - 1
+        own = (rng.random(len(employee)) < 0.8) & (sizes[department] > 0)
+        project_index = rng.integers(len(project_departments), size=len(employee))
+        offset = (rng.random(len(employee)) * np.maximum(sizes[department], 1)).astype(np.int64)
+        project_index[own] = order[first[department[own]] + offset[own]]
+
+        # Employee is assigned to each project once
+        pairs = np.unique(np.stack([emp_ids[employee], project_index + 1], axis=1), axis=0)
+        roles, role_weights = PROJECT_ROLES
+        return [
+            pairs[:, 0],
+            pairs[:, 1],
+            np.array(roles, dtype=object)[rng.choice(len(roles), size=len(pairs), p=role_weights)],
+            rng.choice([4, 8, 10, 16, 20, 40], size=len(pairs), p=[0.15, 0.25, 0.2, 0.2, 0.15, 0.05])
+        ]
+
+    @staticmethod
+    def __insert(connection: sqlite3.Connection, table: str, columns: Sequence[np.ndarray]) -> int:
+        # tolist() converts NumPy scalars to Python types supported by sqlite3
+        rows = zip(*(column.tolist() for column in columns))
+        placeholders = ", ".join("?" * len(columns))
+        return connection.executemany(f"INSERT OR IGNORE INTO {table} VALUES ({placeholders})", rows).rowcount
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic HR database for load testing")
+    parser.add_argument("database", help="SQLite database file, generated rows are added to dataset tables")
+    parser.add_argument("--employees", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=100_000, help="employees inserted per transaction")
+    parser.add_argument("--no-indexes", action="store_true", help="skip building indexes after load")
+    parser.add_argument("--replace", action="store_true", help="drop dataset tables with their data before load")
+    args = parser.parse_args()
+
+    with sqlite3.connect(args.database) as db:
+        counts = HRDataGenerator(args.seed, args.batch_size).load(db, args.employees,
+                                                                   build_indexes=not args.no_indexes,
+                                                                   replace=args.replace)
+    db.close()
+    print(counts)
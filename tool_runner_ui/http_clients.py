@@ -0,0 +1,87 @@
+import asyncio
+import importlib.util
+import threading
+from typing import Dict, Hashable
+
+import httpx
+
+# Connection pool limits of every base URL: idle connections are kept alive between LLM calls
+DEFAULT_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=120)
+# HTTP/2 is negotiated over TLS only when h2 package is installed (pip install httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_transports: Dict[Hashable, httpx.BaseTransport | httpx.AsyncBaseTransport] = {}
+_clients: Dict[Hashable, httpx.Client] = {}
+_lock = threading.RLock()
+
+
+class LoopLocalAsyncTransport(httpx.AsyncBaseTransport):
+    """
+    Async transport keeping separate connection pool for every event loop.
+    Async connections can't be used outside of event loop which opened them, while async model calls
+    run on more than one loop: shared background loop (tool calls, sub-agents called by CallAgentTool._arun)
+    and loops of callers awaiting LLMChatAgent.ainvoke/astream. Pools of closed loops are dropped when pool of
+    another loop is created: their connections keep the loop alive, so weak references to loops are not enough.
+    """
+
+    def __init__(self, verify: bool = True, limits: httpx.Limits = DEFAULT_LIMITS, http2: bool = HTTP2_AVAILABLE):
+        self.verify = verify
+        self.limits = limits
+        self.http2 = http2
+        self.__transports: Dict[asyncio.AbstractEventLoop, httpx.AsyncHTTPTransport] = {}
+        self.__lock = threading.Lock()
+
+    def __transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        transport = self.__transports.get(loop)
+        if transport is None:
+            with self.__lock:
+                transport = self.__transports.get(loop)
+                if transport is None:
+                    for closed_loop in [other for other in self.__transports if other.is_closed()]:
+                        del self.__transports[closed_loop]
+                    transport = httpx.AsyncHTTPTransport(verify=self.verify, limits=self.limits, http2=self.http2)
+                    self.__transports[loop] = transport
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.__transport().handle_async_request(request)
+
+    async def aclose(self):
+        transport = self.__transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+def _key(kind: str, base_url: str, verify: bool, limits: httpx.Limits) -> Hashable:
+    # Limits are not hashable
+    return kind, base_url, verify, limits.max_connections, limits.max_keepalive_connections, limits.keepalive_expiry
+
+
+def _shared(registry: dict, key: Hashable, factory):
+    with _lock:
+        if key not in registry:
+            registry[key] = factory()
+        return registry[key]
+
+
+def sync_transport(base_url: str, verify: bool = True, limits: httpx.Limits = DEFAULT_LIMITS) -> httpx.HTTPTransport:
+    """Pooled transport shared by all sync clients of base_url"""
+    return _shared(_transports, _key("sync", base_url, verify, limits),
+                   lambda: httpx.HTTPTransport(verify=verify, limits=limits, http2=HTTP2_AVAILABLE))
+
+
+def async_transport(base_url: str, verify: bool = True, limits: httpx.Limits = DEFAULT_LIMITS) -> LoopLocalAsyncTransport:
+    """Pooled transport shared by all async clients of base_url"""
+    return _shared(_transports, _key("async", base_url, verify, limits),
+                   lambda: LoopLocalAsyncTransport(verify=verify, limits=limits))
+
+
+def sync_client(base_url: str, verify: bool = True, limits: httpx.Limits = DEFAULT_LIMITS) -> httpx.Client:
+    return _shared(_clients, _key("sync", base_url, verify, limits),
+                   lambda: httpx.Client(transport=sync_transport(base_url, verify, limits)))
+
+
+def async_client(base_url: str, verify: bool = True, limits: httpx.Limits = DEFAULT_LIMITS) -> httpx.AsyncClient:
+    return _shared(_clients, _key("async", base_url, verify, limits),
+                   lambda: httpx.AsyncClient(transport=async_transport(base_url, verify, limits)))
@@ -1,13 +1,21 @@
 import asyncio
-from langchain_core.callbacks import CallbackManagerForToolRun
+import functools
+import threading
+from langchain_core.callbacks import CallbackManagerForToolRun, AsyncCallbackManagerForToolRun
 from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage, BaseMessage
-from langchain_core.tools import BaseTool, ArgsSchema
+from langchain_core.messages.utils import message_chunk_to_message
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool, ArgsSchema, StructuredTool
+from langgraph.config import get_stream_writer
 from langgraph.graph import START, END, StateGraph
 from pydantic import BaseModel, Field
-from typing_extensions import TypedDict, List, Optional, Any, Tuple
+from typing_extensions import TypedDict, List, Optional, Any, Tuple, Callable
 
 import prompt_templates
+import tracing
+from background_loop import shared_loop
+from context_window import ContextWindow
 from logger import Logger
 
 
@@ -25,6 +33,21 @@ def isinstance_of_LLMChatState(obj: dict) -> bool:
     return isinstance(obj, dict) and all(k in obj for k in LLMChatState.__annotations__)
 
 
+# Graph config requesting nodes to stream model output as custom events
+STREAMING_CONFIG: RunnableConfig = {"configurable": {"stream_tokens": True}}
+
+
+def is_streaming(config: RunnableConfig) -> bool:
+    return bool(config and config.get("configurable", {}).get("stream_tokens"))
+
+
+def is_async_tool(tool: BaseTool) -> bool:
+    """True if tool implements its own coroutine instead of running sync code in executor"""
+    if isinstance(tool, StructuredTool):
+        return tool.coroutine is not None
+    return isinstance(tool, BaseTool) and type(tool)._arun is not BaseTool._arun
+
+
 class ToolConfig:
     def __init__(self, callable_tool, direct_response=False, auto_exec=True, is_mcp_tool=False, enabled=True):
         self.function = callable_tool
@@ -47,17 +70,25 @@ class LLMChatAgent(Logger):
     """
 
     def __init__(self, agent_name: str, log_color: str, chat_model: BaseChatModel,
-                 system_message: str = prompt_templates.QA_ASSISTANT_INSTRUCTION, toolkit: dict = None):
+                 system_message: str = prompt_templates.QA_ASSISTANT_INSTRUCTION, toolkit: dict = None,
+                 max_parallel_tool_calls: int = 4, context_window: ContextWindow = None):
 
         self.name = agent_name
         self.color = log_color
         self.log("Initializing...")
         self.__llm = chat_model
+        self.__llm_with_tools = None
+        self.__llm_with_tools_key = None
         self.__system_instruction = system_message
         self.__toolkit = toolkit
-        self.__graph = self.build_workflow()
+        # Graphs are compiled once and shared by all agents, nodes get the agent from graph config
+        self.__graph = self.__compiled_workflow()
+        self.__async_graph = self.__compiled_workflow(asynchronous=True)
         self.__history = []
         self.__max_iterations = 4
+        self.__max_parallel_tool_calls = max_parallel_tool_calls
+        self.__context_window = context_window
+        self.__lock = threading.Lock()
         if self.__system_instruction:
             self.__remember(SystemMessage(content=self.__system_instruction))
 
@@ -65,9 +96,11 @@ class LLMChatAgent(Logger):
             self.__remember(
                 SystemMessage(content=self.TOOL_CALLING_SYSTEM_MESSAGE.format(max_attempts=self.__max_iterations-1))
             )
+        self.__instructions = list(self.__history)
 
     def set_model(self, chat_model: BaseChatModel):
         self.__llm = chat_model
+        self.__llm_with_tools = None
         self.log(f"!!! Model changed to: {self.get_llm_name()}")
 
     def get_toolkit(self):
@@ -79,31 +112,98 @@ class LLMChatAgent(Logger):
     def set_history(self, history):
         self.__history = history
 
+    def clear_history(self):
+        """Start new conversation, only system instructions are kept"""
+        self.__history = list(self.__instructions)
+
     def __remember(self, message: BaseMessage, verbose: bool = True):
         if verbose:
-            self.log_hist(message.pretty_repr())
+            # Message is formatted only if it is logged
+            self.log_hist(message.pretty_repr)
         self.__history.append(message)
         return message
 
     def __log_action(self, action: str, iteration: int):
         self.log(">>> {action} ({iter}) >>>", action=action, iter=f"iteration: {iteration}")
 
-    def __generate(self, state: LLMChatState):
-
-        iterations = state.get("iterations", 0)
-
-        if iterations == 0:
-            self.log("********** {action} **********", action="START PROCESSING REQUEST")
-            self.__remember(HumanMessage(content=state["query"]))
-
-        self.__log_action("GENERATE", iterations + 1)
-
-        tools = [tool.function for tool in self.__toolkit.values() if tool.enabled]
-
-        llm_with_tools = self.__llm.bind_tools(tools)
-        llm_response = llm_with_tools.invoke(self.__history)
-
-        return {"generated": self.__remember(llm_response), "output": llm_response.content, "iterations": iterations}
+    @tracing.traced("node.generate")
+    def __generate(self, state: LLMChatState, config: RunnableConfig):
+        if self.__start_request(state) and self.__context_window:
+            self.__history = self.__context_window.compact(self.__history, self.get_llm_name())
+        llm_with_tools = self.__prepare_generate(state)
+        with self.__llm_span() as llm_span:
+            if not is_streaming(config):
+                llm_response = llm_with_tools.invoke(self.__history)
+            else:
+                writer = get_stream_writer()
+                writer({"type": "llm_start", "iteration": state.get("iterations", 0) + 1})
+                first_token = tracing.FirstTokenTimer(llm_span)
+                llm_response = None
+                for chunk in llm_with_tools.stream(self.__history):
+                    first_token.token()
+                    if chunk.content:
+                        writer({"type": "token", "content": chunk.content})
+                    llm_response = chunk if llm_response is None else llm_response + chunk
+                llm_response = message_chunk_to_message(llm_response)
+            tracing.record_llm_response(llm_span, llm_response)
+        return self.__generated(state, llm_response)
+
+    @tracing.traced("node.generate")
+    async def __agenerate(self, state: LLMChatState, config: RunnableConfig):
+        if self.__start_request(state) and self.__context_window:
+            self.__history = await self.__context_window.acompact(self.__history, self.get_llm_name())
+        llm_with_tools = self.__prepare_generate(state)
+        with self.__llm_span() as llm_span:
+            if not is_streaming(config):
+                llm_response = await llm_with_tools.ainvoke(self.__history)
+            else:
+                writer = get_stream_writer()
+                writer({"type": "llm_start", "iteration": state.get("iterations", 0) + 1})
+                first_token = tracing.FirstTokenTimer(llm_span)
+                llm_response = None
+                async for chunk in llm_with_tools.astream(self.__history):
+                    first_token.token()
+                    if chunk.content:
+                        writer({"type": "token", "content": chunk.content})
+                    llm_response = chunk if llm_response is None else llm_response + chunk
+                llm_response = message_chunk_to_message(llm_response)
+            tracing.record_llm_response(llm_span, llm_response)
+        return self.__generated(state, llm_response)
+
+    def __llm_span(self):
+        return tracing.span("llm.generate", kind="client", **{"gen_ai.request.model": self.get_llm_name(),
+                                                              "gen_ai.input.messages": len(self.__history)})
+
+    def __start_request(self, state: LLMChatState) -> bool:
+        """Add user query to history on first iteration, return True if it is first iteration"""
+        if state.get("iterations", 0) > 0:
+            return False
+        self.log("********** {action} **********", action="START PROCESSING REQUEST")
+        self.__remember(HumanMessage(content=state["query"]))
+        return True
+
+    def __prepare_generate(self, state: LLMChatState):
+        self.__log_action("GENERATE", state.get("iterations", 0) + 1)
+
+        return self.__get_llm_with_tools()
+
+    def __get_llm_with_tools(self):
+        """
+        Return chat model bound to enabled tools.
+        bind_tools serializes schema of every tool, so bound model is reused until model is changed,
+        tool is enabled/disabled or tools are added to toolkit (e.g. when MCP server is attached)
+        """
+        enabled_tools = tuple((name, id(tool.function)) for name, tool in self.__toolkit.items() if tool.enabled)
+        key = (id(self.__llm), enabled_tools)
+        if self.__llm_with_tools is None or self.__llm_with_tools_key != key:
+            tools = [tool.function for tool in self.__toolkit.values() if tool.enabled]
+            self.__llm_with_tools = self.__llm.bind_tools(tools)
+            self.__llm_with_tools_key = key
+        return self.__llm_with_tools
+
+    def __generated(self, state: LLMChatState, llm_response: BaseMessage):
+        return {"generated": self.__remember(llm_response), "output": llm_response.content,
+                "iterations": state.get("iterations", 0)}
 
     def __decide_next_action(self, state: LLMChatState):
         llm_response = state["generated"]
@@ -120,48 +220,38 @@ class LLMChatAgent(Logger):
             self.log("********** {action} **********", action="FINISH PROCESSING REQUEST")
             return "end"
 
+    @tracing.traced("node.handle_tool_calls")
     def __handle_tool_calls(self, state: LLMChatState):
+        self.__log_action("HANDLE TOOL CALLS", state['iterations'] + 1)
+        tool_calls = state["generated"].tool_calls
+        # Tool calls are executed concurrently on shared background loop (same loop as MCP sessions),
+        # results are handled in original order
+        tool_messages = shared_loop.run(
+            self.__execute_tool_calls(tool_calls, state['execute_mode'], get_stream_writer())
+        )
+        return self.__handle_tool_messages(state, tool_messages)
 
+    @tracing.traced("node.handle_tool_calls")
+    async def __ahandle_tool_calls(self, state: LLMChatState):
         self.__log_action("HANDLE TOOL CALLS", state['iterations'] + 1)
+        tool_calls = state["generated"].tool_calls
+        tool_messages = await self.__execute_tool_calls(tool_calls, state['execute_mode'], get_stream_writer())
+        return self.__handle_tool_messages(state, tool_messages)
 
+    def __handle_tool_messages(self, state: LLMChatState, tool_messages: List[ToolMessage]):
         llm_response = state["generated"]
         content = ""
         generated = None
         direct_response = False
         artifacts = state["artifacts"] if state.get("artifacts") else []
-        for tool_call in llm_response.tool_calls:
+
+        for tool_call, tool_msg in zip(llm_response.tool_calls, tool_messages):
 
             tool: ToolConfig = self.__toolkit[tool_call["name"]]
-            args = ', '.join([f"{k}=`{v}`" for k, v in tool_call['args'].items()])
-
-            if tool.auto_exec or state['execute_mode']:
-                self.log("Calling {tool_name}({args})", tool_name=tool_call['name'], args=args)
-                # try:
-                # Handle both sync and async tools properly
-                if tool.is_mcp_tool and hasattr(tool.function, 'ainvoke'):
-                    # For MCP tools, create a new event loop
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    try:
-                        tool_msg = loop.run_until_complete(tool.function.ainvoke(tool_call))
-                    finally:
-                        loop.close()
-                else:
-                    tool_msg = tool.function.invoke(tool_call)
-
-                # except Exception as e:
-                #     self.log("Tool execution failed: {error}", error=str(e))
-                #     tool_msg = ToolMessage(
-                #         f"Tool execution failed: {str(e)}",
-                #         tool_call_id=tool_call["id"]
-                #     )
-            else:
-                self.log("Requested {tool_name}({args})", tool_name=tool_call['name'], args=args)
-                tool_msg = ToolMessage(f"User approval required to execute {tool_call['name']}({args})", tool_call_id=tool_call["id"])
 
             self.log("Received result of type {artifact_type}", artifact_type=type(tool_msg.artifact if tool_msg.artifact is not None else tool_msg.content))
             artifacts.append({
-                "input": f"{tool_call['name']}({args})",
+                "input": f"{tool_call['name']}({self.__format_args(tool_call)})",
                 "result": tool_msg.artifact if tool_msg.artifact is not None else tool_msg.content
             })
 
@@ -177,18 +267,73 @@ class LLMChatAgent(Logger):
 
         return {"generated": generated, "output": content, "artifacts": artifacts, "iterations": state["iterations"] + 1}
 
-    def build_workflow(self):
+    async def __execute_tool_calls(self, tool_calls: List[dict], execute_mode: bool,
+                                   writer: Callable[[dict], None]) -> List[ToolMessage]:
+        """Execute tool calls concurrently, at most max_parallel_tool_calls at a time"""
+        semaphore = asyncio.Semaphore(self.__max_parallel_tool_calls)
+
+        async def execute(tool_call: dict) -> ToolMessage:
+            async with semaphore:
+                tool_input = f"{tool_call['name']}({self.__format_args(tool_call)})"
+                writer({"type": "tool_start", "id": tool_call["id"], "input": tool_input})
+                tool_msg = await self.__execute_tool_call(tool_call, execute_mode)
+                writer({
+                    "type": "tool_end", "id": tool_call["id"], "input": tool_input,
+                    "result": tool_msg.artifact if tool_msg.artifact is not None else tool_msg.content
+                })
+                return tool_msg
+
+        return await asyncio.gather(*(execute(tool_call) for tool_call in tool_calls))
+
+    async def __execute_tool_call(self, tool_call: dict, execute_mode: bool) -> ToolMessage:
+        tool: ToolConfig = self.__toolkit[tool_call["name"]]
+        args = self.__format_args(tool_call)
+
+        with tracing.span("tool.call", **{"tool.name": tool_call["name"], "tool.mcp": tool.is_mcp_tool}) as tool_span:
+            if not (tool.auto_exec or execute_mode):
+                self.log("Requested {tool_name}({args})", tool_name=tool_call['name'], args=args)
+                tool_span.set(**{"tool.approved": False})
+                return ToolMessage(f"User approval required to execute {tool_call['name']}({args})", tool_call_id=tool_call["id"])
+
+            self.log("Calling {tool_name}({args})", tool_name=tool_call['name'], args=args)
+            # MCP and other natively async tools are awaited on this loop, sync tools are run in a worker thread
+            if tool.is_mcp_tool or is_async_tool(tool.function):
+                return await tool.function.ainvoke(tool_call)
+            return await asyncio.to_thread(tool.function.invoke, tool_call)
+
+    @staticmethod
+    def __format_args(tool_call: dict) -> str:
+        return ', '.join([f"{k}=`{v}`" for k, v in tool_call['args'].items()])
+
+    @classmethod
+    def build_workflow(cls, asynchronous: bool = False):
+        """Build graph of any agent, the agent processing request is passed in config (see __config)"""
         workflow = StateGraph(LLMChatState)
 
-        # Define the nodes
-        workflow.add_node("generate", self.__generate)
-        workflow.add_node("handle_tool_calls", self.__handle_tool_calls)
+        def generate(state: LLMChatState, config: RunnableConfig):
+            return cls.__agent(config).__generate(state, config)
+
+        async def agenerate(state: LLMChatState, config: RunnableConfig):
+            return await cls.__agent(config).__agenerate(state, config)
+
+        def handle_tool_calls(state: LLMChatState, config: RunnableConfig):
+            return cls.__agent(config).__handle_tool_calls(state)
+
+        async def ahandle_tool_calls(state: LLMChatState, config: RunnableConfig):
+            return await cls.__agent(config).__ahandle_tool_calls(state)
+
+        def decide_next_action(state: LLMChatState, config: RunnableConfig):
+            return cls.__agent(config).__decide_next_action(state)
+
+        # Define the nodes, async graph awaits chat model and tools instead of blocking
+        workflow.add_node("generate", agenerate if asynchronous else generate)
+        workflow.add_node("handle_tool_calls", ahandle_tool_calls if asynchronous else handle_tool_calls)
 
         # Build graph
         workflow.add_edge(START, "generate")
         workflow.add_conditional_edges(
             "generate",
-            self.__decide_next_action,
+            decide_next_action,
             {
                 "end": END,
                 "handle_tool_calls": "handle_tool_calls",
@@ -196,7 +341,7 @@ class LLMChatAgent(Logger):
         )
         workflow.add_conditional_edges(
             "handle_tool_calls",
-            self.__decide_next_action,
+            decide_next_action,
             {
                 "end": END,
                 "generate": "generate",
@@ -205,8 +350,101 @@ class LLMChatAgent(Logger):
 
         return workflow.compile()
 
+    @classmethod
+    @functools.cache
+    def __compiled_workflow(cls, asynchronous: bool = False):
+        return cls.build_workflow(asynchronous)
+
+    @staticmethod
+    def __agent(config: RunnableConfig) -> "LLMChatAgent":
+        return config["configurable"]["agent"]
+
+    def __config(self, streaming: bool = False) -> RunnableConfig:
+        """Graph config passing this agent to nodes, optionally requesting them to stream model output"""
+        if streaming:
+            return {"configurable": {**STREAMING_CONFIG["configurable"], "agent": self}}
+        return {"configurable": {"agent": self}}
+
     def invoke(self, query: str, execute_mode: bool = False):
-        return self.__graph.invoke({"query": query, "execute_mode": execute_mode})
+        # History is shared by all requests to this agent, e.g. parallel calls of the same CallAgentTool
+        with self.__lock, self.__agent_span():
+            return self.__graph.invoke({"query": query, "execute_mode": execute_mode}, config=self.__config())
+
+    def stream(self, query: str, execute_mode: bool = False):
+        """
+        Process request and yield events as they happen:
+            {"type": "llm_start", "iteration": int} - model started generating next message
+            {"type": "token", "content": str} - chunk of generated message
+            {"type": "tool_start", "id": str, "input": str} - tool call started
+            {"type": "tool_end", "id": str, "input": str, "result": Any} - tool call finished with artifact or content
+            {"type": "final", "state": LLMChatState} - final state, same as returned by invoke
+        """
+        with self.__lock, self.__agent_span():
+            state = None
+            for mode, chunk in self.__graph.stream({"query": query, "execute_mode": execute_mode},
+                                                   config=self.__config(streaming=True),
+                                                   stream_mode=["custom", "values"]):
+                if mode == "custom":
+                    yield chunk
+                else:
+                    state = chunk
+            yield {"type": "final", "state": state}
+
+    async def ainvoke(self, query: str, execute_mode: bool = False):
+        """Async variant of invoke, chat model and tools are awaited on the caller's event loop"""
+        await self.__acquire_lock()
+        try:
+            with self.__agent_span():
+                return await self.__async_graph.ainvoke({"query": query, "execute_mode": execute_mode},
+                                                        config=self.__config())
+        finally:
+            self.__lock.release()
+
+    async def astream(self, query: str, execute_mode: bool = False, stream_mode: str = "updates"):
+        """
+        Async iterator over graph node updates (or full states with stream_mode="values"),
+        stream_mode="custom" yields the same events as stream() except the final one
+        """
+        # Lock is held while caller consumes chunks, close the iterator (aclose) to release it early
+        await self.__acquire_lock()
+        try:
+            with self.__agent_span():
+                async for chunk in self.__async_graph.astream({"query": query, "execute_mode": execute_mode},
+                                                              config=self.__config(streaming=True),
+                                                              stream_mode=stream_mode):
+                    yield chunk
+        finally:
+            self.__lock.release()
+
+    async def __acquire_lock(self):
+        """
+        Acquire lock shared with sync invoke/stream without blocking event loop. When caller is cancelled
+        while waiting, lock acquired by worker thread afterwards is released, so the agent doesn't deadlock
+        """
+        # Release doesn't depend on caller's loop, which may be closed before worker thread gets the lock
+        handoff = threading.Lock()
+        state = {"acquired": False, "abandoned": False}
+
+        def acquire():
+            self.__lock.acquire()
+            with handoff:
+                if state["abandoned"]:
+                    self.__lock.release()
+                else:
+                    state["acquired"] = True
+
+        try:
+            await asyncio.shield(asyncio.to_thread(acquire))
+        except asyncio.CancelledError:
+            with handoff:
+                state["abandoned"] = True
+                if state["acquired"]:
+                    self.__lock.release()
+            raise
+
+    def __agent_span(self):
+        """Root span of request, or child of tool call span when agent is called by another agent"""
+        return tracing.span("agent", **{"agent.name": self.name, "gen_ai.request.model": self.get_llm_name()})
 
     def get_graph_image(self):
         return self.__graph.get_graph().draw_mermaid_png()
@@ -246,3 +484,11 @@ class CallAgentTool(BaseTool):
         output = f"Response to request `{query}` is: \n {response['output']}"
         return output, response
 
+    async def _arun(
+            self, query: str, run_manager: Optional[AsyncCallbackManagerForToolRun] = None
+    ) -> Tuple[str, dict]:
+        """Use the tool asynchronously."""
+        response = await self.agent.ainvoke(query, True)
+        output = f"Response to request `{query}` is: \n {response['output']}"
+        return output, response
+
@@ -1,42 +1,74 @@
-import asyncio
-import os
-import pickle
+import copy
+import time
 from datetime import datetime
 
 import pandas as pd
+import pyarrow as pa
 import plotly.express as px
 import streamlit as st
 
 import tools
-from mcp_tool_client import MCPClientFactory
+from background_loop import shared_loop
+from context_window import ContextWindow
+import resources
+from command_executor import OutputBuffer
+from history_store import HistoryStore
 from logger import Logger
 from llm_chat_agent import LLMChatAgent, ToolConfig, CallAgentTool, isinstance_of_LLMChatState
 from models import Models
-from sql_executor_agent import SQLExecutorAgent
-from sqllite_datasource import SqlLiteDatasource
+from sqllite_datasource import QueryResult
 
 
 OLLAMA_BASE_URL = st.secrets.get("OLLAMA_BASE_URL", "http://localhost:11434")
 DEFAULT_AGENT_MODEL = Models.LLAMA_3B
 DEFAULT_CODER_MODEL = Models.LLAMA_3B
 
+# Number of chat messages loaded from history store at once and number of messages rendered on the page,
+# earlier messages are shown page by page with "Load earlier messages"
+HISTORY_PAGE_SIZE = 20
+VISIBLE_MESSAGES = 20
+
 HR_ASSISTANT_DESCRIPTION = """
 Answers HR related questions.  
 Call this whenever you need information about: departments and employees, including salaries
 """
 
 
+HR_DB_PATH = "data/test-hr.db"
+SQL_CACHE_PATH = "data/sql-cache.db"
+MCP_TOOLS_CACHE_PATH = "data/mcp-tools-cache.db"
+# Seconds between renders of output of running command
+COMMAND_RENDER_INTERVAL = 0.2
+HISTORY_PATH = "data/history"
+AGENT_TEMPERATURE = 0.1
+CODER_TEMPERATURE = 0.3
+
+
+def get_history_store() -> HistoryStore:
+    """Chat sessions store shared by all sessions"""
+    return resources.history_store(HISTORY_PATH)
+
+
+def get_db_agent(coder_model_name: Models):
+    """SQL executor agent shared by all sessions using the same coder model"""
+    return resources.sql_executor_agent(HR_DB_PATH, coder_model_name, OLLAMA_BASE_URL, CODER_TEMPERATURE,
+                                        SQL_CACHE_PATH)
+
+
 def create_agents(coder_model_name: Models, chat_model_name: Models):
 
-    chat_model = Models.create_chat(chat_model_name, base_url=OLLAMA_BASE_URL, temperature=0.1)
-    coder_model = Models.create_chat(coder_model_name, base_url=OLLAMA_BASE_URL, temperature=0.3)
+    # Chat models and compiled agent graphs are shared, per session agents keep conversation history
+    # and toolkit (tools are enabled and MCP tools are attached per session)
+    chat_model = resources.chat_model(chat_model_name, OLLAMA_BASE_URL, AGENT_TEMPERATURE)
+    coder_model = resources.chat_model(coder_model_name, OLLAMA_BASE_URL, CODER_TEMPERATURE)
 
     db_agent = LLMChatAgent(
         "DB Retrieval Agent", Logger.GREEN, coder_model,
         system_message="You are Database retrieval agent. " +
                        "Convert user query to SQL and call sql_exec_tool to execute SQL and get data. " +
                        "When generating final response, just return correct response generated by tool.",
-        toolkit={"sql_exec_tool": ToolConfig(tools.sql_exec_tool, False, True)}
+        toolkit={"sql_exec_tool": ToolConfig(tools.sql_exec_tool, False, True)},
+        context_window=ContextWindow()
     )
 
     db_retrieval_tool = CallAgentTool(
@@ -54,13 +86,24 @@ def create_agents(coder_model_name: Models, chat_model_name: Models):
         "command_exec_tool": ToolConfig(tools.command_exec_tool, False, False)
     }
 
-    return db_agent, LLMChatAgent("User Assistant Agent", Logger.BLUE, chat_model, toolkit=toolkit)
+    return db_agent, LLMChatAgent("User Assistant Agent", Logger.BLUE, chat_model, toolkit=toolkit,
+                                  context_window=ContextWindow(summary_model=coder_model))
 
 
 def init_session():
     if len(st.session_state.keys()) == 0:
         print("Initializing app session")
         st.session_state.messages = []
+        # Session in history store, created when first message is sent.
+        # history_start is position of earliest loaded message when earlier messages are not loaded yet
+        st.session_state.session_id = None
+        st.session_state.history_start = None
+        st.session_state.visible_messages = VISIBLE_MESSAGES
+        # Responses parsed into thoughts and text by message id
+        st.session_state.parsed_responses = {}
+        # Attached MCP clients and names of their tools in toolkit of assistant
+        st.session_state.mcp_clients = []
+        st.session_state.mcp_tools = {}
         st.session_state.models = (
             Models.LLAMA_3B.value,
             Models.QWEN25_CODER_7B.value,
@@ -76,8 +119,7 @@ def init_session():
             Models(st.secrets.get("AGENT_MODEL")) or DEFAULT_AGENT_MODEL
         )
 
-        coder_model = Models.create_chat(coder_model_name, base_url=OLLAMA_BASE_URL, temperature=0.3)
-        st.session_state.DBAgent = SQLExecutorAgent(SqlLiteDatasource("data/test-hr.db"), coder_model)
+        st.session_state.DBAgent = get_db_agent(coder_model_name)
 
 
 server_params_help = """
@@ -93,6 +135,16 @@ or
 "encoding": "utf-8"
 }  
 ```
+or  
+• JSON configuration of several servers, their tools are named `server__tool`:  
+```json  
+{
+"mcpServers": {
+  "sqlite": {"command": "uvx", "args": ["mcp-server-sqlite", "--db-path", "data/test-hr.db"]},
+  "remote": {"url": "http://localhost:8080/sse", "timeout": 10}
+}
+}  
+```
 """
 
 
@@ -107,7 +159,7 @@ def build_sidebar():
         )
 
         if option != st.session_state.assistant.get_llm_name():
-            st.session_state.assistant.set_model(Models.create_chat(Models(option), base_url=OLLAMA_BASE_URL, temperature=0.1))
+            st.session_state.assistant.set_model(resources.chat_model(Models(option), OLLAMA_BASE_URL, AGENT_TEMPERATURE))
 
         coder_option = st.selectbox(
             "Coder Model:",
@@ -116,9 +168,8 @@ def build_sidebar():
         )
 
         if coder_option != st.session_state.coder.get_llm_name():
-            model = Models.create_chat(Models(coder_option), base_url=OLLAMA_BASE_URL, temperature=0.3)
-            st.session_state.coder.set_model(model)
-            st.session_state.DBAgent = SQLExecutorAgent(SqlLiteDatasource("data/test-hr.db"), model)
+            st.session_state.coder.set_model(resources.chat_model(Models(coder_option), OLLAMA_BASE_URL, CODER_TEMPERATURE))
+            st.session_state.DBAgent = get_db_agent(Models(coder_option))
 
         if st.toggle("Lang Chain graph"):
             st.image(st.session_state.assistant.get_graph_image())
@@ -137,20 +188,26 @@ def build_sidebar():
             if st.button("Attach", type="primary") and server_params:
                 with st.spinner("Loading..."):
                     try:
-                        mcp_client = MCPClientFactory.create_from(server_params)
-
-                        try:
-                            # Use platform-agnostic event loop creation
-                            # On Windows, this creates ProactorEventLoop; on Unix, the default event loop
-                            loop = asyncio.new_event_loop()
-                            asyncio.set_event_loop(loop)
-                            mcp_toolkit = loop.run_until_complete(mcp_client.get_toolkit())
-                        finally:
-                            loop.close()
-
-                        toolkit.update(mcp_toolkit)
+                        mcp_client = resources.mcp_client(server_params, MCP_TOOLS_CACHE_PATH)
+                        # Attaching client again retries its servers which failed before
+                        if getattr(mcp_client, "errors", None):
+                            shared_loop.run(mcp_client.reconnect())
+                        # Connect on the loop running MCP sessions instead of creating event loop per attach
+                        shared_loop.run(mcp_client.get_toolkit())
+
+                        for server, error in getattr(mcp_client, "errors", {}).items():
+                            st.warning(f"MCP server '{server}' is not available: {error}")
+
+                        if mcp_client not in st.session_state.mcp_clients:
+                            st.session_state.mcp_clients.append(mcp_client)
+                        sync_mcp_tools(toolkit)
                     except ValueError as e:
                         st.error(e)
+                    except (ConnectionError, TimeoutError) as e:
+                        st.error(f"Unable to connect to MCP server: {e!r}")
+            else:
+                sync_mcp_tools(toolkit)
+
             col1, col2 = st.columns(2)
             col1.write("tool")
             col2.write("auto-approval")
@@ -165,60 +222,114 @@ def build_sidebar():
                     if tool.is_mcp_tool:
                         tool.auto_exec = st.checkbox("-", tool.auto_exec, key=f"approval-cb-{name}",  label_visibility="hidden")
 
-        pkl_files = get_pkl_files()
-        if pkl_files:
-            selected_file = st.selectbox(
-                "Select history file:",
-                options=pkl_files,
-                key="history_file"
+        store = get_history_store()
+        sessions = {session["session_id"]: session for session in store.list_sessions()}
+        if sessions:
+            selected_session = st.selectbox(
+                "Select history session:",
+                options=list(sessions),
+                format_func=lambda session_id: format_session(sessions[session_id]),
+                key="history_session"
             )
 
-        load_col, save_col = st.columns(2, vertical_alignment="bottom")
-        if pkl_files:
+        load_col, new_col = st.columns(2, vertical_alignment="bottom")
+        if sessions:
             if load_col.button("Load history", key="load_history_button",  width="stretch"):
                 try:
-                    with open(os.path.join("data", selected_file), 'rb') as f:
-                        data = pickle.load(f)
-                        st.session_state.messages = data["chat_messages"]
-                        st.session_state.assistant.set_history(data["agent_messages"])
+                    load_session(selected_session)
                     st.rerun()
                 except Exception as e:
-                    st.error(f"unable to load history file: {e}")
-
-        if save_col.button("Save history", key="save_history_button", width="stretch"):
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"data/history-{timestamp}.pkl"
-            data = {
-                "chat_messages": st.session_state.messages,
-                "agent_messages":  st.session_state.assistant.get_history()
-            }
-            with open(filename, 'wb') as f:
-                pickle.dump(data, f)
+                    st.error(f"unable to load history session: {e}")
+
+        if new_col.button("New chat", key="new_chat_button", width="stretch"):
+            st.session_state.messages = []
+            st.session_state.session_id = None
+            st.session_state.history_start = None
+            st.session_state.visible_messages = VISIBLE_MESSAGES
+            st.session_state.parsed_responses = {}
+            st.session_state.assistant.clear_history()
             st.rerun()
 
         if st.button("About", key="about_button",  width="stretch"):
             show_about()
 
 
-def get_pkl_files(directory="data"):
-    """Get all .pkl files from the specified directory"""
-    if not os.path.exists(directory):
-        return []
-    return [f for f in os.listdir(directory) if f.endswith('.pkl')]
+def sync_mcp_tools(toolkit: dict):
+    """
+    Bring tools of attached MCP clients in toolkit up to date, servers can change their tools at any time.
+    Clients are shared by sessions, so tools are copied to keep enabled and auto-approval flags per session
+    """
+    for mcp_client in st.session_state.mcp_clients:
+        client_toolkit = mcp_client.toolkit
+        attached = st.session_state.mcp_tools.get(id(mcp_client), set())
+        for name in attached - client_toolkit.keys():
+            toolkit.pop(name, None)
+        for name, tool in client_toolkit.items():
+            if name in toolkit:
+                toolkit[name].function = tool.function
+            else:
+                toolkit[name] = copy.copy(tool)
+        st.session_state.mcp_tools[id(mcp_client)] = set(client_toolkit)
 
-def run_command(state):
-    placeholder = st.empty()
-    with placeholder.container():
-        with st.spinner("Thinking..."):
-            output = tools.command_exec_tool(state['command'])
-            state['output'] = output
-    with placeholder.container():
-        st.markdown(f"```\n\n{output}\n\n```")
+
+def format_session(session: dict) -> str:
+    updated_at = datetime.fromtimestamp(session["updated_at"]).strftime("%Y-%m-%d %H:%M")
+    return f"{updated_at} {session['title']}"
 
 
-def draw_pie_chart(id: str, df: pd.DataFrame):
-    # Create the pie chart using Plotly Express
-    fig = px.pie(df, values=df.columns[1], names=df.columns[0], title='Pie Chart')
+def load_session(session_id: str):
+    """Load last page of chat messages and agent history of stored session"""
+    store = get_history_store()
+    messages = store.load_chat_messages(session_id, limit=HISTORY_PAGE_SIZE)
+    st.session_state.messages = messages
+    st.session_state.session_id = session_id
+    st.session_state.history_start = messages[0]["seq"] if messages and messages[0]["seq"] > 0 else None
+    st.session_state.visible_messages = VISIBLE_MESSAGES
+    st.session_state.parsed_responses = {}
+    st.session_state.assistant.set_history(store.load_agent_history(session_id))
+
+
+def load_earlier_messages():
+    """Show previous page of messages, loading it from history store when all loaded messages are shown"""
+    st.session_state.visible_messages += VISIBLE_MESSAGES
+    if st.session_state.visible_messages <= len(st.session_state.messages) or st.session_state.history_start is None:
+        return
+    store = get_history_store()
+    messages = store.load_chat_messages(st.session_state.session_id, limit=HISTORY_PAGE_SIZE,
+                                        before=st.session_state.history_start)
+    st.session_state.messages = messages + st.session_state.messages
+    st.session_state.history_start = messages[0]["seq"] if messages and messages[0]["seq"] > 0 else None
+
+
+def save_message(message: dict):
+    """Append chat message and new messages of assistant agent to history store"""
+    store = get_history_store()
+    if st.session_state.session_id is None:
+        st.session_state.session_id = store.create_session(message["content"])
+    store.append_chat_message(st.session_state.session_id, message)
+    if message["role"] == "assistant":
+        store.save_agent_history(st.session_state.session_id, st.session_state.assistant.get_history())
+
+
+def run_command(state):
+    """Run command rendering its output as it is produced, only head and tail of large output are kept"""
+    placeholder = st.empty()
+    output = OutputBuffer(tools.command_executor.max_output_bytes)
+    rendered_at = 0.0
+    with st.spinner("Running..."):
+        for chunk in tools.run_subprocess(state['command']):
+            output.append(chunk)
+            if time.monotonic() - rendered_at > COMMAND_RENDER_INTERVAL:
+                placeholder.code(output.getvalue(), language=None)
+                rendered_at = time.monotonic()
+    state['output'] = output.getvalue()
+    placeholder.markdown(f"```\n\n{state['output']}\n\n```")
+
+
+def draw_pie_chart(id: str, data: pa.Table | pd.DataFrame):
+    # Create the pie chart using Plotly Express, Arrow table is passed as is
+    columns = data.column_names if isinstance(data, pa.Table) else data.columns
+    fig = px.pie(data, values=columns[1], names=columns[0], title='Pie Chart')
     # Display the chart in Streamlit
     st.plotly_chart(fig, key="pie-chart-" + id)
 
@@ -233,7 +344,11 @@ def artifacts_widget(artifacts, level: str = ""):
 
         result = artifact.get("result")
 
-        if isinstance(result, pd.DataFrame):
+        if isinstance(result, QueryResult):
+            if not result.is_error:
+                st.caption(result.summary())
+            st.dataframe(result.table, width="content")
+        elif isinstance(result, pd.DataFrame):
             st.dataframe(artifact.get("result"), width="content")
             # if st.button("pie chart", key="pie-chart-btn-" + id):
             #     message["draw_pie_chart"] = True
@@ -261,11 +376,15 @@ def print_assistant_response(message: dict):
             if message.get("run_command", False):
                 run_command(llm_response)
                 message["run_command"] = False
+                if st.session_state.session_id is not None:
+                    get_history_store().update_chat_message(st.session_state.session_id, message)
 
     elif llm_response.get('sql'):
         st.markdown(f"```\n\n{llm_response['result']['message']}\n\n```")
-        dataframe: pd.DataFrame = llm_response['result']['dataframe']
-        st.dataframe(dataframe, width="stretch")
+        data: QueryResult = llm_response['result'].get('data')
+        # Histories saved before QueryResult was introduced keep DataFrame under 'dataframe' key
+        table = data.table if data is not None else llm_response['result'].get('dataframe')
+        st.dataframe(table, width="stretch")
 
         with st.expander("See details"):
             st.write(f"`{llm_response['sql']}`")
@@ -275,21 +394,79 @@ def print_assistant_response(message: dict):
                 message["draw_pie_chart"] = True
 
         if message.get("draw_pie_chart", False):
-            draw_pie_chart(id, dataframe)
+            draw_pie_chart(id, table)
 
     else:
-        response = tools.parse_response(llm_response['output'])
+        response = parsed_response(message)
         artifacts = llm_response.get('artifacts')
         if artifacts or response.get("model-thoughts"):
-            with st.expander("See details"):
-                if artifacts:
-                    artifacts_widget(artifacts)
-                if response.get("model-thoughts"):
-                    st.info(f"💭 :orange-badge[**Model thoughts:**]\n\n{response['model-thoughts']}")                    
+            # Content of expander runs only when it is open: artifacts are not rendered for collapsed messages
+            details = st.expander("See details", key="details-" + id, on_change="rerun")
+            if details.open:
+                with details:
+                    if artifacts:
+                        artifacts_widget(artifacts)
+                    if response.get("model-thoughts"):
+                        st.info(f"💭 :orange-badge[**Model thoughts:**]\n\n{response['model-thoughts']}")
         st.write(response['response-text'])
         #st.write(f"```\n{llm_response['output']}\n```")
 
 
+def parsed_response(message: dict) -> dict:
+    """Response of assistant split into thoughts and text, parsed once per message"""
+    parsed = st.session_state.parsed_responses.get(message['id'])
+    if parsed is None:
+        parsed = tools.parse_response(message['content']['output'])
+        st.session_state.parsed_responses[message['id']] = parsed
+    return parsed
+
+
+@st.fragment
+def chat_message_fragment(message: dict):
+    """
+    Message rendered as fragment: widgets of one message (details, run it, pie chart)
+    rerun only this message instead of whole chat
+    """
+    with st.chat_message(message["role"]):
+        if message["role"] == "assistant":
+            print_assistant_response(message)
+        else:
+            st.markdown(message["content"])
+
+
+def stream_response(events, final_state: dict):
+    """
+    Render agent events as they arrive: tool calls and model thoughts go to status widget,
+    response text chunks are yielded to st.write_stream. Final agent state is copied to final_state
+    """
+    status = st.status("Thinking...", expanded=False)
+    thoughts_widget = status.empty()
+    thoughts = ""
+    splitter = tools.ResponseSplitter()
+
+    for event in events:
+        if event["type"] == "llm_start":
+            yield splitter.flush()[1]
+            splitter = tools.ResponseSplitter()
+        elif event["type"] == "token":
+            thought, text = splitter.feed(event["content"])
+            if thought:
+                thoughts += thought
+                thoughts_widget.info(f"💭 :orange-badge[**Model thoughts:**]\n\n{thoughts}")
+            if text:
+                yield text
+        elif event["type"] == "tool_start":
+            status.update(label=f"Calling {event['input']}...")
+        elif event["type"] == "tool_end":
+            status.markdown(f"**{event['input']}**")
+            status.update(label="Thinking...")
+        elif event["type"] == "final":
+            final_state.update(event["state"])
+
+    yield splitter.flush()[1]
+    status.update(label="Done", state="complete")
+
+
 def build_chat_page():
     st.title("Chat-Driven Tool Runner")
     st.text("This AI chat bot provides a natural language interface for system commands. ")
@@ -298,13 +475,14 @@ def build_chat_page():
     with st.expander("System instruction message"):
         st.write(st.session_state.assistant.get_system_instruction())
 
-    # Display chat messages from history on app rerun
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            if message["role"] == "assistant":
-                print_assistant_response(message)
-            else:
-                st.markdown(message["content"])
+    # Display last messages from history on app rerun
+    messages = st.session_state.messages
+    visible = messages[-st.session_state.visible_messages:]
+    if len(visible) < len(messages) or st.session_state.history_start is not None:
+        st.button("Load earlier messages", key="load_earlier_button", on_click=load_earlier_messages)
+
+    for message in visible:
+        chat_message_fragment(message)
 
     # React to user input
     if human_message := st.chat_input("Write your question"):
@@ -313,37 +491,37 @@ def build_chat_page():
         with st.chat_message("user"):
             st.markdown(human_message)
         # Add user message to chat history
-        st.session_state.messages.append(
-            {"id": tools.generate_random_string(16), "role": "user", "content": human_message}
-        )
+        user_message = {"id": tools.generate_random_string(16), "role": "user", "content": human_message}
+        st.session_state.messages.append(user_message)
+        save_message(user_message)
 
         # Display assistant response in chat message container
         with st.chat_message("assistant"):
 
             execute_command = False
             agent = st.session_state.assistant
-            # response = st.write_stream(response_generator())
+            if human_message.startswith("db>"):
+                agent = st.session_state.DBAgent
+                execute_command = True
+                query = human_message[3:]
+            elif human_message.startswith("$"):
+                execute_command = True
+                query = human_message[1:]
+            else:
+                query = human_message
+
             placeholder = st.empty()
+            final_state = {}
             with placeholder.container():
-                with st.spinner("Thinking..."):
-                    if human_message.startswith("db>"):
-                        agent = st.session_state.DBAgent
-                        execute_command = True
-                        query = human_message[3:]
-                    elif human_message.startswith("$"):
-                        execute_command = True
-                        query = human_message[1:]
-                    else:
-                        query = human_message
-
-                    llm_response = agent.invoke(query, execute_command)
+                st.write_stream(stream_response(agent.stream(query, execute_command), final_state))
 
             with placeholder.container():
-                message = {"id": tools.generate_random_string(16), "role": "assistant", "content": llm_response}
+                message = {"id": tools.generate_random_string(16), "role": "assistant", "content": final_state}
                 print_assistant_response(message)
 
         # Add assistant response to chat history
         st.session_state.messages.append(message)
+        save_message(message)
 
 
 def config():
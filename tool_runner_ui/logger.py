@@ -1,23 +1,106 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+from typing import Any, Callable, Optional
 
+# Logging is configured by environment variables:
+#   LOG_LEVEL - level of root logger, e.g. WARNING to turn off agents logging (default INFO)
+#   LOG_FORMAT - "text" for colored console output or "json" for one JSON object per line (default text)
+#   LOG_MAX_VALUE_LENGTH - logged values and messages longer than this are truncated (default 2000)
+DEFAULT_MAX_VALUE_LENGTH = 2000
 
-def setup_logging():
-    # Check if our specific handler is already added
+_logger = logging.getLogger("tool_runner_ui")
+_listener: Optional[logging.handlers.QueueListener] = None
+max_value_length = int(os.environ.get("LOG_MAX_VALUE_LENGTH", DEFAULT_MAX_VALUE_LENGTH))
+
+
+class lazy:
+    """
+    Log argument evaluated only when message is actually logged:
+    logger.log("History: {history}", history=lazy(lambda: format_history(messages)))
+    """
+    __slots__ = ("function",)
+
+    def __init__(self, function: Callable[[], Any]):
+        self.function = function
+
+
+def truncate(value: str, max_length: int = None) -> str:
+    max_length = max_value_length if max_length is None else max_length
+    if max_length <= 0 or len(value) <= max_length:
+        return value
+    return f"{value[:max_length]}... [{len(value) - max_length} more chars]"
+
+
+class ConsoleFormatter(logging.Formatter):
+    """Colored output, values of Logger messages are highlighted with color of the logger"""
+
+    def __init__(self):
+        super().__init__("\033[35m[%(asctime)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S %z")
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        color = getattr(record, "color", None)
+        if color is not None:
+            record.message = Logger.colored_message(record.agent, color, record.template, record.fields,
+                                                    record.history)
+        return super().formatMessage(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, values of Logger messages are kept as separate fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S%z"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if hasattr(record, "agent"):
+            entry["agent"] = record.agent
+            entry["template"] = record.template
+            entry["fields"] = record.fields
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class LoggerQueueHandler(logging.handlers.QueueHandler):
+    """Records of Logger are queued as is: they are formatted by listener thread, not by the caller"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if hasattr(record, "agent"):
+            return record
+        return super().prepare(record)
+
+
+def setup_logging(level: str = None, log_format: str = None):
+    """
+    Log to console through a queue: callers only put records to the queue,
+    formatting and writing is done by listener thread
+    """
+    global _listener
     logger = logging.getLogger()
-    
     # Look for existing console handlers to avoid duplicates
-    for handler in logger.handlers:
-        if isinstance(handler, logging.StreamHandler) and handler.stream.name == '<stderr>':
-            return  # Already set up
+    if _listener is not None or any(isinstance(handler, logging.StreamHandler) and
+                                    getattr(handler.stream, "name", None) == '<stderr>'
+                                    for handler in logger.handlers):
+        return  # Already set up
+
+    level = level or os.environ.get("LOG_LEVEL", "INFO")
+    log_format = log_format or os.environ.get("LOG_FORMAT", "text")
 
     console_handler = logging.StreamHandler()
-    console_handler.setFormatter(logging.Formatter(
-        "\033[35m[%(asctime)s] %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S %z",
-    ))
-    logger = logging.getLogger()
-    logger.addHandler(console_handler)
-    logger.setLevel(logging.INFO)
+    console_handler.setFormatter(JsonFormatter() if log_format == "json" else ConsoleFormatter())
+    _listener = logging.handlers.QueueListener(queue.SimpleQueue(), console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    logger.addHandler(LoggerQueueHandler(_listener.queue))
+    logger.setLevel(level.upper())
 
 
 class Logger:
@@ -58,38 +141,50 @@ class Logger:
     def log(self, message, **kvargs):
         """
         Log this as an info message highlighting specific parts using keyword arguments.
+        Nothing is formatted when INFO level is disabled.
         
         Args:
             message (str): Message template with placeholders in format '{key}'
             **kvargs: Keyword arguments that will be highlighted in the output
-                Each value will be colored with the agent's color
+                Each value will be colored with the agent's color, values wrapped in lazy() are evaluated
+                only when message is logged, long values are truncated
         
         Example:
             logger.log("Processing {file} with {status}", file="data.txt", status="SUCCESS")
             logger.log("Request from {ip} received", ip="192.168.1.1")
         """
-        color_code = self.BG_BLACK + self.color
-        message_color = self.BG_BLACK + self.WHITE
-
-        # Create a dict with colored values
-        colored_args = {k: f"{color_code}{v}{message_color}" for k, v in kvargs.items()}
-        
-        # Format the message first
-        formatted_message = message.format(**colored_args)
-        
-        # Add the agent name prefix
-        final_message = f"[{self.name}] {message_color}{formatted_message}"
-        
-        logging.info(color_code + final_message + self.RESET)
-
-    def log_hist(self, message):
+        if not _logger.isEnabledFor(logging.INFO):
+            return
+        fields = {k: truncate(str(v.function() if isinstance(v, lazy) else v)) for k, v in kvargs.items()}
+        _logger.info("[%s] %s", self.name, message.format(**fields),
+                     extra={"agent": self.name, "color": self.color, "template": message, "fields": fields,
+                            "history": False})
+
+    def log_hist(self, message: str | Callable[[], str]):
         """
-        Log this as a LLM message, identifying the agent
+        Log this as a LLM message, identifying the agent.
+        Message can be passed as function returning it, which is called only when message is logged
         """
-        color_code = self.BG_BLACK + self.color
-        message_color = self.BG_BLACK + self.YELLOW
-        message = f"[{self.name}]\n{message_color}{message}"
-        logging.info(color_code + message + self.RESET + "\n")
+        if not _logger.isEnabledFor(logging.INFO):
+            return
+        message = truncate(message() if callable(message) else message)
+        _logger.info("[%s]\n%s", self.name, message,
+                     extra={"agent": self.name, "color": self.color, "template": "{message}",
+                            "fields": {"message": message}, "history": True})
+
+    @classmethod
+    def colored_message(cls, name: str, color: str, template: str, fields: dict, history: bool = False) -> str:
+        color_code = cls.BG_BLACK + color
+        if history:
+            message_color = cls.BG_BLACK + cls.YELLOW
+            return f"{color_code}[{name}]\n{message_color}{fields['message']}{cls.RESET}\n"
+
+        message_color = cls.BG_BLACK + cls.WHITE
+        # Create a dict with colored values
+        colored_args = {k: f"{color_code}{v}{message_color}" for k, v in fields.items()}
+        formatted_message = template.format(**colored_args)
+        # Add the agent name prefix
+        return f"{color_code}[{name}] {message_color}{formatted_message}{cls.RESET}"
 
 
 setup_logging()
@@ -0,0 +1,72 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from mcp.types import Tool
+
+from logger import Logger
+
+
+class MCPToolListCache(Logger):
+    """
+    Cache of tools listed by MCP servers, shared by all clients of the process.
+    Key is hash of server configuration (command, args, env, cwd or URL) together with name and version
+    reported by the server in initialize result, so listing of another or upgraded server behind the same
+    configuration is never served. When db_path is provided, listings are stored in SQLite as well
+    and survive app restarts.
+    """
+
+    def __init__(self, db_path: str = None):
+        self.name = "MCP tools cache"
+        self.color = Logger.BRIGHT_YELLOW
+        self.__entries: Dict[str, Tuple[Optional[str], List[Tool]]] = {}
+        self.__lock = threading.Lock()
+        self.__db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self.__open_store(db_path)
+
+    @staticmethod
+    def make_key(config: dict, server_name: str = None, server_version: str = None) -> str:
+        identity = {"config": config, "server_name": server_name, "server_version": server_version}
+        return hashlib.sha256(json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[Optional[str], List[Tool]]]:
+        """Return (server version, tools) or None"""
+        with self.__lock:
+            return self.__entries.get(key)
+
+    def put(self, key: str, server_version: Optional[str], tools: List[Tool]):
+        with self.__lock:
+            self.__entries[key] = (server_version, list(tools))
+            if self.__db is not None:
+                self.__db.execute(
+                    "INSERT OR REPLACE INTO mcp_tools (key, server_version, tools, updated_at) VALUES (?, ?, ?, ?)",
+                    (key, server_version, json.dumps([tool.model_dump(mode="json", by_alias=True, exclude_none=True)
+                                                      for tool in tools]), time.time())
+                )
+                self.__db.commit()
+
+    def invalidate(self, key: str):
+        with self.__lock:
+            self.__entries.pop(key, None)
+            if self.__db is not None:
+                self.__db.execute("DELETE FROM mcp_tools WHERE key = ?", (key,))
+                self.__db.commit()
+
+    def __open_store(self, db_path: str):
+        self.__db = sqlite3.connect(db_path, check_same_thread=False)
+        self.__db.execute("""
+            CREATE TABLE IF NOT EXISTS mcp_tools (
+                key TEXT PRIMARY KEY,
+                server_version TEXT,
+                tools TEXT,
+                updated_at REAL
+            )
+        """)
+        self.__db.commit()
+        for key, server_version, tools in self.__db.execute("SELECT key, server_version, tools FROM mcp_tools"):
+            self.__entries[key] = (server_version, [Tool.model_validate(tool) for tool in json.loads(tools)])
+        self.log("Loaded tools of {count} MCP servers from {path}", count=len(self.__entries), path=db_path)
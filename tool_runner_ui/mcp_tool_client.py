@@ -1,90 +1,448 @@
 import asyncio
+import functools
 import json
+import re
+import time
 from abc import abstractmethod
-from typing import Dict, List, Any, Optional
+from collections import deque
+from contextlib import asynccontextmanager, AsyncExitStack
+from typing import Dict, List, Any, Optional, Callable
 from urllib.parse import urlparse
 
-from langchain_core.tools import BaseTool, ArgsSchema
+import anyio
+from jsonschema.exceptions import SchemaError, best_match
+from jsonschema.protocols import Validator
+from jsonschema.validators import validator_for
+from langchain_core.tools import BaseTool, ToolException
 from mcp import ClientSession, StdioServerParameters, stdio_client
 from mcp.client.sse import sse_client
-from mcp.types import Tool
+from mcp.shared.exceptions import McpError
+from mcp.types import Tool, CONNECTION_CLOSED, Implementation, ServerNotification, ToolListChangedNotification
+from pydantic import Field
 
+import tracing
+from background_loop import BackgroundEventLoop, shared_loop
 from llm_chat_agent import ToolConfig
 from logger import Logger
+from mcp_tool_cache import MCPToolListCache
+
+
+# Errors indicating that transport or session is broken and must be re-established
+CONNECTION_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream, ConnectionError, OSError)
+
+
+class MCPSession:
+    """
+    Long-lived MCP client session.
+    Transport and ClientSession are entered and exited inside one task running on a background event loop,
+    so the session stays initialized between tool calls.
+    All methods must be awaited on that background loop.
+    """
+
+    def __init__(self, transport_factory: Callable, message_handler: Callable = None):
+        self._transport_factory = transport_factory
+        self._message_handler = message_handler
+        self.session: Optional[ClientSession] = None
+        self.server_info: Optional[Implementation] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing: Optional[asyncio.Event] = None
+        self._error: Optional[BaseException] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._handshake: Optional[anyio.CancelScope] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def open(self) -> ClientSession:
+        """Open transport, initialize session and keep both alive until close() is called"""
+        if self.is_open:
+            return self.session
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if self.is_open:
+                return self.session
+
+            ready = asyncio.Event()
+            self._closing = asyncio.Event()
+            self._error = None
+            self._handshake = None
+            with tracing.span("mcp.open_session", kind="client"):
+                self._task = asyncio.create_task(self._serve(ready, self._closing))
+                try:
+                    await ready.wait()
+                except asyncio.CancelledError:
+                    # Caller gave up (e.g. connect timeout): stop handshake, serving task closes transport
+                    self._closing.set()
+                    if self._handshake is not None:
+                        self._handshake.cancel()
+                    else:
+                        self._task.cancel()
+                    raise
+
+            if not self.is_open:
+                raise ConnectionError(f"Unable to open MCP session: {self._error!r}") from self._error
+            return self.session
+
+    async def _serve(self, ready: asyncio.Event, closing: asyncio.Event):
+        try:
+            async with self._transport_factory() as (read, write):
+                async with ClientSession(read, write, message_handler=self._message_handler) as session:
+                    # Only handshake is cancelled when caller gives up, so transport is still shut down
+                    # gracefully: cancelled task would skip termination of stdio server process
+                    with anyio.CancelScope() as self._handshake:
+                        self.server_info = (await session.initialize()).serverInfo
+                    if self._handshake.cancelled_caught:
+                        return
+                    self.session = session
+                    ready.set()
+                    await closing.wait()
+        except BaseException as e:
+            self._error = e
+        finally:
+            self.session = None
+            ready.set()
+
+    async def close(self):
+        if self._task is None:
+            return
+        self._closing.set()
+        try:
+            await self._task
+        finally:
+            self._task = None
+            self.session = None
+
+
+class MCPSessionPool:
+    """
+    Bounded pool of persistent MCP sessions to one server.
+    Every session owns its own transport (stdio subprocess or SSE stream), so checked out sessions
+    serve tool calls in parallel. All methods must be awaited on the owner's background event loop.
+    """
+
+    DEFAULT_MAX_SIZE = 4
+
+    def __init__(self, transport_factory: Callable, max_size: int = DEFAULT_MAX_SIZE,
+                 idle_timeout: float = 300.0, health_check_after: float = 30.0, health_check_timeout: float = 5.0,
+                 message_handler: Callable = None):
+        if max_size < 1:
+            raise ValueError("Pool max_size must be at least 1")
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.health_check_timeout = health_check_timeout
+        self._transport_factory = transport_factory
+        self._message_handler = message_handler
+        self._idle: deque = deque()  # (MCPSession, last used timestamp), most recently used on the right
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._in_use = 0
+        self._reaper: Optional[asyncio.Task] = None
+
+    @property
+    def idle_count(self) -> int:
+        return len(self._idle)
+
+    async def checkout(self) -> MCPSession:
+        """Take idle healthy session or open a new one, waiting while max_size sessions are in use"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_size)
+        await self._slots.acquire()
+        try:
+            await self.evict_idle()
+            while self._idle:
+                mcp_session, last_used = self._idle.pop()
+                if await self._is_healthy(mcp_session, time.monotonic() - last_used):
+                    self._in_use += 1
+                    return mcp_session
+                await mcp_session.close()
+
+            mcp_session = MCPSession(self._transport_factory, self._message_handler)
+            await mcp_session.open()
+            self._in_use += 1
+            self._start_reaper()
+            return mcp_session
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def checkin(self, mcp_session: MCPSession):
+        """Return session to the pool, broken sessions are closed and dropped"""
+        self._in_use -= 1
+        try:
+            if mcp_session.is_open:
+                self._idle.append((mcp_session, time.monotonic()))
+            else:
+                await mcp_session.close()
+        finally:
+            self._slots.release()
 
+    @asynccontextmanager
+    async def acquire(self):
+        mcp_session = await self.checkout()
+        try:
+            yield mcp_session
+        finally:
+            await self.checkin(mcp_session)
+
+    async def _is_healthy(self, mcp_session: MCPSession, idle_for: float) -> bool:
+        if not mcp_session.is_open:
+            return False
+        if idle_for < self.health_check_after:
+            return True
+        try:
+            with anyio.fail_after(self.health_check_timeout):
+                await mcp_session.session.send_ping()
+            return True
+        except (McpError, TimeoutError, *CONNECTION_ERRORS):
+            return False
+
+    async def evict_idle(self):
+        """Close sessions which were not used for longer than idle_timeout"""
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            mcp_session, _ = self._idle.popleft()
+            await mcp_session.close()
+
+    def _start_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap())
+
+    async def _reap(self):
+        while self._idle or self._in_use:
+            await asyncio.sleep(self.idle_timeout / 2)
+            await self.evict_idle()
+
+    async def close(self):
+        """Close all idle sessions, sessions in use are closed when checked in"""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        while self._idle:
+            mcp_session, _ = self._idle.pop()
+            await mcp_session.close()
+
+
+# Compiled argument validators are kept for this many distinct JSON schemas, least recently used are dropped
+MAX_SCHEMA_VALIDATORS = 1024
+
+
+def schema_validator(schema: dict) -> Optional[Validator]:
+    """
+    Validator of tool arguments compiled once per distinct JSON schema, servers often repeat the same schema
+    in many tools. Return None when schema is not valid, arguments are passed to the server as is then
+    """
+    return _compile_validator(json.dumps(schema, sort_keys=True))
+
+
+@functools.lru_cache(maxsize=MAX_SCHEMA_VALIDATORS)
+def _compile_validator(schema_json: str) -> Optional[Validator]:
+    schema = json.loads(schema_json)
+    validator_class = validator_for(schema)
+    try:
+        validator_class.check_schema(schema)
+        return validator_class(schema)
+    except SchemaError:
+        return None
 
-class MCPToolClient(Logger):
 
-    def __init__(self, name: str):
+class McpToLangChainAdapter(BaseTool):
+    """LangChain tool calling tool of MCP server through its client"""
+
+    mcp_tool_name: str
+    client: Any = Field(exclude=True)
+    validator: Optional[Any] = Field(default=None, exclude=True)
+    handle_tool_error: bool = True
+
+    def __repr__(self) -> str:
+        return f"MCP tool: {self.name}: {self.description}"
+
+    def _run(self, **kwargs: Any) -> Any:
+        return self.client.event_loop.run(self._arun(**kwargs))
+
+    async def _arun(self, **kwargs: Any) -> Any:
+        """Asynchronously execute the tool with given arguments.
+        Args:
+            kwargs: The arguments to pass to the tool.
+        Returns:
+            The result of the tool execution.
+        Raises:
+            ToolException: If arguments don't match input schema of the tool.
+        """
+        if self.validator is not None:
+            error = best_match(self.validator.iter_errors(kwargs))
+            if error is not None:
+                raise ToolException(f"Invalid arguments of tool {self.name}: {error.message}")
+        self.client.log("Running {tool}({args})", tool=self.name, args=kwargs)
+        tool_response = await self.client.call_tool(self.name, **kwargs)
+        return tool_response['result'], tool_response
+
+
+class MCPToolClient(Logger):
+    # Transports and sessions of all clients live on one background loop, so they survive short-lived loops
+    # of callers and sync callers submit coroutines to it instead of creating event loop per call
+    event_loop: BackgroundEventLoop = shared_loop
+    # Hung server must not block the caller forever, connect gives up after this many seconds
+    DEFAULT_CONNECT_TIMEOUT = 30.0
+
+    def __init__(self, name: str, max_sessions: int = MCPSessionPool.DEFAULT_MAX_SIZE, tool_prefix: str = "",
+                 tool_cache: MCPToolListCache = None):
         self.name = name
         self.color = Logger.BRIGHT_YELLOW
-        self.session: ClientSession = None
+        # Tools are exposed to LLM as tool_prefix + MCP tool name, so tools of several servers don't collide
+        self.tool_prefix = tool_prefix
         self.tools: Dict[str, Any] = {}
         self.toolkit: Dict[str, ToolConfig] = {}
+        self.connected = False
+        self.server_version: Optional[str] = None
+        self._mcp_tools: Dict[str, Tool] = {}
+        self._tool_cache = tool_cache
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._loop = self.event_loop
+        self._pool = MCPSessionPool(self._mcp_client, max_size=max_sessions, message_handler=self._on_message)
 
     @abstractmethod
     def _mcp_client(self):
         """Return appropriate MCP client - must be implemented by subclasses"""
         pass
 
-    async def connect(self):
-        """Connect to MCP server via HTTP SSE"""
+    @abstractmethod
+    def _server_config(self) -> dict:
+        """Return configuration identifying the server, used as key of tools cache"""
+        pass
+
+    async def connect(self, timeout: float = DEFAULT_CONNECT_TIMEOUT):
+        """
+        Open persistent session from the pool and load available tools, give up after timeout seconds
+        (None waits without limit). Raise asyncio.TimeoutError when server doesn't respond in time
+        """
+        with tracing.span("mcp.connect", kind="client", **{"mcp.client": self.name}) as connect_span:
+            await self._loop.arun(asyncio.wait_for(self._connect(), timeout))
+            connect_span.set(**{"mcp.tools": len(self.tools), "mcp.server_version": self.server_version})
+
+    async def _connect(self):
         try:
-            # Create SSE client connection
-            async with self._mcp_client() as (read, write):
-                async with ClientSession(read, write) as session:
-                    self.session = session
+            async with self._pool.acquire() as mcp_session:
+                # Handshake identifies the server, only listing of tools is skipped for known servers
+                cache_key = self._cache_key(mcp_session.server_info)
+                cached = self._tool_cache.get(cache_key) if self._tool_cache is not None else None
+                if cached is None:
+                    await self._refresh_tools(mcp_session)
+        except (KeyError, ConnectionError) as e:
+            self.log("Failed to connect to MCP server: {error}", error=e)
+            raise
+
+        self.connected = True
+        if cached is not None:
+            # Known server: tools are available at once, listing is refreshed in background
+            self.server_version, tools = cached
+            self._update_tools(tools)
+            self.log("Loaded tools from cache: {tools}", tools=list(self.tools.keys()))
+            self._schedule_refresh()
+        else:
+            self.log("Connected to MCP server. Available tools: {tools}", tools=list(self.tools.keys()))
+
+    def _cache_key(self, server_info: Optional[Implementation]) -> str:
+        return MCPToolListCache.make_key(self._server_config(), server_info.name if server_info else None,
+                                         server_info.version if server_info else None)
 
-                    # Initialize the session
-                    await session.initialize()
+    async def _refresh_tools(self, mcp_session: MCPSession = None):
+        """
+        List tools of the server, update adapters of changed tools only and store listing in cache.
+        Session is checked out from the pool unless given
+        """
+        if mcp_session is None:
+            async with self._pool.acquire() as mcp_session:
+                return await self._refresh_tools(mcp_session)
+
+        tools: List[Tool] = []
+        cursor = None
+        while True:
+            tools_result = await mcp_session.session.list_tools(cursor=cursor)
+            tools.extend(tools_result.tools)
+            cursor = tools_result.nextCursor
+            if not cursor:
+                break
+        server_info = mcp_session.server_info
+
+        server_version = server_info.version if server_info else None
+        if self.server_version is not None and server_version != self.server_version:
+            self.log("Server version changed from {old} to {new}", old=self.server_version, new=server_version)
+        self.server_version = server_version
+        if self._update_tools(tools):
+            self.log("Tools updated: {tools}", tools=list(self.tools.keys()))
+        if self._tool_cache is not None:
+            self._tool_cache.put(self._cache_key(server_info), server_version, tools)
+
+    def _schedule_refresh(self):
+        """Refresh tools in background, must be called on the background loop"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_tools_in_background())
+
+    async def _refresh_tools_in_background(self):
+        try:
+            await self._refresh_tools()
+        except Exception as e:
+            self.log("Unable to refresh tools: {error}", error=repr(e))
 
-                    # List available tools
-                    tools_result = await session.list_tools()
-                    self.tools = {tool.name: self._convert_to_langchain_tool(tool) for tool in tools_result.tools}
-                    self.toolkit = self._create_toolkit()
+    async def _on_message(self, message):
+        """Message handler of sessions: server notifies when its tools are changed"""
+        if isinstance(message, ServerNotification) and isinstance(message.root, ToolListChangedNotification):
+            self.log("Server reported that tools list changed")
+            self._schedule_refresh()
 
-                    self.log("Connected to MCP server. Available tools: {tools}", tools=list(self.tools.keys()))
+    def _update_tools(self, tools: List[Tool]) -> bool:
+        """
+        Update tools and toolkit with listed tools: adapters and ToolConfig of unchanged tools are kept,
+        so their flags and tools bound to LLM stay valid. Return True if any tool was added, changed or removed
+        """
+        mcp_tools = {self.tool_prefix + tool.name: tool for tool in tools}
+        changed = mcp_tools.keys() != self._mcp_tools.keys()
+        updated_tools = {}
+        for name, tool in mcp_tools.items():
+            if name in self.tools and self._mcp_tools.get(name) == tool:
+                updated_tools[name] = self.tools[name]
+            else:
+                updated_tools[name] = self._convert_to_langchain_tool(tool)
+                changed = True
+        self._mcp_tools = mcp_tools
+        self.tools = updated_tools
+        self.toolkit = {
+            name: self.toolkit[name] if name in self.toolkit and self.toolkit[name].function is tool
+            else ToolConfig(callable_tool=tool, direct_response=False, auto_exec=False, is_mcp_tool=True)
+            for name, tool in updated_tools.items()
+        }
+        return changed
 
-        except KeyError as e:
-            self.log("Failed to connect to MCP server: {message}", message=e)
-            raise
+    async def close(self):
+        """Close pooled sessions and shut down their transports"""
+        self.connected = False
+        await self._loop.arun(self._pool.close())
 
     async def get_available_tools(self) -> List[str]:
         """Get list of available tool names"""
-        if not self.session:
+        if not self.connected:
             await self.connect()
         return list(self.tools.keys())
         # Convert MCP tools to ToolConfig format
 
     async def get_toolkit(self):
-        if not self.session:
+        if not self.connected:
             await self.connect()
         return self.toolkit
 
-    def _create_toolkit(self):
-        return {name: ToolConfig(callable_tool=tool, direct_response=False, auto_exec=False, is_mcp_tool=True)
-                for name, tool in self.tools.items()}
-
     async def call_tool(self, tool_name: str, **arguments: Any) -> Dict[str, Any]:
         """Call a tool on the MCP server"""
-        # if not self.session:
-        #     await self.connect()
 
         if tool_name not in self.tools:
             raise ValueError(f"Tool '{tool_name}' not available. Available tools: {list(self.tools.keys())}")
 
-        """Connect to MCP server via HTTP SSE"""
-        # Create MCP client connection
-        async with self._mcp_client() as (read, write):
-            async with ClientSession(read, write) as session:
-                self.session = session
-                # Initialize the session
-                await session.initialize()
-
-                result = await self.session.call_tool(tool_name, arguments)
-                self.log("=" * 60)
-                self.log("MCP tool call result:\n {result}", result=result)
-                self.log("=" * 60)
+        with tracing.span("mcp.call_tool", kind="client", **{"mcp.client": self.name, "mcp.tool": tool_name}):
+            result = await self._loop.arun(self._call_tool(self.tools[tool_name].mcp_tool_name, arguments))
+        self.log("MCP tool call result:\n {result}", result=result)
 
         if result and hasattr(result, 'content'):
             try:
@@ -105,6 +463,24 @@ class MCPToolClient(Logger):
                 "tool_name": tool_name
             }
 
+    async def _call_tool(self, tool_name: str, arguments: Dict[str, Any]):
+        """Call tool using session checked out from the pool, reconnect once if session is broken"""
+        async with AsyncExitStack() as stack:
+            # Waiting for idle session or connecting new one is traced apart from execution of the tool
+            with tracing.span("mcp.acquire_session"):
+                mcp_session = await stack.enter_async_context(self._pool.acquire())
+            with tracing.span("mcp.execute", kind="client", **{"mcp.tool": tool_name}) as execute_span:
+                try:
+                    return await mcp_session.session.call_tool(tool_name, arguments)
+                except (McpError, *CONNECTION_ERRORS) as e:
+                    if isinstance(e, McpError) and e.error.code != CONNECTION_CLOSED:
+                        raise
+                    self.log("MCP session is broken ({error}), reconnecting...", error=repr(e))
+                    execute_span.event("reconnect", error=repr(e))
+                    await mcp_session.close()
+                    session = await mcp_session.open()
+                    return await session.call_tool(tool_name, arguments)
+
     def _convert_to_langchain_tool(self, mcp_tool: Tool) -> BaseTool:
         """Convert an MCP tool to LangChain's tool format.
         Args:
@@ -113,46 +489,28 @@ class MCPToolClient(Logger):
         Returns:
             A LangChain BaseTool.
         """
-
-        # This is a dynamic class creation, we need to work with the self reference
-        adapter_self: MCPToolClient = self
-
-        class McpToLangChainAdapter(BaseTool):
-            name: str = mcp_tool.name or "NO NAME"
-            description: str = mcp_tool.description or ""
-            args_schema: Optional[ArgsSchema] = mcp_tool.inputSchema
-            handle_tool_error: bool = True
-
-            def __repr__(self) -> str:
-                return f"MCP tool: {self.name}: {self.description}"
-
-            def _run(self, **kwargs: Any) -> Any:
-                return asyncio.run(self._arun(**kwargs))
-
-            async def _arun(self, **kwargs: Any) -> Any:
-                """Asynchronously execute the tool with given arguments.
-                Args:
-                    kwargs: The arguments to pass to the tool.
-                Returns:
-                    The result of the tool execution.
-                Raises:
-                    ToolException: If tool execution fails.
-                """
-                print(f"running: mcp_client.call_tool({self.name}({kwargs}))")
-                tool_response = await adapter_self.call_tool(self.name, **kwargs)
-                return tool_response['result'], tool_response
-
-        return McpToLangChainAdapter()
+        return McpToLangChainAdapter(
+            name=self.tool_prefix + (mcp_tool.name or "NO NAME"),
+            mcp_tool_name=mcp_tool.name,
+            description=mcp_tool.description or "",
+            args_schema=mcp_tool.inputSchema,
+            client=self,
+            validator=schema_validator(mcp_tool.inputSchema)
+        )
 
 
 class MCPToolSSEClient(MCPToolClient):
     """MCP Tool Client for HTTP SSE connections"""
 
-    def __init__(self, server_url: str):
-        super().__init__('MCP SSE client')
+    def __init__(self, server_url: str, max_sessions: int = MCPSessionPool.DEFAULT_MAX_SIZE, tool_prefix: str = "",
+                 tool_cache: MCPToolListCache = None):
+        super().__init__('MCP SSE client', max_sessions, tool_prefix, tool_cache)
         self.server_url = server_url
         self.log("Initialized SSE client for {url}", url=server_url)
 
+    def _server_config(self) -> dict:
+        return {"url": self.server_url}
+
     def _mcp_client(self):
         """Return SSE client"""
         return sse_client(
@@ -167,12 +525,17 @@ class MCPToolSSEClient(MCPToolClient):
 class MCPToolSTDIOClient(MCPToolClient):
     """MCP Tool Client for stdio connections"""
 
-    def __init__(self, server_config_json: str):
-        super().__init__('MCP stdio client')
+    def __init__(self, server_config_json: str, max_sessions: int = MCPSessionPool.DEFAULT_MAX_SIZE,
+                 tool_prefix: str = "", tool_cache: MCPToolListCache = None):
+        super().__init__('MCP stdio client', max_sessions, tool_prefix, tool_cache)
         self.server_config_json: str = server_config_json
         self.server_params: StdioServerParameters = self._parse_server_config(server_config_json)
         self.log("Initialized stdio client for {command}", command=self.server_params.command)
 
+    def _server_config(self) -> dict:
+        return {"command": self.server_params.command, "args": self.server_params.args,
+                "env": self.server_params.env, "cwd": str(self.server_params.cwd) if self.server_params.cwd else None}
+
     def _parse_server_config(self, config_json: str) -> StdioServerParameters:
         """Parse JSON string to StdioServerParameters"""
         try:
@@ -337,19 +700,117 @@ class MCPToolSTDIOClient(MCPToolClient):
             raise ValueError(f"Error parsing MCP JSON configuration: {e}")
 
 
+class MCPServersClient(Logger):
+    """
+    Client of all servers from mcpServers configuration exposing one merged toolkit.
+    Servers are connected concurrently, each with its own timeout, so startup takes as long as the slowest
+    handshake. Tool names are prefixed with server name (server__tool) to avoid collisions.
+    Servers which are down or don't respond in time are skipped, their errors are kept and they are retried
+    only by explicit reconnect(), so getting toolkit doesn't wait for a dead server again.
+
+    Server configuration is either stdio ({"command": ..., "args": [...], "env": {...}})
+    or SSE ({"url": "http://host/sse"}), optional "timeout" overrides connect timeout in seconds.
+    """
+
+    DEFAULT_CONNECT_TIMEOUT = MCPToolClient.DEFAULT_CONNECT_TIMEOUT
+    TOOL_NAME_SEPARATOR = "__"
+
+    def __init__(self, config_json: str, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 max_sessions: int = MCPSessionPool.DEFAULT_MAX_SIZE, tool_cache: MCPToolListCache = None):
+        self.name = "MCP servers client"
+        self.color = Logger.BRIGHT_YELLOW
+        self.clients: Dict[str, MCPToolClient] = {}
+        self.timeouts: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+
+        try:
+            servers = json.loads(config_json)["mcpServers"]
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            raise ValueError(f"Invalid mcpServers configuration: {e!r}")
+        if not isinstance(servers, dict) or not servers:
+            raise ValueError("'mcpServers' must be a non-empty dictionary")
+
+        for server_name, config in servers.items():
+            if not isinstance(config, dict):
+                raise ValueError(f"Server configuration for '{server_name}' must be a dictionary")
+            prefix = re.sub(r"[^a-zA-Z0-9_-]", "_", server_name) + self.TOOL_NAME_SEPARATOR
+            if config.get("url"):
+                client = MCPToolSSEClient(config["url"], max_sessions, prefix, tool_cache)
+            elif config.get("command"):
+                stdio_config = {key: value for key, value in config.items() if key != "timeout"}
+                client = MCPToolSTDIOClient(json.dumps(stdio_config), max_sessions, prefix, tool_cache)
+            else:
+                raise ValueError(f"Server '{server_name}' must have either 'command' or 'url' field")
+            client.name = f"MCP client ({server_name})"
+            self.clients[server_name] = client
+            self.timeouts[server_name] = config.get("timeout", connect_timeout)
+
+    @property
+    def connected(self) -> bool:
+        return any(client.connected for client in self.clients.values())
+
+    async def connect(self):
+        """Connect all servers which are not connected yet, concurrently"""
+        await self.__connect_servers([name for name, client in self.clients.items() if not client.connected])
+
+    async def reconnect(self):
+        """Retry servers which failed to connect before"""
+        await self.__connect_servers([name for name in self.errors if not self.clients[name].connected])
+
+    async def __connect_servers(self, pending: List[str]):
+        await asyncio.gather(*[self.__connect(name) for name in pending])
+        self.log("Connected servers: {connected}, failed: {failed}",
+                 connected=[name for name, client in self.clients.items() if client.connected],
+                 failed=list(self.errors))
+
+    async def __connect(self, server_name: str):
+        try:
+            await self.clients[server_name].connect(self.timeouts[server_name])
+            self.errors.pop(server_name, None)
+        except asyncio.TimeoutError:
+            self.errors[server_name] = f"no response in {self.timeouts[server_name]} seconds"
+        except Exception as e:
+            self.errors[server_name] = repr(e)
+
+    async def close(self):
+        await asyncio.gather(*[client.close() for client in self.clients.values()], return_exceptions=True)
+
+    async def get_available_tools(self) -> List[str]:
+        return list((await self.get_toolkit()).keys())
+
+    @property
+    def toolkit(self) -> Dict[str, ToolConfig]:
+        """Merged toolkit of connected servers"""
+        toolkit = {}
+        for client in self.clients.values():
+            if client.connected:
+                toolkit.update(client.toolkit)
+        return toolkit
+
+    async def get_toolkit(self) -> Dict[str, ToolConfig]:
+        """Merged toolkit of connected servers, servers which failed before are not retried"""
+        pending = [name for name, client in self.clients.items()
+                   if not client.connected and name not in self.errors]
+        if pending:
+            await self.__connect_servers(pending)
+        return self.toolkit
+
+
 class MCPClientFactory:
     """Factory class for creating MCP clients based on input string format"""
 
     @staticmethod
-    def create_from(input_string: str) -> MCPToolClient:
+    def create_from(input_string: str, tool_cache: MCPToolListCache = None) -> MCPToolClient | MCPServersClient:
         """
         Create appropriate MCP client based on input string format
 
         Args:
             input_string: Either a URL for SSE client or JSON string for stdio client
+            tool_cache: cache of tools listings, clients of known servers connect without listing tools
 
         Returns:
-            MCPToolSSEClient for URLs, MCPToolSTDIOClient for JSON strings
+            MCPToolSSEClient for URLs, MCPToolSTDIOClient for JSON strings,
+            MCPServersClient for JSON strings with mcpServers
 
         Raises:
             ValueError: If input string format is not recognized
@@ -362,7 +823,7 @@ class MCPClientFactory:
             json_config = '{"command": "python", "args": ["server.py"]}'
             client = MCPClientFactory.create_from(json_config)
 
-            # Create stdio client from MCP JSON format
+            # Create client of all servers from MCP JSON format
             mcp_config = '''
             {
               "mcpServers": {
@@ -383,11 +844,15 @@ class MCPClientFactory:
 
         # Check if it's a URL
         if MCPClientFactory._is_url(input_string):
-            return MCPToolSSEClient(input_string)
+            return MCPToolSSEClient(input_string, tool_cache=tool_cache)
 
         # Check if it's JSON for MCP server config
         if MCPClientFactory._is_mcp_config(input_string):
-            return MCPToolSTDIOClient(input_string)
+            return MCPToolSTDIOClient(input_string, tool_cache=tool_cache)
+
+        # Check if it's JSON with several servers in mcpServers
+        if MCPClientFactory._is_mcp_servers_config(input_string):
+            return MCPServersClient(input_string, tool_cache=tool_cache)
 
         # If neither URL nor JSON, raise error
         raise ValueError(
@@ -413,6 +878,15 @@ class MCPClientFactory:
         except json.JSONDecodeError:
             return False
 
+    @staticmethod
+    def _is_mcp_servers_config(json_string: str) -> bool:
+        """Check if JSON string is in mcpServers configuration format"""
+        try:
+            config = json.loads(json_string)
+            return isinstance(config, dict) and 'mcpServers' in config
+        except json.JSONDecodeError:
+            return False
+
     @classmethod
     def create_sse_client(cls, url: str) -> MCPToolSSEClient:
         """Explicitly create an SSE client"""
@@ -450,7 +924,7 @@ if __name__ == "__main__":
 
     #mcp_client = MCPToolSSEClient("http://localhost:8080/sse")
 
-    toolkit = asyncio.run(mcp_client.get_toolkit())
+    toolkit = MCPToolClient.event_loop.run(mcp_client.get_toolkit())
 
     print(toolkit)
 
@@ -5,6 +5,10 @@ import httpx
 from langchain_ollama import ChatOllama
 from langchain_openai import ChatOpenAI
 
+import http_clients
+
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+
 
 class Models(Enum):
     R1 = "deepseek-r1:1.5b"
@@ -20,11 +24,21 @@ class Models(Enum):
     GPT_OSS = "gpt-oss:20b-cloud"
 
     @staticmethod
-    def create_chat(model: Enum, base_url: str = "http://localhost:11434", temperature: float = 0.05):
+    def create_chat(model: Enum, base_url: str = "http://localhost:11434", temperature: float = 0.05,
+                    http_limits: httpx.Limits = http_clients.DEFAULT_LIMITS):
+        """
+        Create chat model using HTTP connection pools shared by all models of the same server,
+        so connections are kept alive and reused between calls and agents
+        """
         if model == Models.GPT_4O_MINI:
-            return ChatOpenAI(model=model.value, temperature=temperature, http_client=httpx.Client(verify=False))
+            openai_url = os.environ.get("OPENAI_BASE_URL", OPENAI_BASE_URL)
+            return ChatOpenAI(model=model.value, temperature=temperature,
+                              http_client=http_clients.sync_client(openai_url, False, http_limits),
+                              http_async_client=http_clients.async_client(openai_url, False, http_limits))
         else:
-            return ChatOllama(model=model.value, temperature=temperature, base_url=base_url)
+            return ChatOllama(model=model.value, temperature=temperature, base_url=base_url,
+                              sync_client_kwargs={"transport": http_clients.sync_transport(base_url, limits=http_limits)},
+                              async_client_kwargs={"transport": http_clients.async_transport(base_url, limits=http_limits)})
 
 
 if __name__ == "__main__":
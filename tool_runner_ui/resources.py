@@ -0,0 +1,96 @@
+import json
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from langchain_core.language_models import BaseChatModel
+
+from history_store import HistoryStore
+from logger import Logger
+from mcp_tool_cache import MCPToolListCache
+from mcp_tool_client import MCPClientFactory, MCPToolClient, MCPServersClient
+from models import Models
+from sql_cache import SQLGenerationCache
+from sql_executor_agent import SQLExecutorAgent
+from sqllite_datasource import SqlLiteDatasource
+
+
+class ResourceRegistry(Logger):
+    """
+    Process-wide registry of resources which are expensive to create and safe to share
+    between users (chat models, datasources, stateless agents, MCP clients), keyed by their config.
+    Works with or without Streamlit: module is imported once per process, so every session gets same instances.
+    """
+
+    def __init__(self):
+        self.name = "Resources"
+        self.color = Logger.BRIGHT_YELLOW
+        self.__resources: Dict[Hashable, Any] = {}
+        self.__locks: Dict[Hashable, threading.Lock] = {}
+        self.__lock = threading.Lock()
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Return resource registered under key, creating it with factory on first request"""
+        resource = self.__resources.get(key)
+        if resource is not None:
+            return resource
+        with self.__lock:
+            lock = self.__locks.setdefault(key, threading.Lock())
+        # Resources are created under their own lock, so slow factory doesn't block other resources
+        with lock:
+            if key not in self.__resources:
+                self.log("Creating {key}", key=key)
+                self.__resources[key] = factory()
+            return self.__resources[key]
+
+    def __len__(self):
+        return len(self.__resources)
+
+
+registry = ResourceRegistry()
+
+
+def chat_model(model: Models, base_url: str, temperature: float) -> BaseChatModel:
+    return registry.get(("chat_model", model, base_url, temperature),
+                        lambda: Models.create_chat(model, base_url=base_url, temperature=temperature))
+
+
+def datasource(db_url: str) -> SqlLiteDatasource:
+    return SqlLiteDatasource.shared(db_url)
+
+
+def sql_cache(db_path: str) -> SQLGenerationCache:
+    """SQL generation cache persisted between app restarts"""
+    return registry.get(("sql_cache", db_path), lambda: SQLGenerationCache(db_path=db_path))
+
+
+def history_store(directory: str) -> HistoryStore:
+    return registry.get(("history_store", directory), lambda: HistoryStore(directory))
+
+
+def sql_executor_agent(db_url: str, model: Models, base_url: str, temperature: float,
+                       cache_path: str) -> SQLExecutorAgent:
+    """SQLExecutorAgent keeps no conversation state, so one compiled agent serves all sessions"""
+    return registry.get(
+        ("sql_executor_agent", db_url, model, base_url, temperature, cache_path),
+        lambda: SQLExecutorAgent(datasource(db_url), chat_model(model, base_url, temperature),
+                                 cache=sql_cache(cache_path))
+    )
+
+
+def mcp_client(server_params: str, tool_cache_path: str = None) -> MCPToolClient | MCPServersClient:
+    """
+    MCP client with its session pool shared by all sessions attaching the same server.
+    Toolkit of client is shared as well: copy ToolConfig objects to keep enabled/auto_exec flags per session
+    """
+    server_params = server_params.strip()
+    try:
+        key = json.dumps(json.loads(server_params), sort_keys=True)
+    except json.JSONDecodeError:
+        key = server_params
+    return registry.get(("mcp_client", key),
+                        lambda: MCPClientFactory.create_from(server_params, mcp_tool_cache(tool_cache_path)))
+
+
+def mcp_tool_cache(db_path: str = None) -> MCPToolListCache:
+    """Tools listed by MCP servers, persisted between app restarts"""
+    return registry.get(("mcp_tool_cache", db_path), lambda: MCPToolListCache(db_path))
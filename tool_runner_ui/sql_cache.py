@@ -0,0 +1,174 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from logger import Logger
+
+
+class SQLGenerationCache(Logger):
+    """
+    Cache of SQL statements generated by LLM for natural language queries.
+
+    Exact tier: key is normalized query, hash of DB schema and model name.
+    Query is normalized by whitespace and trailing punctuation only, case can change meaning of literals.
+    Semantic tier (optional): when embeddings model is provided, query which is similar enough
+    to a cached one (cosine similarity >= threshold) for the same schema and model is a hit as well.
+    Entries are evicted by LRU and TTL. When db_path is provided, entries are also stored in SQLite
+    and loaded on start, so cache survives restarts.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 24 * 3600, db_path: str = None,
+                 embeddings: Embeddings = None, similarity_threshold: float = 0.95):
+        self.name = "SQL cache"
+        self.color = Logger.BRIGHT_GREEN
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.__entries: OrderedDict = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self.__open_store(db_path)
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return re.sub(r"\s+", " ", query).strip().rstrip("?.!;").strip()
+
+    @staticmethod
+    def schema_hash(schema: str) -> str:
+        return hashlib.sha256(re.sub(r"\s+", " ", schema).strip().encode("utf-8")).hexdigest()
+
+    @classmethod
+    def make_key(cls, query: str, schema_hash: str, model: str) -> str:
+        return hashlib.sha256(f"{cls.normalize_query(query)}|{schema_hash}|{model}".encode("utf-8")).hexdigest()
+
+    def get(self, query: str, schema_hash: str, model: str) -> Optional[dict]:
+        """Return cached {'sql': ..., 'info': ..., 'key': ...} or None, key can be passed to invalidate"""
+        key = self.make_key(query, schema_hash, model)
+        with self.__lock:
+            entry = self.__get_entry(key)
+        if entry is not None:
+            self.log("Exact hit for {query}", query=query)
+            return {"sql": entry["sql"], "info": entry["info"], "key": key}
+
+        if self.embeddings is None:
+            return None
+
+        vector = self.__embed(query)
+        with self.__lock:
+            key, similarity = self.__most_similar(vector, schema_hash, model)
+            entry = self.__get_entry(key) if key else None
+        if entry is None or similarity < self.similarity_threshold:
+            return None
+
+        self.log("Similar query hit ({similarity}) for {query}", similarity=f"{similarity:.3f}", query=query)
+        return {"sql": entry["sql"], "info": entry["info"], "key": key}
+
+    def put(self, query: str, schema_hash: str, model: str, sql: str, info: str):
+        """Cache SQL which executed successfully, SQL which fails would be served to every matching query"""
+        key = self.make_key(query, schema_hash, model)
+        vector = self.__embed(query) if self.embeddings is not None else None
+        entry = {
+            "query": self.normalize_query(query), "schema_hash": schema_hash, "model": model,
+            "sql": sql, "info": info, "created_at": time.time(), "vector": vector
+        }
+        with self.__lock:
+            self.__entries[key] = entry
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_entries:
+                evicted, _ = self.__entries.popitem(last=False)
+                self.__delete_stored(evicted)
+            self.__store(key, entry)
+
+    def invalidate(self, key: str):
+        with self.__lock:
+            if self.__entries.pop(key, None) is not None:
+                self.__delete_stored(key)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            if self.__db is not None:
+                self.__db.execute("DELETE FROM sql_cache")
+                self.__db.commit()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __get_entry(self, key: str) -> Optional[dict]:
+        entry = self.__entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry["created_at"] > self.ttl_seconds:
+            del self.__entries[key]
+            self.__delete_stored(key)
+            return None
+        self.__entries.move_to_end(key)
+        return entry
+
+    def __embed(self, query: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(self.normalize_query(query)), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def __most_similar(self, vector: np.ndarray, schema_hash: str, model: str):
+        candidates = [(key, entry["vector"]) for key, entry in self.__entries.items()
+                      if entry["vector"] is not None and entry["schema_hash"] == schema_hash
+                      and entry["model"] == model and entry["vector"].shape == vector.shape]
+        if not candidates:
+            return None, 0.0
+        similarities = np.stack([candidate for _, candidate in candidates]) @ vector
+        best = int(np.argmax(similarities))
+        return candidates[best][0], float(similarities[best])
+
+    def __open_store(self, db_path: str):
+        self.__db = sqlite3.connect(db_path, check_same_thread=False)
+        self.__db.execute("""
+            CREATE TABLE IF NOT EXISTS sql_cache (
+                key TEXT PRIMARY KEY,
+                query TEXT,
+                schema_hash TEXT,
+                model TEXT,
+                sql TEXT,
+                info TEXT,
+                created_at REAL,
+                vector BLOB
+            )
+        """)
+        self.__db.execute("DELETE FROM sql_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        self.__db.commit()
+
+        rows = self.__db.execute(
+            "SELECT key, query, schema_hash, model, sql, info, created_at, vector "
+            "FROM sql_cache ORDER BY created_at DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        for key, query, schema_hash, model, sql, info, created_at, vector in reversed(rows):
+            self.__entries[key] = {
+                "query": query, "schema_hash": schema_hash, "model": model, "sql": sql, "info": info,
+                "created_at": created_at, "vector": np.frombuffer(vector, dtype=np.float32) if vector else None
+            }
+        self.log("Loaded {count} cached SQL statements from {path}", count=len(rows), path=db_path)
+
+    def __store(self, key: str, entry: dict):
+        if self.__db is None:
+            return
+        vector = entry["vector"].tobytes() if entry["vector"] is not None else None
+        self.__db.execute(
+            "INSERT OR REPLACE INTO sql_cache (key, query, schema_hash, model, sql, info, created_at, vector) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, entry["query"], entry["schema_hash"], entry["model"], entry["sql"], entry["info"],
+             entry["created_at"], vector)
+        )
+        self.__db.commit()
+
+    def __delete_stored(self, key: str):
+        if self.__db is not None:
+            self.__db.execute("DELETE FROM sql_cache WHERE key = ?", (key,))
+            self.__db.commit()
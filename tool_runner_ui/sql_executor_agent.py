@@ -1,15 +1,20 @@
-import pandas as pd
 from langchain_core.callbacks import CallbackManagerForToolRun
 from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import BaseTool
 from langchain_core.tools.base import ArgsSchema
+from langgraph.config import get_stream_writer
 from langgraph.graph import START, END, StateGraph
 from pydantic import Field, BaseModel
 from typing_extensions import TypedDict, Optional, Any, Tuple
 import prompt_templates
+import tracing
+from llm_chat_agent import STREAMING_CONFIG, is_streaming
+from logger import Logger
 from models import Models
-from sqllite_datasource import SqlLiteDatasource
+from sql_cache import SQLGenerationCache
+from sqllite_datasource import SqlLiteDatasource, QueryResult
 
 
 class SQLExecutorState(TypedDict):
@@ -20,33 +25,63 @@ class SQLExecutorState(TypedDict):
     sql: str  # Statement generated by LLM
     info: str  # Description of SQL statement
     success: bool  # Indicator that sql generated successfully
+    cached: bool  # True if sql is taken from cache instead of generating it by LLM
+    cache_key: str  # Key of cache entry sql is taken from
     result: dict  # result of SQL execution.
 
 
-class SQLExecutorAgent:
+class SQLExecutorAgent(Logger):
 
-    def __init__(self, datasource: SqlLiteDatasource, chat_model: BaseChatModel):
+    def __init__(self, datasource: SqlLiteDatasource, chat_model: BaseChatModel, cache: SQLGenerationCache = None):
+        self.name = "SQL executor"
+        self.color = Logger.BRIGHT_YELLOW
         self.__llm = chat_model
         self.__graph = self.__build_graph()
         self.__db_schema = datasource.get_schema()
+        self.__db_schema_hash = SQLGenerationCache.schema_hash(self.__db_schema)
         self.__db = datasource
+        self.__cache = cache
 
+    @tracing.traced("node.get_instruction")
     def __get_instruction(self, state: SQLExecutorState):
-        print("__get_instruction || Returning instruction to LLM")
         return {"instruction": prompt_templates.SQL_GENERATOR_SYSTEM_INSTRUCTION.format(self.__db_schema)}
 
-    def __generate_sql(self, state: SQLExecutorState):
-        print("__generate_sql || Request LLM to generate input for 'SQL Executor' tool")
+    @tracing.traced("node.lookup_cache")
+    def __lookup_cache(self, state: SQLExecutorState):
+        if self.__cache is None:
+            return {"cached": False}
+        cached = self.__cache.get(state["query"], self.__db_schema_hash, self.get_llm_name())
+        if cached is None:
+            return {"cached": False}
+        self.log("SQL found in cache: {sql}", sql=cached["sql"])
+        return {"sql": cached["sql"], "info": cached["info"], "success": True, "cached": True,
+                "cache_key": cached["key"]}
+
+    @tracing.traced("node.generate_sql")
+    def __generate_sql(self, state: SQLExecutorState, config: RunnableConfig):
+        self.log("Requesting {model} to generate SQL", model=self.get_llm_name())
 
         messages = [
             SystemMessage(content=state["instruction"]),
             HumanMessage(content=state["query"])
         ]
 
-        llm_response = self.__llm.invoke(messages)
+        with tracing.span("llm.generate", kind="client", **{"gen_ai.request.model": self.get_llm_name(),
+                                                            "gen_ai.input.messages": len(messages)}) as llm_span:
+            if is_streaming(config):
+                writer = get_stream_writer()
+                first_token = tracing.FirstTokenTimer(llm_span)
+                llm_response = None
+                for chunk in self.__llm.stream(messages):
+                    first_token.token()
+                    if chunk.content:
+                        writer({"type": "token", "content": chunk.content})
+                    llm_response = chunk if llm_response is None else llm_response + chunk
+            else:
+                llm_response = self.__llm.invoke(messages)
+            tracing.record_llm_response(llm_span, llm_response)
 
         sql_response = llm_response.content
-        print(f"SQL Response: {sql_response}")
 
         sql_string = sql_response \
             .replace('```sql', '') \
@@ -59,38 +94,77 @@ class SQLExecutorAgent:
             'success': True if len(sql_string) > 0 else False
         }
 
-        print(f"__generate_sql || Response generated: {response}")
+        self.log("SQL generated: {sql}", sql=sql_string)
         return response
 
+    @tracing.traced("node.execute_sql")
     def __execute_sql(self, state: SQLExecutorState):
-        print(f"__execute_sql || Tool called, executing SQL: {state}")
-        dataframe = None
+        data = None
         if not state["success"]:
             output = "Error generating sql from user query"
+            self.log("{error}", error=output)
         elif not state["execute_mode"]:
             output = f"SQL generated: {state['sql']}"
         else:
             output = f"Executing SQL: {state['sql']}"
-            dataframe = self.__db.retrieve_as_dataframe(state['sql'])
-
-        print(f"__execute_sql || Response generated: {output}")
-
-        return {"result": {'message': output, 'dataframe': dataframe}}
+            self.log("Executing SQL: {sql}", sql=state['sql'])
+            writer = get_stream_writer()
+            writer({"type": "tool_start", "id": "sql", "input": state['sql']})
+            data = self.__db.retrieve_result(state['sql'])
+            writer({"type": "tool_end", "id": "sql", "input": state['sql'], "result": data})
+            self.__update_cache(state, data)
+            self.log("Result: {summary}", summary=data.preview.column("error")[0] if data.is_error else data.summary())
+
+        return {"result": {'message': output, 'data': data}}
+
+    def __update_cache(self, state: SQLExecutorState, data: QueryResult):
+        """Generated SQL is cached once it executed successfully, cached SQL which failed is evicted"""
+        if self.__cache is None:
+            return
+        if state["cached"]:
+            if data.is_error:
+                self.log("Cached SQL failed, {action}", action="evicting it from cache")
+                self.__cache.invalidate(state["cache_key"])
+        elif not data.is_error:
+            self.__cache.put(state["query"], self.__db_schema_hash, self.get_llm_name(), state["sql"], state["info"])
 
     def __build_graph(self):
 
-        # Compile application graph
+        # Compile application graph, SQL found in cache goes straight to execution
         graph_builder = StateGraph(SQLExecutorState).add_sequence(
-            [self.__get_instruction, self.__generate_sql, self.__execute_sql]
+            [self.__get_instruction, self.__lookup_cache]
+        ).add_sequence(
+            [self.__generate_sql, self.__execute_sql]
         )
         graph_builder.add_edge(START, "__get_instruction")
+        graph_builder.add_conditional_edges(
+            "__lookup_cache",
+            lambda state: "__execute_sql" if state["cached"] else "__generate_sql",
+            ["__execute_sql", "__generate_sql"]
+        )
         graph_builder.add_edge("__execute_sql", END)
         graph = graph_builder.compile()
 
         return graph
 
     def invoke(self, query: str, execute_mode: bool = False):
-        return self.__graph.invoke({"query": query, "execute_mode": execute_mode})
+        with self.__agent_span():
+            return self.__graph.invoke({"query": query, "execute_mode": execute_mode})
+
+    def stream(self, query: str, execute_mode: bool = False):
+        """Process request and yield the same events as LLMChatAgent.stream"""
+        with self.__agent_span():
+            state = None
+            for mode, chunk in self.__graph.stream({"query": query, "execute_mode": execute_mode},
+                                                   config=STREAMING_CONFIG, stream_mode=["custom", "values"]):
+                if mode == "custom":
+                    yield chunk
+                else:
+                    state = chunk
+            yield {"type": "final", "state": state}
+
+    def __agent_span(self):
+        return tracing.span("agent", **{"agent.name": "SQL executor", "gen_ai.request.model": self.get_llm_name()})
 
     def get_graph_image(self):
         return self.__graph.get_graph().draw_mermaid_png()
@@ -117,19 +191,20 @@ class DatabaseRetrievalTool(BaseTool):
     sql_executor: SQLExecutorAgent = None
     db_description: str = "HR DB"
 
-    def __init__(self, datasource: Any, db_description: str, chat_model: BaseChatModel, **kwargs: Any):
+    def __init__(self, datasource: Any, db_description: str, chat_model: BaseChatModel,
+                 cache: SQLGenerationCache = None, **kwargs: Any):
         super().__init__(**kwargs)
         self.db_description = db_description
         self.description = self.description.format(db_description=db_description)
-        self.sql_executor = SQLExecutorAgent(datasource, chat_model=chat_model)
+        self.sql_executor = SQLExecutorAgent(datasource, chat_model=chat_model, cache=cache)
 
     def _run(
             self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None
-    ) -> Tuple[str, pd.DataFrame]:
+    ) -> Tuple[str, QueryResult]:
         """Use the tool."""
         response = self.sql_executor.invoke(query, True)
-        df: pd.DataFrame = response["result"]["dataframe"]
-        return df.to_markdown(), df
+        data: QueryResult = response["result"]["data"]
+        return data.to_markdown(), data
 
     # async def _arun(
     #         self,
@@ -146,29 +221,11 @@ class DatabaseRetrievalTool(BaseTool):
     #     return self._run(a, b, run_manager=run_manager.get_sync())
 
 
-def print_state(state: SQLExecutorState):
-    print("=============================================")
-    print(f"query:\n{state.get('query', 'None')}")
-    print("---------------------------------------------")
-    print(f"db_schema:\n{state.get('db_schema', 'None')}")
-    print("---------------------------------------------")
-    print(f"execute_mode:\n{state.get('execute_mode', 'None')}")
-    print("---------------------------------------------")
-    print(f"instruction:\n{state.get('instruction', 'None')}")
-    print("---------------------------------------------")
-    print(f"sql:\n{state.get('sql', 'None')}")
-    print("---------------------------------------------")
-    print(f"success:\n{state.get('success', 'None')}")
-    print("---------------------------------------------")
-    print(f"result:\n{state.get('result', 'None')}")
-    print("=============================================")
-
-
 if __name__ == '__main__':
 
     chat = Models.create_chat(Models.QWEN25_CODER_7B, temperature=0.5)
 
-    db_retrieval = DatabaseRetrievalTool(SqlLiteDatasource("data/test-hr.db"),
+    db_retrieval = DatabaseRetrievalTool(SqlLiteDatasource.shared("data/test-hr.db"),
                                          db_description="departments and employees, including salaries",
                                          chat_model=chat)
     response = db_retrieval.invoke("show all departments")
@@ -1,6 +1,19 @@
-import random
+import os
+import pathlib
+import re
 import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Callable, Iterator, List, Tuple
+from urllib.parse import quote
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import tracing
+from hr_data_generator import HRDataGenerator
 
 
 HR_DB_SCHEMA = """
@@ -20,11 +33,186 @@ fields (
 """
 
 
+# Statements which can be served from result cache: read-only and deterministic
+CACHEABLE_STATEMENT = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+NON_DETERMINISTIC = re.compile(r"\b(RANDOM|RANDOMBLOB|CURRENT_DATE|CURRENT_TIME|CURRENT_TIMESTAMP)\b|'now'", re.IGNORECASE)
+
+
+# Pragmas applied to every connection: memory mapped I/O and larger page cache (negative value is KiB)
+CONNECTION_PRAGMAS = (
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -65536",
+)
+# Number of prepared statements kept by each connection
+CACHED_STATEMENTS = 256
+
+# Limits of streamed results: rows fetched per record batch, rows and Arrow bytes scanned at most,
+# rows and characters shown to LLM
+FETCH_BATCH_ROWS = 1000
+MAX_RESULT_ROWS = 100_000
+MAX_RESULT_BYTES = 32 * 1024 * 1024
+PREVIEW_ROWS = 20
+MAX_PREVIEW_CHARS = 8000
+
+
+def to_record_batch(columns: List[str], rows: List[tuple]) -> pa.RecordBatch:
+    """
+    Build Arrow record batch from cursor rows column by column.
+    SQLite columns are dynamically typed: column with values of mixed types is stored as strings
+    """
+    arrays = []
+    for values in (zip(*rows) if rows else [()] * len(columns)):
+        try:
+            arrays.append(pa.array(values))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arrays.append(pa.array([None if value is None else str(value) for value in values], type=pa.string()))
+    return pa.RecordBatch.from_arrays(arrays, names=columns)
+
+
+def unique_column_names(columns: List[str]) -> List[str]:
+    """Rename repeated columns (e.g. of SELECT * joins) to name_1, name_2..., Arrow tables need unique names"""
+    used = set(columns)
+    seen = set()
+    names = []
+    for name in columns:
+        unique = name
+        suffix = 0
+        while unique in seen or (unique != name and unique in used):
+            suffix += 1
+            unique = f"{name}_{suffix}"
+        seen.add(unique)
+        names.append(unique)
+    return names
+
+
+def concat_batches(batches: List[pa.RecordBatch]) -> pa.Table:
+    """Combine record batches into table, types of columns inferred per batch are promoted to common type"""
+    if all(batch.schema.equals(batches[0].schema) for batch in batches[1:]):
+        return pa.Table.from_batches(batches)
+    tables = [pa.Table.from_batches([batch]) for batch in batches]
+    try:
+        return pa.concat_tables(tables, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Column changed its type between batches and types can't be promoted: keep it as strings
+        names = tables[0].column_names
+        mixed = {i for i in range(len(names))
+                 if len({table.schema.field(i).type for table in tables} - {pa.null()}) > 1}
+        tables = [pa.Table.from_arrays([column.cast(pa.string()) if i in mixed else column
+                                        for i, column in enumerate(table.columns)], names=names)
+                  for table in tables]
+        return pa.concat_tables(tables, promote_options="permissive")
+
+
+def is_readonly_error(error: sqlite3.OperationalError) -> bool:
+    """Statement modifies data, so it failed on read-only connection"""
+    return "readonly" in str(error)
+
+
+def error_table(error: Exception) -> pa.Table:
+    return pa.table({"error": [str(error)]})
+
+
+class QueryResult:
+    """
+    Result of SQL query retrieved in Arrow record batches.
+    Keeps only preview (first rows), number of rows and summary statistics of numeric columns,
+    full result is loaded as Arrow table on first access to `table` (e.g. when UI renders it).
+    """
+
+    def __init__(self, statement: str, preview: pa.Table, row_count: int, truncated: bool,
+                 stats: Optional[pd.DataFrame] = None, loader: Callable[[], pa.Table] = None, nbytes: int = 0):
+        self.statement = statement
+        self.preview = preview
+        self.row_count = row_count
+        self.truncated = truncated
+        self.stats = stats
+        # Size of full result in Arrow format, estimated while rows were counted
+        self.nbytes = nbytes or preview.nbytes
+        self.__loader = loader
+        self.__table: Optional[pa.Table] = None if loader else preview
+
+    @property
+    def is_error(self) -> bool:
+        return self.preview.column_names == ["error"]
+
+    @property
+    def is_loaded(self) -> bool:
+        """True if full result is in memory, accessing `table` doesn't execute query again"""
+        return self.__table is not None
+
+    @property
+    def table(self) -> pa.Table:
+        """Full result (limited by max_rows of query), loaded on first access"""
+        if self.__table is None:
+            self.__table = self.__loader()
+        return self.__table
+
+    @property
+    def dataframe(self) -> pd.DataFrame:
+        """Full result converted to pandas, use `table` where Arrow is accepted"""
+        return self.table.to_pandas()
+
+    def summary(self) -> str:
+        rows = f"more than {self.row_count}" if self.truncated else str(self.row_count)
+        shown = min(self.preview.num_rows, self.row_count)
+        return f"Query returned {rows} rows, first {shown} rows are shown."
+
+    def to_markdown(self, max_chars: int = MAX_PREVIEW_CHARS) -> str:
+        """Preview for LLM: first rows, number of rows and statistics, limited by max_chars"""
+        text = self.preview.to_pandas().to_markdown()
+        if not self.is_error and (self.truncated or self.row_count > self.preview.num_rows):
+            text = f"{self.summary()}\n\n{text}"
+            if self.stats is not None and not self.stats.empty:
+                text += f"\n\nStatistics of numeric columns:\n\n{self.stats.to_markdown()}"
+        if len(text) > max_chars:
+            text = text[:max_chars] + f"\n... [{len(text) - max_chars} characters truncated]"
+        return text
+
+    def __getstate__(self):
+        # Connections can't be pickled: keep loaded result or preview only
+        state = self.__dict__.copy()
+        state["_QueryResult__table"] = self.__table if self.__table is not None else self.preview
+        state["_QueryResult__loader"] = None
+        return state
+
+
 class SqlLiteDatasource:
-    def __init__(self, db_url: str):
+    """
+    SQLite datasource.
+    Writes go through one long-lived connection (`connection`/`cursor`) which switches database to WAL mode,
+    so readers are not blocked by writers. WAL mode is persistent: it is stored in the database file, and SQLite
+    keeps -wal/-shm files next to it while the database is open (data/test-hr.db is committed in WAL mode already).
+    Queries run on read-only connections, one per thread, created on first use and reused afterwards.
+    Statements which modify data fail on read-only connection, they are executed again by write connection.
+    Use SqlLiteDatasource.shared(db_url) to get one instance per database file for the whole process.
+    """
+
+    __shared: Dict[str, "SqlLiteDatasource"] = {}
+    __shared_lock = threading.Lock()
+
+    def __init__(self, db_url: str, result_cache_bytes: int = 64 * 1024 * 1024):
         self.__db_url = db_url
-        self.connection = sqlite3.connect(db_url)
+        self.connection = self.__connect(db_url)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
         self.cursor = self.connection.cursor()
+        self.__write_lock = threading.RLock()
+        self.__readers = threading.local()
+        # Connections with their threads: thread idents are reused, so connections are closed once thread ends
+        self.__reader_connections: List[Tuple[threading.Thread, sqlite3.Connection]] = []
+        self.__readers_lock = threading.Lock()
+        # Results of SELECTs cached until data changes: PRAGMA data_version of separate connection
+        # changes on commits of other connections (including self.connection and other processes),
+        # write counter covers writes made through this datasource
+        self.__result_cache: OrderedDict = OrderedDict()
+        self.__result_cache_bytes = 0
+        self.__max_result_cache_bytes = result_cache_bytes
+        self.__cache_lock = threading.Lock()
+        self.__cache_version = None
+        self.__write_counter = 0
+        self.__version_connection = sqlite3.connect(db_url, check_same_thread=False)
+        self.cache_hits = 0
+        self.cache_misses = 0
         self.__schema = """
         CREATE TABLE IF NOT EXISTS departments (
             department_id INTEGER PRIMARY KEY,
@@ -41,67 +229,323 @@ class SqlLiteDatasource:
         );
         """
 
+    @classmethod
+    def shared(cls, db_url: str) -> "SqlLiteDatasource":
+        """Return process-wide datasource for given database file"""
+        key = os.path.abspath(db_url)
+        with cls.__shared_lock:
+            if key not in cls.__shared:
+                cls.__shared[key] = cls(db_url)
+            return cls.__shared[key]
+
+    @staticmethod
+    def __connect(database: str, **kwargs) -> sqlite3.Connection:
+        connection = sqlite3.connect(database, check_same_thread=False, cached_statements=CACHED_STATEMENTS, **kwargs)
+        for pragma in CONNECTION_PRAGMAS:
+            connection.execute(pragma)
+        return connection
+
+    def __reader(self) -> sqlite3.Connection:
+        """Read-only connection of current thread"""
+        connection = getattr(self.__readers, "connection", None)
+        if connection is None:
+            path = pathlib.Path(self.__db_url).absolute().as_posix()
+            connection = self.__connect(f"file:{quote(path)}?mode=ro", uri=True)
+            connection.execute("PRAGMA query_only = 1")
+            self.__readers.connection = connection
+            with self.__readers_lock:
+                # Close connections of finished threads
+                alive = []
+                for thread, reader in self.__reader_connections:
+                    if thread.is_alive():
+                        alive.append((thread, reader))
+                    else:
+                        reader.close()
+                self.__reader_connections = alive + [(threading.current_thread(), connection)]
+        return connection
+
+    def close(self):
+        with self.__readers_lock:
+            for _, connection in self.__reader_connections:
+                connection.close()
+            self.__reader_connections.clear()
+        self.__readers = threading.local()
+        self.__version_connection.close()
+        self.connection.close()
+
     def get_schema(self):
         return self.__schema
 
     def execute(self, statement):
-        self.cursor.execute(statement)
-        return self.cursor.fetchall()
+        with self.__write_lock:
+            self.cursor.execute(statement)
+            rows = self.cursor.fetchall()
+            self.connection.commit()
+        if not self.is_cacheable(statement):
+            self.__on_write()
+        return rows
+
+    @staticmethod
+    def normalize_sql(statement: str) -> str:
+        return re.sub(r"\s+", " ", statement).strip().rstrip(";").strip()
+
+    @staticmethod
+    def is_cacheable(statement: str) -> bool:
+        return bool(CACHEABLE_STATEMENT.match(statement)) and not NON_DETERMINISTIC.search(statement)
+
+    def __data_version(self):
+        return self.__version_connection.execute("PRAGMA data_version").fetchone()[0], self.__write_counter
+
+    def __on_write(self):
+        with self.__cache_lock:
+            self.__write_counter += 1
+
+    def clear_result_cache(self):
+        with self.__cache_lock:
+            self.__result_cache.clear()
+            self.__result_cache_bytes = 0
+
+    def __get_cached(self, key: Hashable):
+        with self.__cache_lock:
+            version = self.__data_version()
+            if version != self.__cache_version:
+                self.__result_cache.clear()
+                self.__result_cache_bytes = 0
+                self.__cache_version = version
+            cached = self.__result_cache.get(key)
+            if cached is None:
+                self.cache_misses += 1
+                return None, version
+            self.__result_cache.move_to_end(key)
+            self.cache_hits += 1
+            return cached[0], version
+
+    def __put_cached(self, key, version, value, size: int):
+        if size > self.__max_result_cache_bytes:
+            return
+        with self.__cache_lock:
+            # Data changed while statement was executed, result might be already stale
+            if version != self.__cache_version:
+                return
+            if key in self.__result_cache:
+                self.__result_cache_bytes -= self.__result_cache.pop(key)[1]
+            self.__result_cache[key] = (value, size)
+            self.__result_cache_bytes += size
+            while self.__result_cache_bytes > self.__max_result_cache_bytes:
+                _, (_, evicted_size) = self.__result_cache.popitem(last=False)
+                self.__result_cache_bytes -= evicted_size
 
     def retrieve_as_dataframe(self, statement):
-        with sqlite3.connect(self.__db_url) as connection:
+        if not self.is_cacheable(statement):
+            return self.__retrieve_as_dataframe(statement)
+
+        key = self.normalize_sql(statement)
+        dataframe, version = self.__get_cached(key)
+        if dataframe is None:
+            dataframe = self.__retrieve_as_dataframe(statement)
+            if "error" not in dataframe.columns or len(dataframe.columns) > 1:
+                self.__put_cached(key, version, dataframe, int(dataframe.memory_usage(deep=True).sum()))
+        # Callers get own copy, so cached result can't be modified
+        return dataframe.copy()
+
+    def __retrieve_as_dataframe(self, statement):
+        cursor = None
+        try:
+            cursor = self.__reader().cursor()
             try:
-                cursor = connection.cursor()
                 cursor.execute(statement)
                 columns = [desc[0] for desc in cursor.description]
                 rows = cursor.fetchall()
-            except Exception as e:
-                return pd.DataFrame([[str(e)]], columns=["error"])
-            finally:
-                if cursor:
-                    cursor.close()
+            except sqlite3.OperationalError as e:
+                if not is_readonly_error(e):
+                    raise
+                columns, rows = self.__execute_write(statement)
+        except Exception as e:
+            return pd.DataFrame([[str(e)]], columns=["error"])
+        finally:
+            if cursor:
+                cursor.close()
         return pd.DataFrame(rows, columns=columns)
 
-    def create_schema(self):
-        self.cursor.executescript(self.__schema)
-        self.connection.commit()
-
-    def generate_hr_data(self):
-        # Insert 5 departments
-        departments = [
-            (1, 'Sales'),
-            (2, 'Engineering'),
-            (3, 'HR'),
-            (4, 'Marketing'),
-            (5, 'Finance')
-        ]
-        self.cursor.executemany(
-            "INSERT OR IGNORE INTO departments (department_id, department_name) VALUES (?, ?)",
-            departments
-        )
+    def iter_batches(self, statement: str, batch_size: int = FETCH_BATCH_ROWS,
+                     max_rows: int = None) -> Iterator[Tuple[List[str], List[tuple]]]:
+        """
+        Execute statement and yield (columns, rows) in batches fetched with fetchmany, stop after max_rows rows.
+        Empty result is yielded as one empty batch, so columns are known.
+        Statements which modify data are executed by write connection
+        """
+        cursor = self.__reader().cursor()
+        try:
+            try:
+                cursor.execute(statement)
+            except sqlite3.OperationalError as e:
+                if not is_readonly_error(e):
+                    raise
+                yield self.__execute_write(statement)
+                return
+            columns = [desc[0] for desc in cursor.description]
+            fetched_rows = 0
+            while True:
+                size = batch_size if max_rows is None else min(batch_size, max_rows - fetched_rows)
+                rows = cursor.fetchmany(size) if size > 0 else []
+                if not rows:
+                    if fetched_rows == 0:
+                        yield columns, rows
+                    break
+                fetched_rows += len(rows)
+                yield columns, rows
+        finally:
+            cursor.close()
+
+    def iter_record_batches(self, statement: str, batch_size: int = FETCH_BATCH_ROWS,
+                            max_rows: int = None) -> Iterator[pa.RecordBatch]:
+        """Execute statement and yield result as Arrow record batches, repeated column names are made unique"""
+        names = None
+        for columns, rows in self.iter_batches(statement, batch_size, max_rows):
+            names = names or unique_column_names(columns)
+            yield to_record_batch(names, rows)
+
+    def __execute_write(self, statement: str) -> Tuple[List[str], List[tuple]]:
+        """
+        Execute statement on write connection, return rows of RETURNING clause or number of changed rows.
+        Result of the statement is not read lazily, it's executed only once
+        """
+        with self.__write_lock:
+            cursor = self.connection.cursor()
+            try:
+                cursor.execute(statement)
+                if cursor.description is None:
+                    columns, rows = ["changed_rows"], [(cursor.rowcount,)]
+                else:
+                    columns, rows = [desc[0] for desc in cursor.description], cursor.fetchall()
+                self.connection.commit()
+            except Exception:
+                self.connection.rollback()
+                raise
+            finally:
+                cursor.close()
+        self.__on_write()
+        return columns, rows
+
+    def retrieve_result(self, statement: str, preview_rows: int = PREVIEW_ROWS, max_rows: int = MAX_RESULT_ROWS,
+                        max_bytes: Optional[int] = MAX_RESULT_BYTES) -> QueryResult:
+        """
+        Execute statement streaming rows in batches: keep first preview_rows rows, count rows and
+        aggregate statistics of numeric columns, full result is loaded lazily by QueryResult.table.
+        Result is truncated after max_rows rows or after the batch which reached max_bytes of Arrow data.
+        Results of cacheable statements are cached like in retrieve_as_dataframe and shared by callers
+        (Arrow tables are immutable)
+        """
+        if not self.is_cacheable(statement):
+            return self.__retrieve_result(statement, preview_rows, max_rows, max_bytes)
+
+        key = ("result", self.normalize_sql(statement), preview_rows, max_rows, max_bytes)
+        result, version = self.__get_cached(key)
+        if result is None:
+            result = self.__retrieve_result(statement, preview_rows, max_rows, max_bytes)
+            if not result.is_error:
+                # Full result is counted, it's kept by cached QueryResult once loaded
+                self.__put_cached(key, version, result, result.preview.nbytes + result.nbytes)
+        return result
 
-        # Create and insert 100 employees
-        employees = []
-        first_names = ["John", "Jane", "Alice", "Bob", "Carol"]
-        last_names = ["Smith", "Doe", "Brown", "Johnson", "Davis"]
-
-        for emp_id in range(1, 101):
-            fname = random.choice(first_names)
-            lname = random.choice(last_names)
-            salary = random.randint(1000, 10000)
-            dept_id = random.randint(1, 5)
-            employees.append((emp_id, fname, lname, salary, dept_id))
-
-        self.cursor.executemany(
-            """
-            INSERT OR IGNORE INTO employee (emp_id, first_name, last_name, salary, department_id)
-            VALUES (?, ?, ?, ?, ?)
-            """,
-            employees
+    def __retrieve_result(self, statement: str, preview_rows: int, max_rows: int, max_bytes: Optional[int]):
+        preview_batches = []
+        preview_size = 0
+        row_count = 0
+        result_bytes = 0
+        truncated = False
+        totals: Dict[int, dict] = {}
+        with tracing.span("sql.query", kind="client", **{"db.system": "sqlite", "db.statement": statement}) as sql_span:
+            try:
+                # One extra row is fetched to find out if result is truncated
+                for batch in self.iter_record_batches(statement, max_rows=max_rows + 1):
+                    if max_bytes is not None and result_bytes >= max_bytes:
+                        # Byte limit was reached by previous batches and there are more rows
+                        truncated = True
+                        break
+                    if row_count + batch.num_rows > max_rows:
+                        truncated = True
+                        batch = batch.slice(0, max_rows - row_count)
+                    if not preview_batches or preview_size < preview_rows:
+                        preview_batches.append(batch.slice(0, preview_rows - preview_size))
+                        preview_size += preview_batches[-1].num_rows
+                    row_count += batch.num_rows
+                    result_bytes += batch.nbytes
+                    self.__aggregate(batch, totals)
+                preview = concat_batches(preview_batches)
+            except Exception as e:
+                sql_span.set(**{"error.type": type(e).__name__})
+                return QueryResult(statement, error_table(e), 1, False)
+            sql_span.set(**{"db.rows": row_count, "db.bytes": result_bytes, "db.truncated": truncated})
+
+        stats = self.__stats(preview.column_names, totals)
+
+        if not truncated and row_count <= preview_rows:
+            return QueryResult(statement, preview, row_count, truncated, stats, nbytes=result_bytes)
+
+        def load() -> pa.Table:
+            with tracing.span("sql.load", kind="client", **{"db.system": "sqlite", "db.statement": statement}):
+                # Rows are limited to counted rows, so max_bytes limits full result as well
+                batches = list(self.iter_record_batches(statement, max_rows=row_count))
+                return concat_batches(batches) if batches else preview
+
+        return QueryResult(statement, preview, row_count, truncated, stats, loader=load, nbytes=result_bytes)
+
+    @staticmethod
+    def __aggregate(batch: pa.RecordBatch, totals: Dict[int, dict]):
+        """Add count, sum, min and max of numeric columns of record batch to totals of columns by position"""
+        for index, column in enumerate(batch.columns):
+            total = totals.setdefault(index, {"numeric": True, "count": 0, "sum": 0, "min": None, "max": None})
+            if not total["numeric"] or pa.types.is_null(column.type):
+                continue
+            if not (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)):
+                # Column turned out not numeric (e.g. text values in later batches), it's excluded from stats
+                total["numeric"] = False
+                continue
+            count = pc.count(column).as_py()
+            if count == 0:
+                continue
+            min_max = pc.min_max(column).as_py()
+            total["count"] += count
+            total["sum"] += pc.sum(column).as_py()
+            total["min"] = min_max["min"] if total["min"] is None else min(total["min"], min_max["min"])
+            total["max"] = min_max["max"] if total["max"] is None else max(total["max"], min_max["max"])
+
+    @staticmethod
+    def __stats(columns: List[str], totals: Dict[int, dict]) -> Optional[pd.DataFrame]:
+        """Statistics of numeric columns with at least one value, None when there are no such columns"""
+        numeric = [(columns[index], total) for index, total in sorted(totals.items())
+                   if total["numeric"] and total["count"]]
+        if not numeric:
+            return None
+        return pd.DataFrame(
+            [[total["count"], total["min"], total["max"], total["sum"] / total["count"]] for _, total in numeric],
+            index=[name for name, _ in numeric], columns=["count", "min", "max", "mean"]
         )
-        self.connection.commit()
 
-    def update_hr_data(self):
+    def create_schema(self):
+        with self.__write_lock:
+            self.cursor.executescript(self.__schema)
+            self.connection.commit()
+        self.__on_write()
+
+    def generate_hr_data(self, employees: int = 100, seed: int = 42, batch_size: int = 100_000,
+                         replace: bool = False) -> Dict[str, int]:
+        """
+        Add synthetic HR dataset (departments, employees, salary history, projects), rows which already exist
+        are kept. replace=True drops HR tables with all their data and loads generated dataset instead.
+        See hr_data_generator for sizes up to millions of employees. Return number of added rows per table
+        """
+        with self.__write_lock:
+            counts = HRDataGenerator(seed, batch_size).load(self.connection, employees, replace=replace)
+        self.__on_write()
+        return counts
+
+    def update_hr_data(self, seed: int = None):
+        """
+        Give employees new names: every name combination is used once before any combination repeats,
+        so names are unique while there are fewer employees than combinations
+        """
         # Extended list of names and surnames for more unique combinations
         first_names = ["John", "Jane", "Alice", "Bob", "Carol", "David", "Emma", "Frank", 
                       "Grace", "Henry", "Ivy", "Jack", "Kelly", "Leo", "Mary", "Noah", 
@@ -111,32 +555,30 @@ class SqlLiteDatasource:
                      "Martin", "Thompson", "Young", "Clark", "Walker", "Hall", "Allen"]
 
         # Get current employees
-        employees = self.retrieve_as_dataframe("SELECT emp_id FROM employee ORDER BY emp_id")
-        emp_ids = employees['emp_id'].tolist()
+        emp_ids = [row[0] for row in self.__reader().execute("SELECT emp_id FROM employee ORDER BY emp_id")]
+        if not emp_ids:
+            return
 
-        # Generate unique name combinations
-        used_combinations = set()
-        updated_employees = []
-
-        for emp_id in emp_ids:
-            while True:
-                fname = random.choice(first_names)
-                lname = random.choice(last_names)
-                if (fname, lname) not in used_combinations:
-                    used_combinations.add((fname, lname))
-                    updated_employees.append((fname, lname, emp_id))
-                    break
+        # Shuffled combinations are repeated as many times as needed to name all employees
+        rng = np.random.default_rng(seed)
+        combinations = len(first_names) * len(last_names)
+        repeats = -(-len(emp_ids) // combinations)
+        combination = np.concatenate([rng.permutation(combinations) for _ in range(repeats)])[:len(emp_ids)]
+        updated_employees = zip(np.array(first_names)[combination // len(last_names)].tolist(),
+                                np.array(last_names)[combination % len(last_names)].tolist(), emp_ids)
 
         # Update the database with new unique combinations
-        self.cursor.executemany(
-            """
-            UPDATE employee 
-            SET first_name = ?, last_name = ?
-            WHERE emp_id = ?
-            """,
-            updated_employees
-        )
-        self.connection.commit()
+        with self.__write_lock:
+            self.cursor.executemany(
+                """
+                UPDATE employee 
+                SET first_name = ?, last_name = ?
+                WHERE emp_id = ?
+                """,
+                updated_employees
+            )
+            self.connection.commit()
+        self.__on_write()
 
     def update_department_distribution(self):
         # Department distribution mapping
@@ -164,19 +606,21 @@ class SqlLiteDatasource:
             current_position += count
 
         # Update employee departments
-        self.cursor.executemany(
-            """
-            UPDATE employee 
-            SET department_id = ?
-            WHERE emp_id = ?
-            """,
-            updates
-        )
-        self.connection.commit()
+        with self.__write_lock:
+            self.cursor.executemany(
+                """
+                UPDATE employee 
+                SET department_id = ?
+                WHERE emp_id = ?
+                """,
+                updates
+            )
+            self.connection.commit()
+        self.__on_write()
 
 
 if __name__ == '__main__':
-    db = SqlLiteDatasource("data/test-hr.db")
+    db = SqlLiteDatasource.shared("data/test-hr.db")
     db.update_department_distribution()
     
     # Verify the distribution
@@ -0,0 +1,45 @@
+import time
+
+from command_executor import CommandExecutor, OutputBuffer
+
+
+def test_output_buffer_keeps_head_and_tail():
+    buffer = OutputBuffer(max_bytes=10)
+    for chunk in ("abc", "defgh", "ijklmnop", "qrst"):
+        buffer.append(chunk)
+    assert buffer.size == 20
+    assert buffer.truncated and buffer.omitted == 10
+    assert buffer.getvalue() == "abcde\n\n... 10 bytes of output omitted ...\n\npqrst"
+
+
+def test_output_buffer_small_output_is_not_truncated():
+    buffer = OutputBuffer(max_bytes=10)
+    buffer.append("héllo")
+    assert not buffer.truncated
+    assert buffer.getvalue() == "héllo"
+
+
+def test_run_returns_output_and_return_code():
+    output = CommandExecutor().run("echo out; echo err >&2; exit 3")
+    assert "out\n" in output and "err\n" in output
+    assert output.endswith("Process finished with return code 3")
+
+
+def test_run_kills_command_after_timeout():
+    started = time.monotonic()
+    output = CommandExecutor(timeout=0.5).run("sleep 30")
+    assert output.endswith("Process killed after timeout of 0.5 seconds")
+    assert time.monotonic() - started < 5
+
+
+def test_run_kills_command_which_closed_its_output():
+    started = time.monotonic()
+    output = CommandExecutor(timeout=0.5).run("exec >/dev/null 2>&1; sleep 30")
+    assert output.endswith("Process killed after timeout of 0.5 seconds")
+    assert time.monotonic() - started < 5
+
+
+def test_large_output_is_bounded():
+    output = CommandExecutor(max_output_bytes=1000).run("head -c 1000000 /dev/zero | tr '\\0' 'x'")
+    assert "bytes of output omitted" in output
+    assert len(output) < 2000
@@ -0,0 +1,63 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from benchmarks.fake_chat_model import ScriptedChatModel
+from context_window import SUMMARY_NAME, ContextWindow
+
+
+def conversation(turns: int, answer_size: int = 100) -> list:
+    history = [SystemMessage(content="You are HR assistant")]
+    for i in range(turns):
+        history.append(HumanMessage(content=f"Question {i}"))
+        history.append(AIMessage(content=f"Answer {i} " + "x" * answer_size))
+    return history
+
+
+def test_history_within_budget_is_kept():
+    history = conversation(3)
+    assert ContextWindow(token_budget=10000).compact(history) == history
+
+
+def test_old_tool_outputs_are_elided():
+    history = conversation(1) + [
+        HumanMessage(content="List employees"),
+        AIMessage(content="", tool_calls=[{"name": "sql", "args": {}, "id": "1"}]),
+        ToolMessage(content="row\n" * 1000, tool_call_id="1"),
+        AIMessage(content="Done"),
+        HumanMessage(content="Thanks"),
+    ]
+    compacted = ContextWindow(token_budget=100000, max_tool_output_tokens=10).compact(history)
+    assert len(compacted) == len(history)
+    assert compacted[5].content.startswith("row\n" * 10)
+    assert "characters elided" in compacted[5].content
+    assert history[5].content == "row\n" * 1000  # history of agent is not changed in place
+
+
+def test_older_turns_are_dropped_without_summary_model():
+    history = conversation(20)
+    compacted = ContextWindow(token_budget=400, max_tool_output_tokens=10).compact(history)
+    assert compacted[0] == history[0]
+    assert compacted[-1] == history[-1]
+    assert isinstance(compacted[1], HumanMessage)
+    assert 2 < len(compacted) < len(history)
+
+
+def test_older_turns_are_summarized():
+    model = ScriptedChatModel(responses=[AIMessage(content="User asked 15 questions")])
+    window = ContextWindow(token_budget=400, max_tool_output_tokens=10, summary_model=model)
+    compacted = window.compact(conversation(20))
+    summary = compacted[1]
+    assert isinstance(summary, SystemMessage) and summary.name == SUMMARY_NAME
+    assert "User asked 15 questions" in summary.content
+
+    # Summary is summarized again with next older turns, it is not pinned as system instruction
+    again = window.compact(compacted + conversation(20)[1:])
+    assert [message.name for message in again].count(SUMMARY_NAME) == 1
+
+
+def test_async_compact_summarizes():
+    model = ScriptedChatModel(responses=[AIMessage(content="Summary")])
+    window = ContextWindow(token_budget=400, max_tool_output_tokens=10, summary_model=model)
+    compacted = asyncio.run(window.acompact(conversation(20)))
+    assert compacted[1].name == SUMMARY_NAME
@@ -0,0 +1,135 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from history_store import HistoryStore
+from sqllite_datasource import SqlLiteDatasource
+
+TEST_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "test-hr.db")
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def datasource(tmp_path):
+    db_path = tmp_path / "test-hr.db"
+    shutil.copy(TEST_DB, db_path)
+    datasource = SqlLiteDatasource(str(db_path))
+    yield datasource
+    datasource.close()
+
+
+def test_chat_messages_are_paged(store):
+    session_id = store.create_session("Departments")
+    for i in range(5):
+        store.append_chat_message(session_id, {"id": str(i), "role": "user", "content": f"Message {i}"})
+
+    assert store.count_chat_messages(session_id) == 5
+    assert store.list_sessions()[0]["message_count"] == 5
+    last = store.load_chat_messages(session_id, limit=2)
+    assert [message["content"] for message in last] == ["Message 3", "Message 4"]
+    earlier = store.load_chat_messages(session_id, limit=2, before=last[0]["seq"])
+    assert [message["content"] for message in earlier] == ["Message 1", "Message 2"]
+
+
+def test_updated_chat_message(store):
+    session_id = store.create_session("Command")
+    store.append_chat_message(session_id, {"id": "1", "role": "assistant", "content": {"command": "ls"}})
+    store.update_chat_message(session_id, {"id": "1", "role": "assistant", "content": {"command": "ls", "output": "a"}})
+    assert store.load_chat_messages(session_id)[0]["content"] == {"command": "ls", "output": "a"}
+
+
+def test_agent_history_is_appended_and_replaced(store):
+    session_id = store.create_session("Agent")
+    history = [SystemMessage(content="Instruction"), HumanMessage(content="Hi"), AIMessage(content="Hello")]
+    store.save_agent_history(session_id, history)
+    history.append(HumanMessage(content="Bye"))
+    store.save_agent_history(session_id, history)
+    loaded = store.load_agent_history(session_id)
+    assert [message.content for message in loaded] == ["Instruction", "Hi", "Hello", "Bye"]
+
+    # Compacted history is not an extension of saved one, it replaces stored history
+    compacted = [history[0], history[-1]]
+    store.save_agent_history(session_id, compacted)
+    assert [message.content for message in store.load_agent_history(session_id)] == ["Instruction", "Bye"]
+
+
+def test_agent_histories_of_sessions_saved_concurrently(store):
+    session_ids = [store.create_session(f"Session {i}") for i in range(8)]
+
+    def chat(session_id: str):
+        history = [SystemMessage(content="Instruction")]
+        for turn in range(20):
+            history += [HumanMessage(content=f"{session_id} {turn}"), AIMessage(content=f"Answer {turn}")]
+            store.save_agent_history(session_id, history)
+        return history
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        histories = list(executor.map(chat, session_ids))
+    for session_id, history in zip(session_ids, histories):
+        assert [m.content for m in store.load_agent_history(session_id)] == [m.content for m in history]
+
+
+def test_loaded_query_result_is_stored_in_full(store, datasource):
+    session_id = store.create_session("Employees")
+    result = datasource.retrieve_result("SELECT e.emp_id, e.salary FROM employee e", preview_rows=5)
+    assert result.table.num_rows == 100
+    store.append_chat_message(session_id, {"id": "1", "role": "assistant", "content": {"result": result}})
+    store.append_chat_message(session_id, {"id": "2", "role": "assistant", "content": {"result": result}})
+
+    loaded = store.load_chat_messages(session_id)[0]["content"]["result"]
+    assert loaded.row_count == 100 and loaded.preview.num_rows == 5
+    assert not loaded.is_loaded
+    assert loaded.table.num_rows == 100
+    assert loaded.stats.loc["salary", "count"] == 100
+    # Artifact of the same result is written once
+    assert len(os.listdir(os.path.join(store.artifacts_directory, session_id))) == 1
+
+
+def test_not_loaded_query_result_is_stored_as_preview(store, datasource):
+    session_id = store.create_session("Employees")
+    result = datasource.retrieve_result("SELECT e.emp_id, e.salary FROM employee e ORDER BY e.emp_id", preview_rows=5)
+    datasource.execute("UPDATE employee SET salary = 0")
+    store.append_chat_message(session_id, {"id": "1", "role": "assistant", "content": result})
+
+    # Query is not executed again, so stored rows are the rows shown to user
+    assert not result.is_loaded
+    loaded = store.load_chat_messages(session_id)[0]["content"]
+    assert loaded.row_count == 100
+    assert loaded.table.equals(result.preview)
+
+    # Once full result is loaded, it replaces stored preview
+    assert result.table.num_rows == 100
+    store.update_chat_message(session_id, {"id": "1", "role": "assistant", "content": result})
+    assert store.load_chat_messages(session_id)[0]["content"].table.num_rows == 100
+
+
+def test_join_with_repeated_column_names_is_stored(store, datasource):
+    session_id = store.create_session("Join")
+    result = datasource.retrieve_result(
+        "SELECT * FROM employee e JOIN departments d ON e.department_id = d.department_id", preview_rows=5
+    )
+    store.append_chat_message(session_id, {"id": "1", "role": "assistant", "content": result})
+    loaded = store.load_chat_messages(session_id)[0]["content"]
+    assert loaded.table.column_names == result.table.column_names
+
+
+def test_dataframe_and_deleted_session(store):
+    session_id = store.create_session("Frame")
+    frame = pd.DataFrame({"department": ["IT", "HR"], "count": [3, 2]})
+    store.append_chat_message(session_id, {"id": "1", "role": "assistant", "content": frame})
+    assert store.load_chat_messages(session_id)[0]["content"].equals(frame)
+
+    store.delete_session(session_id)
+    assert store.list_sessions() == []
+    assert store.load_chat_messages(session_id) == []
+    assert not os.path.exists(os.path.join(store.artifacts_directory, session_id))
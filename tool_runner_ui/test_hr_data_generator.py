@@ -0,0 +1,113 @@
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+from hr_data_generator import HR_DATASET_TABLES, HRDataGenerator
+from sqllite_datasource import SqlLiteDatasource
+
+TEST_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "test-hr.db")
+
+
+def dump(connection: sqlite3.Connection) -> dict:
+    return {table: connection.execute(f"SELECT * FROM {table} ORDER BY 1, 2").fetchall() for table in HR_DATASET_TABLES}
+
+
+def generate(path, employees: int = 500, seed: int = 7, batch_size: int = 200) -> sqlite3.Connection:
+    connection = sqlite3.connect(str(path))
+    HRDataGenerator(seed, batch_size).load(connection, employees)
+    return connection
+
+
+def test_same_seed_gives_same_data(tmp_path):
+    first, second = generate(tmp_path / "first.db"), generate(tmp_path / "second.db")
+    other = generate(tmp_path / "other.db", seed=8)
+    assert dump(first) == dump(second)
+    assert dump(first)["employee"] != dump(other)["employee"]
+
+
+def test_row_counts(tmp_path):
+    connection = sqlite3.connect(str(tmp_path / "hr.db"))
+    counts = HRDataGenerator(seed=1, batch_size=300).load(connection, 1000)
+    assert counts["departments"] == 10
+    assert counts["employee"] == 1000
+    assert counts["projects"] == 50
+    assert counts["salary_history"] >= 1000
+    for table, count in counts.items():
+        assert connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == count
+    # Every employee has exactly one current salary, equal to salary in employee table
+    assert connection.execute(
+        "SELECT COUNT(*) FROM salary_history h JOIN employee e ON e.emp_id = h.emp_id "
+        "WHERE h.end_date IS NULL AND h.salary = e.salary"
+    ).fetchone()[0] == 1000
+
+
+def test_referential_integrity(tmp_path):
+    connection = generate(tmp_path / "hr.db")
+    orphans = {
+        "employee": "SELECT COUNT(*) FROM employee e LEFT JOIN departments d USING (department_id) "
+                    "WHERE d.department_id IS NULL",
+        "projects": "SELECT COUNT(*) FROM projects p LEFT JOIN departments d USING (department_id) "
+                    "WHERE d.department_id IS NULL",
+        "salary_history": "SELECT COUNT(*) FROM salary_history h LEFT JOIN employee e USING (emp_id) "
+                          "WHERE e.emp_id IS NULL",
+        "employee_projects": "SELECT COUNT(*) FROM employee_projects a LEFT JOIN employee e USING (emp_id) "
+                             "LEFT JOIN projects p USING (project_id) WHERE e.emp_id IS NULL OR p.project_id IS NULL",
+    }
+    assert {table: connection.execute(sql).fetchone()[0] for table, sql in orphans.items()} == dict.fromkeys(orphans, 0)
+    assert connection.execute("PRAGMA foreign_key_check").fetchall() == []
+
+
+def test_existing_rows_are_kept(tmp_path):
+    connection = generate(tmp_path / "hr.db", employees=100)
+    connection.execute("UPDATE employee SET first_name = 'Kept' WHERE emp_id = 1")
+    connection.commit()
+    before = dump(connection)
+
+    counts = HRDataGenerator(seed=9).load(connection, 150)
+    assert counts["employee"] == 50
+    after = dump(connection)
+    assert after["employee"][:100] == before["employee"]
+    assert after["employee"][0][1] == "Kept"
+    # History of existing employees is not added again
+    assert [row for row in after["salary_history"] if row[0] <= 100] == before["salary_history"]
+
+
+def test_replace_drops_existing_rows(tmp_path):
+    connection = generate(tmp_path / "hr.db", employees=100)
+    connection.execute("UPDATE employee SET first_name = 'Dropped' WHERE emp_id = 1")
+    connection.commit()
+    counts = HRDataGenerator(seed=7, batch_size=200).load(connection, 50, replace=True)
+    assert counts["employee"] == 50
+    assert connection.execute("SELECT COUNT(*) FROM employee WHERE first_name = 'Dropped'").fetchone()[0] == 0
+    assert connection.execute("SELECT COUNT(*) FROM employee").fetchone()[0] == 50
+
+
+@pytest.fixture
+def datasource(tmp_path):
+    db_path = tmp_path / "test-hr.db"
+    shutil.copy(TEST_DB, db_path)
+    datasource = SqlLiteDatasource(str(db_path))
+    yield datasource
+    datasource.close()
+
+
+def test_generate_hr_data_keeps_existing_employees(datasource):
+    employees = datasource.retrieve_as_dataframe("SELECT * FROM employee ORDER BY emp_id")
+    counts = datasource.generate_hr_data(employees=120)
+    assert counts["employee"] == 20
+    assert datasource.retrieve_as_dataframe("SELECT * FROM employee ORDER BY emp_id").head(100).equals(employees)
+
+
+def test_update_hr_data_of_empty_table(datasource):
+    datasource.execute("DELETE FROM employee")
+    datasource.update_hr_data(seed=1)
+    assert datasource.retrieve_as_dataframe("SELECT COUNT(*) AS n FROM employee")["n"][0] == 0
+
+
+def test_update_hr_data_gives_unique_names(datasource):
+    datasource.update_hr_data(seed=1)
+    names = datasource.retrieve_as_dataframe("SELECT first_name, last_name FROM employee")
+    assert len(names) == 100
+    assert not names.duplicated().any()
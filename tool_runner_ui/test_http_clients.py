@@ -0,0 +1,81 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+import http_clients
+
+
+class PortEchoHandler(BaseHTTPRequestHandler):
+    """Responds with client port, so tests can tell whether connection was reused"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = str(self.client_address[1]).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PortEchoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_clients_and_transports_are_shared_per_base_url_and_limits(base_url):
+    limits = httpx.Limits(max_connections=2)
+
+    assert http_clients.sync_client(base_url) is http_clients.sync_client(base_url)
+    assert http_clients.async_client(base_url) is http_clients.async_client(base_url)
+    assert http_clients.sync_client(base_url, limits=limits) is not http_clients.sync_client(base_url)
+    assert http_clients.sync_client(base_url + "/v1") is not http_clients.sync_client(base_url)
+    assert http_clients.sync_client(base_url)._transport is http_clients.sync_transport(base_url)
+    assert http_clients.async_client(base_url)._transport is http_clients.async_transport(base_url)
+
+
+def test_sync_client_reuses_connection(base_url):
+    client = http_clients.sync_client(base_url)
+    ports = {client.get(f"{base_url}/").text for _ in range(3)}
+    assert len(ports) == 1
+
+
+def test_async_transport_keeps_pool_per_event_loop(base_url):
+    transport = http_clients.async_transport(base_url)
+    pools = transport._LoopLocalAsyncTransport__transports
+    client = http_clients.async_client(base_url)
+
+    async def get_ports():
+        ports = [(await client.get(f"{base_url}/")).text for _ in range(3)]
+        return ports, pools[asyncio.get_running_loop()]
+
+    first_ports, first_pool = asyncio.run(get_ports())
+    second_ports, second_pool = asyncio.run(get_ports())
+
+    # Connection is reused within loop, every loop gets its own pool, pool of closed loop is dropped
+    assert len(set(first_ports)) == 1 and len(set(second_ports)) == 1
+    assert first_ports != second_ports
+    assert first_pool is not second_pool
+    assert list(pools.values()) == [second_pool]
+
+
+def test_closing_async_transport_closes_pool_of_current_loop_only(base_url):
+    transport = http_clients.LoopLocalAsyncTransport()
+    pools = transport._LoopLocalAsyncTransport__transports
+
+    async def request_and_close():
+        async with httpx.AsyncClient(transport=transport) as client:
+            await client.get(f"{base_url}/")
+            assert asyncio.get_running_loop() in pools
+        return asyncio.get_running_loop() in pools
+
+    assert asyncio.run(request_and_close()) is False
@@ -1,7 +1,11 @@
+import asyncio
+
+from langchain_core.messages import AIMessage
 from langchain_core.tools import tool
 from pandas import DataFrame
 from typing_extensions import Tuple
 import tools
+from benchmarks.fake_chat_model import ScriptedChatModel
 from llm_chat_agent import LLMChatState, LLMChatAgent, ToolConfig, CallAgentTool
 from logger import Logger
 from models import Models
@@ -62,7 +66,7 @@ def sql_exec_tool(statement: str) -> Tuple[str, DataFrame]:
     Returns:
         DataFrame with result from execution of SQL
     """
-    db = SqlLiteDatasource("data/test-hr.db")
+    db = SqlLiteDatasource.shared("data/test-hr.db")
     dataframe = db.retrieve_as_dataframe(statement)
     return dataframe.to_markdown(), dataframe
 
@@ -142,6 +146,78 @@ def print_state(state: LLMChatState):
     print("=============================================")
 
 
+def scripted_agent() -> LLMChatAgent:
+    return LLMChatAgent("Scripted agent", Logger.WHITE, ScriptedChatModel(responses=[AIMessage(content="Hello")]),
+                        toolkit={})
+
+
+def test_cancelled_ainvoke_releases_lock():
+    agent = scripted_agent()
+    lock = agent._LLMChatAgent__lock
+
+    async def cancel_waiting_request():
+        lock.acquire()  # Agent is busy with another request
+        request = asyncio.create_task(agent.ainvoke("Hi"))
+        await asyncio.sleep(0.1)
+        request.cancel()
+        lock.release()
+        try:
+            await request
+        except asyncio.CancelledError:
+            pass
+        return await asyncio.wait_for(agent.ainvoke("Hi"), timeout=5)
+
+    assert asyncio.run(cancel_waiting_request())["output"] == "Hello"
+    assert not lock.locked()
+
+
+def test_lock_acquired_after_caller_loop_is_closed_is_released():
+    agent = scripted_agent()
+    lock = agent._LLMChatAgent__lock
+    lock.acquire()  # Agent is busy with another request until loop of cancelled request is closed
+
+    async def cancel_waiting_request():
+        request = asyncio.create_task(agent.ainvoke("Hi"))
+        await asyncio.sleep(0.1)
+        request.cancel()
+        try:
+            await request
+        except asyncio.CancelledError:
+            pass
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(cancel_waiting_request())
+    loop.close()
+    lock.release()
+
+    assert lock.acquire(timeout=5)
+    lock.release()
+
+
+def test_closed_astream_releases_lock():
+    agent = scripted_agent()
+
+    async def read_first_chunk():
+        chunks = agent.astream("Hi")
+        await chunks.__anext__()
+        await chunks.aclose()
+
+    asyncio.run(read_first_chunk())
+    assert agent.invoke("Hi")["output"] == "Hello"
+
+
+def test_agents_share_compiled_graphs_and_keep_own_history():
+    first, second = scripted_agent(), scripted_agent()
+    assert first._LLMChatAgent__graph is second._LLMChatAgent__graph
+    assert first._LLMChatAgent__async_graph is second._LLMChatAgent__async_graph
+
+    first.invoke("Hi")
+    events = list(second.stream("Hello there"))
+    assert events[-1]["state"]["output"] == "Hello"
+    assert [message.content for message in first.get_history()[-2:]] == ["Hi", "Hello"]
+    assert [message.content for message in second.get_history()[-2:]] == ["Hello there", "Hello"]
+
+
 if __name__ == '__main__':
 
     assistant = create_agent()
@@ -0,0 +1,94 @@
+import io
+import json
+import logging
+import logging.handlers
+import queue
+
+import pytest
+
+import logger
+from logger import ConsoleFormatter, JsonFormatter, Logger, LoggerQueueHandler, lazy
+
+
+class CaptureLogger(Logger):
+    def __init__(self):
+        self.name = "Test"
+        self.color = Logger.GREEN
+
+
+@pytest.fixture
+def listener_output():
+    """Logger records are passed through queue to listener thread writing to returned stream"""
+    stream = io.StringIO()
+    console_handler = logging.StreamHandler(stream)
+    console_handler.setFormatter(ConsoleFormatter())
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, console_handler, respect_handler_level=True)
+    queue_handler = LoggerQueueHandler(records)
+    logger._logger.addHandler(queue_handler)
+    listener.start()
+
+    def written() -> str:
+        """Wait until queued records are written by listener and return output"""
+        listener.stop()
+        return stream.getvalue()
+
+    yield written, console_handler
+    logger._logger.removeHandler(queue_handler)
+    if listener._thread is not None:
+        listener.stop()
+
+
+def test_nothing_is_evaluated_when_info_is_disabled(caplog):
+    caplog.set_level(logging.WARNING)
+    evaluated = []
+
+    CaptureLogger().log("History: {history}", history=lazy(lambda: evaluated.append("log")))
+    CaptureLogger().log_hist(lambda: evaluated.append("log_hist") or "message")
+
+    assert evaluated == []
+    assert caplog.records == []
+
+
+def test_lazy_values_are_evaluated_and_truncated_when_logged(caplog):
+    caplog.set_level(logging.INFO)
+
+    CaptureLogger().log("History: {history}", history=lazy(lambda: "x" * (logger.max_value_length + 10)))
+
+    record = caplog.records[-1]
+    assert record.agent == "Test" and record.template == "History: {history}"
+    assert record.fields["history"].endswith("... [10 more chars]")
+
+
+def test_records_are_formatted_by_listener_thread(listener_output, caplog):
+    caplog.set_level(logging.INFO)
+    written, _ = listener_output
+
+    CaptureLogger().log("Processing {file}", file="data.txt")
+
+    output = written()
+    assert "[Test]" in output
+    assert f"{Logger.BG_BLACK}{Logger.GREEN}data.txt" in output
+
+
+def test_handler_level_of_listener_is_respected(listener_output, caplog):
+    caplog.set_level(logging.INFO)
+    written, console_handler = listener_output
+    console_handler.setLevel(logging.WARNING)
+
+    CaptureLogger().log("Processing {file}", file="data.txt")
+    logger._logger.warning("Disk is full")
+
+    output = written()
+    assert "data.txt" not in output
+    assert "Disk is full" in output
+
+
+def test_json_format_keeps_fields_apart(caplog):
+    caplog.set_level(logging.INFO)
+
+    CaptureLogger().log("Processing {file}", file="data.txt")
+    entry = json.loads(JsonFormatter().format(caplog.records[-1]))
+
+    assert entry["message"] == "[Test] Processing data.txt"
+    assert entry["agent"] == "Test" and entry["fields"] == {"file": "data.txt"}
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import os
+import sys
+import time
+
+import anyio
+import pytest
+from langchain_core.tools import ToolException
+from mcp.types import Tool
+
+from background_loop import shared_loop
+from mcp_tool_cache import MCPToolListCache
+from mcp_tool_client import MCPToolSTDIOClient, MCPServersClient, McpToLangChainAdapter, schema_validator
+
+FAKE_MCP_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "fake_mcp_server.py")
+# Never answers initialize request, exits when its stdin is closed
+HUNG_SERVER = {"command": sys.executable, "args": ["-c", "import sys; sys.stdin.read()"]}
+
+
+def server_config(*args: str) -> dict:
+    return {"command": sys.executable, "args": [FAKE_MCP_SERVER, *args]}
+
+
+@pytest.fixture
+def clients():
+    """Collects clients created by the test, their sessions and server processes are closed afterwards"""
+    created = []
+    yield created
+    for client in created:
+        shared_loop.run(client.close())
+
+
+def wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Condition not met in time"
+        time.sleep(0.05)
+
+
+def servers_client(clients: list, servers: dict, **kwargs) -> MCPServersClient:
+    client = MCPServersClient(json.dumps({"mcpServers": servers}), **kwargs)
+    clients.append(client)
+    return client
+
+
+def stdio_client(clients: list, *args: str, **kwargs) -> MCPToolSTDIOClient:
+    client = MCPToolSTDIOClient(json.dumps(server_config(*args)), **kwargs)
+    clients.append(client)
+    return client
+
+
+def test_pool_runs_calls_in_parallel_up_to_max_sessions(clients):
+    client = stdio_client(clients, max_sessions=2)
+    shared_loop.run(client.connect())
+
+    async def sleep_calls(count: int):
+        return await asyncio.gather(*[client.call_tool("sleep", seconds=0.5) for _ in range(count)])
+
+    started = time.monotonic()
+    results = shared_loop.run(sleep_calls(4))
+    elapsed = time.monotonic() - started
+
+    assert all(result["success"] for result in results)
+    # Two rounds of two parallel calls: faster than four sequential calls, slower than one round
+    assert 1.0 <= elapsed < 2.0
+    assert client._pool.idle_count == 2
+
+
+def test_broken_session_is_reopened_and_call_is_retried(clients):
+    client = stdio_client(clients, max_sessions=1)
+    shared_loop.run(client.connect())
+    mcp_session, _ = client._pool._idle[-1]
+    broken_session = mcp_session.session
+
+    async def closed_transport(*args, **kwargs):
+        raise anyio.ClosedResourceError()
+
+    broken_session.call_tool = closed_transport
+    result = shared_loop.run(client.call_tool("echo", text="hello"))
+
+    assert result["result"] == "hello"
+    assert mcp_session.is_open and mcp_session.session is not broken_session
+    assert client._pool.idle_count == 1
+
+
+def test_closed_idle_session_is_replaced_on_checkout(clients):
+    client = stdio_client(clients, max_sessions=1)
+    shared_loop.run(client.connect())
+    mcp_session, _ = client._pool._idle[-1]
+    shared_loop.run(mcp_session.close())
+
+    assert shared_loop.run(client.call_tool("echo", text="hello"))["result"] == "hello"
+    new_session, _ = client._pool._idle[-1]
+    assert new_session is not mcp_session and new_session.is_open
+
+
+def test_servers_client_merges_toolkits_with_prefixed_names(clients):
+    client = servers_client(clients, {"first": server_config(), "second server": server_config("--tools", "1")})
+    toolkit = shared_loop.run(client.get_toolkit())
+
+    # Both servers expose echo, prefixes keep their tools apart
+    assert {"first__echo", "second_server__echo", "second_server__tool_0"} <= toolkit.keys()
+    assert len(toolkit) == 9
+    second = client.clients["second server"]
+    assert shared_loop.run(second.call_tool("second_server__echo", text="hello"))["result"] == "hello"
+    assert toolkit["second_server__echo"].function.mcp_tool_name == "echo"
+
+
+def test_failed_server_is_skipped_and_retried_only_on_reconnect(clients):
+    client = servers_client(clients, {"good": server_config(),
+                                      "broken": {"command": sys.executable, "args": ["-c", "pass"]}})
+    toolkit = shared_loop.run(client.get_toolkit())
+
+    assert set(toolkit) == {"good__echo", "good__sleep", "good__payload", "good__add_echo"}
+    assert set(client.errors) == {"broken"}
+
+    attempts = []
+    broken = client.clients["broken"]
+    broken_connect = broken.connect
+
+    async def counted_connect(timeout):
+        attempts.append(timeout)
+        await broken_connect(timeout)
+
+    broken.connect = counted_connect
+    shared_loop.run(client.get_toolkit())
+    assert attempts == []
+
+    shared_loop.run(client.reconnect())
+    assert len(attempts) == 1 and set(client.errors) == {"broken"}
+
+
+def test_server_not_responding_times_out(clients):
+    client = MCPToolSTDIOClient.from_command(HUNG_SERVER["command"], HUNG_SERVER["args"])
+    clients.append(client)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        shared_loop.run(client.connect(timeout=0.5))
+    assert time.monotonic() - started < 5
+
+    servers = servers_client(clients, {"hung": {**HUNG_SERVER, "timeout": 0.5}})
+    assert shared_loop.run(servers.get_toolkit()) == {}
+    assert servers.errors == {"hung": "no response in 0.5 seconds"}
+
+
+def test_listing_is_refreshed_when_server_reports_changed_tools(clients):
+    cache = MCPToolListCache()
+    client = stdio_client(clients, max_sessions=1, tool_cache=cache)
+    shared_loop.run(client.connect())
+    echo = client.tools["echo"]
+
+    shared_loop.run(client.call_tool("add_echo", name="echo_again"))
+    wait_until(lambda: "echo_again" in client.tools)
+
+    # Adapters of unchanged tools are kept, cached listing is replaced
+    assert client.tools["echo"] is echo
+    key = client._cache_key(client._pool._idle[-1][0].server_info)
+    assert "echo_again" in [tool.name for tool in cache.get(key)[1]]
+
+
+def test_cached_listing_is_used_for_same_server_name_and_version_only(clients):
+    cache = MCPToolListCache()
+    first = stdio_client(clients, tool_cache=cache)
+    config = first._server_config()
+    cache.put(MCPToolListCache.make_key(config, "benchmark", "0.0"), "0.0",
+              [Tool(name="stale", inputSchema={"type": "object"})])
+    shared_loop.run(first.connect())
+
+    # Listing of another version was ignored, tools were listed without background refresh
+    assert "stale" not in first.tools and "echo" in first.tools
+    assert first._refresh_task is None
+    assert cache.get(MCPToolListCache.make_key(config, "benchmark", first.server_version)) is not None
+
+    second = stdio_client(clients, tool_cache=cache)
+    shared_loop.run(second.connect())
+    assert second.tools.keys() == first.tools.keys()
+    assert second._refresh_task is not None
+
+
+def test_validator_is_compiled_once_per_schema():
+    schema = {"type": "object", "properties": {"text": {"type": "string"}}, "required": ["text"]}
+    same_schema = {"required": ["text"], "properties": {"text": {"type": "string"}}, "type": "object"}
+
+    assert schema_validator(schema) is schema_validator(same_schema)
+    assert schema_validator({"type": "object", "properties": {"text": {"type": 5}}}) is None
+
+
+def test_tools_with_same_schema_share_adapter_class_and_validator(clients):
+    client = servers_client(clients, {"first": server_config(), "second": server_config()})
+    toolkit = shared_loop.run(client.get_toolkit())
+    first, second = toolkit["first__echo"].function, toolkit["second__echo"].function
+
+    assert type(first) is McpToLangChainAdapter and type(second) is McpToLangChainAdapter
+    assert first.validator is not None and first.validator is second.validator
+
+
+def test_invalid_arguments_are_rejected_before_calling_server(clients):
+    client = stdio_client(clients)
+    shared_loop.run(client.connect())
+    echo = client.tools["echo"]
+    calls = []
+
+    async def call_tool(tool_name, **arguments):
+        calls.append(tool_name)
+
+    client.call_tool = call_tool
+    with pytest.raises(ToolException, match="Invalid arguments of tool echo"):
+        shared_loop.run(echo._arun(text=5))
+    assert "Invalid arguments of tool echo" in echo.invoke({"text": 5})
+    assert calls == []
+
+
+def test_sync_and_async_callers_share_sessions_on_background_loop(clients):
+    client = stdio_client(clients, max_sessions=1)
+    shared_loop.run(client.connect())
+    echo = client.tools["echo"]
+
+    async def call_from_running_loop():
+        # Sync call inside running loop of caller and async call from that loop
+        return echo.invoke({"text": "sync"}), await echo.ainvoke({"text": "async"})
+
+    # Adapter returns text together with whole response of the client
+    content, response = echo.invoke({"text": "hello"})
+    assert content == "hello" and response["success"]
+    sync_result, async_result = asyncio.run(call_from_running_loop())
+    assert sync_result[0] == "sync" and async_result[0] == "async"
+    mcp_session, _ = client._pool._idle[-1]
+    assert client._pool.idle_count == 1
+    assert mcp_session._task.get_loop() is shared_loop.loop
+
+
+def test_blocking_call_from_background_loop_is_refused():
+    async def blocking_call():
+        coroutine = asyncio.sleep(0)
+        with pytest.raises(RuntimeError, match="would deadlock"):
+            shared_loop.run(coroutine)
+        return await shared_loop.arun(asyncio.sleep(0, "awaited"))
+
+    assert shared_loop.run(blocking_call()) == "awaited"
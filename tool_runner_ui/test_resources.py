@@ -0,0 +1,69 @@
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import AIMessage
+
+import resources
+from benchmarks.fake_chat_model import ScriptedChatModel
+from llm_chat_agent import LLMChatAgent
+from logger import Logger
+from models import Models
+from resources import ResourceRegistry
+
+
+def test_resource_is_created_once_for_concurrent_requests():
+    registry = ResourceRegistry()
+    created = []
+
+    def factory():
+        time.sleep(0.1)
+        created.append(object())
+        return created[-1]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: registry.get("resource", factory), range(8)))
+
+    assert len(created) == 1
+    assert all(result is created[0] for result in results)
+    assert len(registry) == 1
+
+
+def test_slow_factory_does_not_block_other_resources():
+    registry = ResourceRegistry()
+    release = threading.Event()
+    slow = threading.Thread(target=registry.get, args=("slow", lambda: release.wait(5)))
+    slow.start()
+    try:
+        started = time.monotonic()
+        assert registry.get("fast", lambda: "fast") == "fast"
+        assert time.monotonic() - started < 1
+    finally:
+        release.set()
+        slow.join()
+
+
+def test_models_and_mcp_clients_are_shared_by_config():
+    model = resources.chat_model(Models.LLAMA_1B, "http://localhost:11434", 0.1)
+    assert resources.chat_model(Models.LLAMA_1B, "http://localhost:11434", 0.1) is model
+    assert resources.chat_model(Models.LLAMA_1B, "http://localhost:11434", 0.2) is not model
+
+    config = {"command": sys.executable, "args": ["server.py"]}
+    client = resources.mcp_client(json.dumps(config))
+    # Same configuration written differently is the same server
+    assert resources.mcp_client(" " + json.dumps(config, indent=2, sort_keys=True)) is client
+    assert resources.mcp_client(json.dumps({**config, "args": ["other.py"]})) is not client
+
+
+def test_agents_share_compiled_graphs():
+    first = LLMChatAgent("First", Logger.WHITE, ScriptedChatModel(responses=[AIMessage(content="first")]), toolkit={})
+    second = LLMChatAgent("Second", Logger.WHITE, ScriptedChatModel(responses=[AIMessage(content="second")]),
+                          toolkit={})
+
+    assert first._LLMChatAgent__graph is second._LLMChatAgent__graph
+    assert first._LLMChatAgent__async_graph is second._LLMChatAgent__async_graph
+    # Agent is passed to nodes per call, so shared graph still runs model of each agent
+    assert first.invoke("Hi")["output"] == "first"
+    assert second.invoke("Hi")["output"] == "second"
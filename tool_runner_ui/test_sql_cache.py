@@ -0,0 +1,73 @@
+import os
+import shutil
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from benchmarks.fake_chat_model import ScriptedChatModel
+from sql_cache import SQLGenerationCache
+from sql_executor_agent import SQLExecutorAgent
+from sqllite_datasource import SqlLiteDatasource
+
+TEST_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "test-hr.db")
+
+
+@pytest.fixture
+def datasource(tmp_path):
+    db_path = tmp_path / "test-hr.db"
+    shutil.copy(TEST_DB, db_path)
+    datasource = SqlLiteDatasource(str(db_path))
+    yield datasource
+    datasource.close()
+
+
+def sql_agent(datasource: SqlLiteDatasource, cache: SQLGenerationCache, *statements: str) -> SQLExecutorAgent:
+    model = ScriptedChatModel(responses=[AIMessage(content=statement) for statement in statements])
+    return SQLExecutorAgent(datasource, model, cache=cache)
+
+
+def test_query_case_is_kept():
+    assert SQLGenerationCache.normalize_query("  Salary of  'Smith'? ") == "Salary of 'Smith'"
+    assert (SQLGenerationCache.make_key("Salary of 'Smith'", "schema", "model")
+            != SQLGenerationCache.make_key("Salary of 'smith'", "schema", "model"))
+
+
+def test_successful_sql_is_cached(datasource):
+    cache = SQLGenerationCache()
+    agent = sql_agent(datasource, cache, "SELECT COUNT(*) FROM employee")
+    agent.invoke("How many employees?", execute_mode=True)
+    assert cache.get("How many employees?", SQLGenerationCache.schema_hash(datasource.get_schema()),
+                     agent.get_llm_name())["sql"] == "SELECT COUNT(*) FROM employee"
+
+    state = agent.invoke("How many employees?", execute_mode=True)
+    assert state["cached"]
+
+
+def test_failed_sql_is_not_cached(datasource):
+    cache = SQLGenerationCache()
+    agent = sql_agent(datasource, cache, "SELECT missing FROM employee", "SELECT COUNT(*) FROM employee")
+    state = agent.invoke("How many employees?", execute_mode=True)
+    assert state["result"]["data"].is_error
+    assert len(cache) == 0
+
+    # Question is sent to LLM again and the new SQL is cached once it works
+    state = agent.invoke("How many employees?", execute_mode=True)
+    assert not state["cached"] and not state["result"]["data"].is_error
+    assert len(cache) == 1
+
+
+def test_not_executed_sql_is_not_cached(datasource):
+    cache = SQLGenerationCache()
+    sql_agent(datasource, cache, "SELECT COUNT(*) FROM employee").invoke("How many employees?")
+    assert len(cache) == 0
+
+
+def test_cached_sql_which_fails_is_evicted(datasource):
+    cache = SQLGenerationCache()
+    agent = sql_agent(datasource, cache, "SELECT e.salary FROM employee e")
+    agent.invoke("Salaries", execute_mode=True)
+    datasource.execute("ALTER TABLE employee RENAME COLUMN salary TO monthly_salary")
+
+    state = agent.invoke("Salaries", execute_mode=True)
+    assert state["cached"] and state["result"]["data"].is_error
+    assert len(cache) == 0
@@ -0,0 +1,133 @@
+import os
+import shutil
+import threading
+
+import pyarrow as pa
+import pytest
+
+from sqllite_datasource import SqlLiteDatasource, concat_batches, to_record_batch, unique_column_names
+
+TEST_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "test-hr.db")
+
+
+@pytest.fixture
+def datasource(tmp_path):
+    # Datasource switches database to WAL mode, tests work on a copy of test database
+    db_path = tmp_path / "test-hr.db"
+    shutil.copy(TEST_DB, db_path)
+    datasource = SqlLiteDatasource(str(db_path))
+    yield datasource
+    datasource.close()
+
+
+def test_text_only_result_has_no_stats(datasource):
+    result = datasource.retrieve_result("SELECT d.department_name FROM departments d")
+    assert not result.is_error
+    assert result.row_count == 5
+    assert result.stats is None
+
+
+def test_stats_of_numeric_columns(datasource):
+    result = datasource.retrieve_result("SELECT e.first_name, e.salary FROM employee e", preview_rows=5)
+    assert list(result.stats.index) == ["salary"]
+    assert result.stats.loc["salary", "count"] == 100
+    assert "Statistics of numeric columns" in result.to_markdown()
+
+
+def test_join_with_repeated_column_names(datasource):
+    result = datasource.retrieve_result(
+        "SELECT * FROM employee e JOIN departments d ON e.department_id = d.department_id", preview_rows=5
+    )
+    assert not result.is_error
+    assert result.row_count == 100
+    assert result.table.num_rows == 100
+    assert result.preview.column_names == ["emp_id", "first_name", "last_name", "salary", "department_id",
+                                           "department_id_1", "department_name"]
+
+
+def test_truncated_result(datasource):
+    result = datasource.retrieve_result("SELECT e.emp_id FROM employee e", preview_rows=5, max_rows=10)
+    assert result.truncated
+    assert result.row_count == 10
+    assert result.preview.num_rows == 5
+    assert result.table.num_rows == 10
+
+
+def test_result_truncated_by_byte_limit(datasource):
+    statement = ("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 5000) "
+                 "SELECT i, 'name ' || i AS name FROM n")
+    result = datasource.retrieve_result(statement, preview_rows=5, max_bytes=10000)
+    assert result.truncated
+    assert 0 < result.row_count < 5000
+    assert result.table.num_rows == result.row_count
+    assert result.summary().startswith(f"Query returned more than {result.row_count} rows")
+
+    assert not datasource.retrieve_result(statement, preview_rows=5).truncated
+
+
+def test_error_result(datasource):
+    result = datasource.retrieve_result("SELECT missing FROM employee")
+    assert result.is_error
+
+
+def test_unique_column_names():
+    assert unique_column_names(["a", "b", "a", "a_1", "a"]) == ["a", "b", "a_2", "a_1", "a_3"]
+
+
+def test_concat_batches_promotes_mixed_types():
+    table = concat_batches([to_record_batch(["value"], [(1,), (2,)]), to_record_batch(["value"], [("x",)])])
+    assert table.schema.field("value").type == pa.string()
+    assert table.column("value").to_pylist() == ["1", "2", "x"]
+
+
+def test_result_is_cached_until_data_changes(datasource):
+    statement = "SELECT e.emp_id, e.salary FROM employee e"
+    first = datasource.retrieve_result(statement)
+    assert datasource.retrieve_result("  " + statement + ";") is first
+    assert datasource.retrieve_result(statement, max_rows=10) is not first
+
+    datasource.execute("UPDATE employee SET salary = salary + 1 WHERE emp_id = 1")
+    assert datasource.retrieve_result(statement) is not first
+
+
+def test_cache_invalidated_by_writes_of_other_connections(datasource, tmp_path):
+    statement = "SELECT COUNT(*) AS n FROM departments"
+    assert datasource.retrieve_as_dataframe(statement)["n"][0] == 5
+
+    other = SqlLiteDatasource(str(tmp_path / "test-hr.db"))
+    other.execute("INSERT INTO departments (department_id, department_name) VALUES (6, 'Legal')")
+    other.close()
+    assert datasource.retrieve_as_dataframe(statement)["n"][0] == 6
+    assert datasource.retrieve_result(statement).preview.column("n").to_pylist() == [6]
+
+
+def test_errors_are_not_cached(datasource):
+    datasource.retrieve_result("SELECT missing FROM employee")
+    datasource.retrieve_result("SELECT missing FROM employee")
+    assert datasource.cache_hits == 0
+
+
+def test_statements_modifying_data_are_executed_by_writer(datasource):
+    result = datasource.retrieve_result("UPDATE employee SET salary = salary + 1 WHERE department_id = 1")
+    assert not result.is_error
+    assert result.preview.column_names == ["changed_rows"]
+    assert result.preview.column("changed_rows")[0].as_py() > 0
+
+    frame = datasource.retrieve_as_dataframe("DELETE FROM departments WHERE department_id = 5 RETURNING department_id")
+    assert frame["department_id"].tolist() == [5]
+    assert datasource.retrieve_as_dataframe("SELECT COUNT(*) AS n FROM departments")["n"][0] == 4
+
+
+def test_reader_connections_of_finished_threads_are_closed(datasource):
+    def query():
+        # Not cacheable, every call runs on reader connection of its thread
+        datasource.retrieve_as_dataframe("SELECT COUNT(*) FROM employee e WHERE RANDOM() IS NOT NULL")
+
+    for _ in range(5):
+        thread = threading.Thread(target=query)
+        thread.start()
+        thread.join()
+    query()
+    # Connections of finished threads are closed when next thread connects
+    readers = datasource._SqlLiteDatasource__reader_connections
+    assert [thread for thread, _ in readers] == [threading.current_thread()]
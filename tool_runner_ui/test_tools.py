@@ -0,0 +1,35 @@
+from tools import ResponseSplitter
+
+
+def split(chunks) -> tuple:
+    splitter = ResponseSplitter()
+    thoughts, response = "", ""
+    for chunk in chunks:
+        new_thoughts, new_response = splitter.feed(chunk)
+        thoughts, response = thoughts + new_thoughts, response + new_response
+    new_thoughts, new_response = splitter.flush()
+    return thoughts + new_thoughts, response + new_response
+
+
+def test_response_without_thoughts():
+    assert split(["Hello", " world"]) == ("", "Hello world")
+
+
+def test_tags_split_between_chunks():
+    text = "<think>Count rows</think>There are 5 departments"
+    expected = ("Count rows", "There are 5 departments")
+    assert split([text]) == expected
+    assert split(list(text)) == expected
+    assert split(["<th", "ink>Count rows</", "think", ">There are 5 departments"]) == expected
+
+
+def test_text_similar_to_tag_is_not_lost():
+    assert split(["a < b and <t", "able>"]) == ("", "a < b and <table>")
+    assert split(["Response ends with <thi"]) == ("", "Response ends with <thi")
+
+
+def test_unfinished_thoughts_are_flushed_as_thoughts():
+    splitter = ResponseSplitter()
+    assert splitter.feed("<think>Still thinking</th") == ("Still thinking", "")
+    assert splitter.in_thoughts and splitter.thoughts_seen
+    assert splitter.flush() == ("</th", "")
@@ -1,12 +1,14 @@
 import random
 import string
-import subprocess
 
 from langchain_core.tools import tool
-from pandas import DataFrame
-from typing_extensions import Tuple
+from typing_extensions import Tuple, Iterator
 
-from sqllite_datasource import SqlLiteDatasource
+from command_executor import CommandExecutor
+from sqllite_datasource import SqlLiteDatasource, QueryResult
+
+# Commands are killed after timeout, only head and tail of large output are returned to LLM
+command_executor = CommandExecutor(timeout=120, max_output_bytes=32 * 1024)
 
 
 def generate_random_string(length=8):
@@ -22,6 +24,60 @@ def clean_utf8_text(text):
     return text.encode("utf-8", "surrogatepass").decode("utf-8", "replace")
 
 
+class ResponseSplitter:
+    """
+    Incrementally splits streamed model output into model thoughts and response text.
+    Thoughts are enclosed in <think>...</think> tags, tags split between chunks are handled.
+
+    Examples:
+        >>> splitter = ResponseSplitter()
+        >>> splitter.feed("<thi")
+        ('', '')
+        >>> splitter.feed("nk>Some text</think>Resp")
+        ('Some text', 'Resp')
+        >>> splitter.feed("onse")
+        ('', 'onse')
+    """
+
+    THINK_START = '<think>'
+    THINK_END = '</think>'
+
+    def __init__(self):
+        self.__pending = ""
+        self.in_thoughts = False
+        self.thoughts_seen = False
+
+    def feed(self, chunk: str) -> Tuple[str, str]:
+        """Consume next chunk, return (thoughts, response text) which can be rendered so far"""
+        buffer = self.__pending + chunk
+        thoughts, response = [], []
+
+        while buffer:
+            tag = self.THINK_END if self.in_thoughts else self.THINK_START
+            target = thoughts if self.in_thoughts else response
+            position = buffer.find(tag)
+            if position != -1:
+                target.append(buffer[:position])
+                buffer = buffer[position + len(tag):]
+                self.in_thoughts = not self.in_thoughts
+                self.thoughts_seen = True
+                continue
+
+            # Hold back tail which might be beginning of a tag completed by next chunk
+            keep = next((n for n in range(min(len(tag) - 1, len(buffer)), 0, -1) if tag.startswith(buffer[-n:])), 0)
+            target.append(buffer[:len(buffer) - keep])
+            buffer = buffer[len(buffer) - keep:]
+            break
+
+        self.__pending = buffer
+        return "".join(thoughts), "".join(response)
+
+    def flush(self) -> Tuple[str, str]:
+        """Return text held back at the end of stream"""
+        pending, self.__pending = self.__pending, ""
+        return (pending, "") if self.in_thoughts else ("", pending)
+
+
 def parse_response(input_str: str) -> dict:
     """
     Parses input string to extract model thoughts and response text.
@@ -47,43 +103,22 @@ def parse_response(input_str: str) -> dict:
         'response-text': input_str
     }
 
-    # Check if input contains think tags
-    think_start = input_str.find('<think>')
-    think_end = input_str.find('</think>')
-
-    if think_start != -1 and think_end != -1:
-        # Extract text between think tags
-        thoughts = input_str[think_start + 7:think_end]
-        # Extract text after closing think tag
-        response = input_str[think_end + 8:]
+    # Check if input contains complete think tags
+    if ResponseSplitter.THINK_START in input_str and ResponseSplitter.THINK_END in input_str:
+        splitter = ResponseSplitter()
+        thoughts, response = splitter.feed(input_str)
+        rest_thoughts, rest_response = splitter.flush()
 
-        result['model-thoughts'] = thoughts
-        result['response-text'] = response
+        result['model-thoughts'] = thoughts + rest_thoughts
+        result['response-text'] = response + rest_response
 
     return result
 
 
-def run_subprocess(command):
+def run_subprocess(command) -> Iterator[str]:
+    """Yield output of command as it is produced, closing iterator kills the command"""
     try:
-        # Start the process
-        process = subprocess.Popen(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            shell=True,
-            encoding='utf-8'
-        )
-        for line in iter(process.stdout.readline, ''):
-            yield line.rstrip()
-            yield "\n"
-
-        # Wait for the process to complete and get the return code
-        return_code = process.wait()
-        yield f"Process finished with return code {return_code}"
-
-    except KeyboardInterrupt:
-        yield "Process interrupted by user"
+        yield from command_executor.stream(command)
 
     except Exception as e:
         yield f"Failed to execute command\n"
@@ -101,18 +136,18 @@ def command_exec_tool(command: str) -> str:
         command: linux command
 
     Returns:
-        output from stdout generated by command
+        output from stdout and stderr generated by command
     """
-    output = ""
-    for line in run_subprocess(command):
-        output += clean_utf8_text(line)
-    return output
+    try:
+        return command_executor.run(command)
+    except Exception as e:
+        return f"Failed to execute command\nException: {e}"
 
 
 @tool(response_format="content_and_artifact")
-def sql_exec_tool(statement: str) -> Tuple[str, DataFrame]:
+def sql_exec_tool(statement: str) -> Tuple[str, QueryResult]:
     """
-    Executes sql statement and return output as DataFrame.
+    Executes sql statement and return output as table.
     Call this whenever you need to know info about departments and employees from HR Database.
     HR Database is SqlLight with following schema:[
     CREATE TABLE departments (
@@ -134,11 +169,12 @@ def sql_exec_tool(statement: str) -> Tuple[str, DataFrame]:
         statement: SQL statement compatible with SqlLite database
 
     Returns:
-        DataFrame with result from execution of SQL
+        Table with result from execution of SQL, for large results first rows, number of rows and statistics.
+        Statements modifying data return number of changed rows (or rows of RETURNING clause)
     """
-    db = SqlLiteDatasource("data/test-hr.db")
-    df = db.retrieve_as_dataframe(statement)
-    return df.to_markdown(), df
+    db = SqlLiteDatasource.shared("data/test-hr.db")
+    result = db.retrieve_result(statement)
+    return result.to_markdown(), result
 
 
 @tool()
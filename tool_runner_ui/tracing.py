@@ -0,0 +1,278 @@
+import atexit
+import functools
+import inspect
+import json
+import math
+import os
+import secrets
+import statistics
+import threading
+import time
+from collections import deque, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Tracing is off until an exporter is added. Spans are exported by:
+#   TRACE_FILE environment variable - path of JSON lines file in OpenTelemetry (OTLP/JSON) format
+#   enable_collector() - in-process collector, e.g. for benchmarks
+SERVICE_NAME = "tool-runner-ui"
+MAX_ATTRIBUTE_LENGTH = 1000
+
+
+class Span:
+    """
+    Timed operation. Spans started while another span is current become its children,
+    parent is kept in context variable, so spans nest across threads and event loops which copy the context
+    (LangGraph nodes, asyncio tasks, shared background loop, sub-agents called as tools)
+    """
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "kind", "start_ns", "end_ns", "attributes", "events",
+                 "error")
+
+    def __init__(self, name: str, parent: Optional["Span"], kind: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.events: List[tuple] = []
+        self.error: Optional[str] = None
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    def event(self, name: str, **attributes: Any):
+        self.events.append((name, time.time_ns(), attributes))
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id, "spanId": self.span_id, "name": self.name,
+            "kind": {"internal": 1, "server": 2, "client": 3}.get(self.kind, 1),
+            "startTimeUnixNano": str(self.start_ns), "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "events": [{"name": name, "timeUnixNano": str(timestamp), "attributes": _otlp_attributes(attributes)}
+                       for name, timestamp, attributes in self.events],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1}
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    """Returned when tracing is off, so instrumented code doesn't check if tracing is on"""
+
+    def set(self, **attributes: Any):
+        pass
+
+    def event(self, name: str, **attributes: Any):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class SpanCollector:
+    """In-process exporter keeping last max_spans finished spans"""
+
+    def __init__(self, max_spans: int = 100000):
+        self.__spans = deque(maxlen=max_spans)
+        self.__lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self.__lock:
+            self.__spans.append(span)
+
+    def spans(self, name: str = None) -> List[Span]:
+        with self.__lock:
+            return [span for span in self.__spans if name is None or span.name == name]
+
+    def children(self, span: Span) -> List[Span]:
+        return [child for child in self.spans() if child.parent_id == span.span_id]
+
+    def clear(self):
+        with self.__lock:
+            self.__spans.clear()
+
+    def summary(self) -> Dict[str, dict]:
+        """Count and latency percentiles (ms) of spans by name"""
+        durations = defaultdict(list)
+        for span in self.spans():
+            durations[span.name].append(span.duration_ms)
+        return {name: latency_summary(values) for name, values in durations.items()}
+
+    def close(self):
+        pass
+
+
+class JsonlSpanExporter:
+    """Writes every finished span as one OTLP/JSON line, the format of OpenTelemetry Collector file exporter"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.__file = open(path, "a", encoding="utf-8")
+        self.__lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps({"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": [span.to_otlp()]}]
+        }]})
+        with self.__lock:
+            self.__file.write(line + "\n")
+            self.__file.flush()
+
+    def close(self):
+        with self.__lock:
+            self.__file.close()
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_exporters: List[Any] = []
+
+
+def enabled() -> bool:
+    return bool(_exporters)
+
+
+def add_exporter(exporter):
+    """Exporter is any object with export(span) and close() methods"""
+    _exporters.append(exporter)
+
+
+def remove_exporter(exporter):
+    _exporters.remove(exporter)
+    exporter.close()
+
+
+def enable_collector(max_spans: int = 100000) -> SpanCollector:
+    collector = SpanCollector(max_spans)
+    add_exporter(collector)
+    return collector
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes: Any) -> Iterator[Span | _NoopSpan]:
+    """Trace block of code as child of current span"""
+    if not _exporters:
+        yield NOOP_SPAN
+        return
+    current = Span(name, _current_span.get(), kind, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # Span of generator closed in another context
+            pass
+        for exporter in list(_exporters):
+            exporter.export(current)
+
+
+def traced(name: str = None, **attributes: Any) -> Callable:
+    """Decorator tracing sync or async function, e.g. node of LangGraph graph (signature is preserved)"""
+
+    def decorator(function: Callable) -> Callable:
+        span_name = name or function.__name__.strip("_")
+
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, **attributes):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(span_name, **attributes):
+                return function(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def record_llm_response(llm_span: Span | _NoopSpan, message: Any):
+    """Set token usage reported by chat model, attribute names follow OpenTelemetry GenAI conventions"""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        llm_span.set(**{"gen_ai.usage.input_tokens": usage.get("input_tokens"),
+                        "gen_ai.usage.output_tokens": usage.get("output_tokens")})
+
+
+class FirstTokenTimer:
+    """Records time to first streamed token of LLM call on its span"""
+
+    def __init__(self, llm_span: Span | _NoopSpan):
+        self.__span = llm_span
+        self.__start = time.perf_counter()
+        self.__seen = False
+
+    def token(self):
+        if not self.__seen:
+            self.__seen = True
+            self.__span.set(**{"gen_ai.time_to_first_token_ms": (time.perf_counter() - self.__start) * 1000})
+            self.__span.event("first_token")
+
+
+def latency_summary(durations: List[float]) -> dict:
+    """Count, mean and p50/p95/p99 of durations"""
+    values = sorted(durations)
+    if not values:
+        return {"count": 0}
+
+    def percentile(p: float) -> float:
+        # Nearest-rank percentile
+        return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+    return {"count": len(values), "mean": statistics.fmean(values), "p50": percentile(50),
+            "p95": percentile(95), "p99": percentile(99), "max": values[-1]}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[dict]:
+    result = []
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            text = str(value)
+            typed = {"stringValue": text if len(text) <= MAX_ATTRIBUTE_LENGTH else text[:MAX_ATTRIBUTE_LENGTH] + "..."}
+        result.append({"key": key, "value": typed})
+    return result
+
+
+def _close_exporters():
+    for exporter in list(_exporters):
+        exporter.close()
+    _exporters.clear()
+
+
+if os.environ.get("TRACE_FILE"):
+    add_exporter(JsonlSpanExporter(os.environ["TRACE_FILE"]))
+atexit.register(_close_exporters)